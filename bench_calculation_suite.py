@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark and regression gate for the sale calculation hot paths.
+
+Times Sale.calculate_sale_amounts (and its standalone copy), the columnar
+batch engine, form value parsing with to_decimal, and Sale.to_dict on
+inputs shaped like real traffic: comma-formatted prices, Arabic digits,
+percent rates, blanks and plain numbers.
+
+Each case reports its best-of-N throughput. `--save-baseline` records the
+numbers to a JSON file; later runs compare against it and exit with status
+1 when any case loses more than `--threshold` of its baseline throughput.
+Baselines are machine specific, so keep them out of version control.
+
+Usage:
+    python bench_calculation_suite.py --save-baseline      # record baseline
+    python bench_calculation_suite.py                      # compare, exit 1 on regression
+    python bench_calculation_suite.py --threshold 0.10 --only to_decimal
+"""
+
+import sys
+import os
+import argparse
+import gc
+import json
+import platform
+import random
+import time
+from datetime import date, datetime
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from decimal import Decimal
+from src.models import user, transaction  # noqa: F401 (configure Sale relationships)
+from src.models.sale import Sale
+from src.utils.numbers import to_decimal
+import test_calculations_standalone
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+ARABIC_DIGITS = str.maketrans('0123456789', '٠١٢٣٤٥٦٧٨٩')
+RATES = ('0', '0.005', '0.01', '0.015', '0.02', '0.025', '0.03', '0.05')
+
+def form_price(rng):
+    """A unit price the way it arrives from the sales form"""
+    price = rng.randint(50000000, 1500000000) / 100
+    shape = rng.random()
+    if shape < 0.4:
+        return f'{price:,.2f}'
+    if shape < 0.6:
+        return f'{price:,.2f}'.translate(ARABIC_DIGITS)
+    if shape < 0.8:
+        return f'{price:.2f}'
+    return price
+
+def form_rate(rng):
+    shape = rng.random()
+    rate = rng.choice(RATES)
+    if shape < 0.3:
+        return f'{Decimal(rate) * 100:f}%'
+    if shape < 0.4:
+        return f'{Decimal(rate) * 100:f}%'.translate(ARABIC_DIGITS)
+    if shape < 0.5:
+        return ''
+    if shape < 0.8:
+        return rate
+    return float(rate)
+
+def make_inputs(size, seed=2024):
+    rng = random.Random(seed)
+    calc_rows = []
+    for _ in range(size):
+        calc_rows.append({
+            'unit_price': to_decimal(form_price(rng)),
+            'company_commission_rate': Decimal(rng.choice(RATES[1:])),
+            'salesperson_commission_rate': Decimal(rng.choice(RATES)),
+            'salesperson_incentive_rate': Decimal(rng.choice(RATES)),
+            'vat_rate': Decimal('0.14'),
+            'sales_tax_rate': Decimal('0.05'),
+            'annual_tax_rate': Decimal('0.225'),
+            'salesperson_tax_rate': Decimal(rng.choice(('0', '0.1', '0.225'))),
+            'sales_manager_tax_rate': Decimal(rng.choice(('0', '0.1', '0.225'))),
+        })
+
+    form_values = []
+    for _ in range(size):
+        form_values.append(form_price(rng) if rng.random() < 0.5 else form_rate(rng))
+    form_values[::17] = [None] * len(form_values[::17])
+
+    columns = {f'{key}s': [row[key] for row in calc_rows] for key in calc_rows[0]}
+
+    sales = []
+    for i, row in enumerate(calc_rows):
+        sale = Sale(
+            id=i + 1, client_name=f'عميل {i}', sale_date=date(2024, 1, 1 + i % 28),
+            unit_code=f'U-{i:06d}', property_type='residential', project_name='Project',
+            salesperson_name='Salesperson', created_at=datetime(2024, 1, 1), updated_at=datetime(2024, 1, 1),
+            **row
+        )
+        for field, value in Sale.calculate_sale_amounts(**row).items():
+            setattr(sale, field, value.quantize(Decimal('0.01')) if isinstance(value, Decimal) else value)
+        sales.append(sale)
+
+    return calc_rows, columns, form_values, sales
+
+def build_cases(size):
+    calc_rows, columns, form_values, sales = make_inputs(size)
+    standalone = test_calculations_standalone.calculate_sale_amounts
+
+    def run_scalar():
+        for row in calc_rows:
+            Sale.calculate_sale_amounts(**row)
+
+    def run_standalone():
+        for row in calc_rows:
+            standalone(**row)
+
+    def run_batch():
+        Sale.calculate_sale_amounts_batch(**columns)
+
+    def run_to_decimal():
+        for value in form_values:
+            to_decimal(value)
+
+    def run_to_dict():
+        for sale in sales:
+            sale.to_dict()
+
+    return {
+        'calculate_sale_amounts': run_scalar,
+        'calculate_sale_amounts_standalone': run_standalone,
+        'calculate_sale_amounts_batch': run_batch,
+        'to_decimal': run_to_decimal,
+        'sale_to_dict': run_to_dict,
+    }
+
+def measure(func, size, repeat):
+    """Best-of-`repeat` throughput in operations per second"""
+    func()  # warm up caches and lazy imports
+    best = None
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return size / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=5000, help='inputs per case (default 5000)')
+    parser.add_argument('--repeat', type=int, default=7, help='timed runs per case, best is kept (default 7)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='record this run as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='allowed throughput loss before failing, as a fraction (default 0.15)')
+    parser.add_argument('--only', nargs='*', help='run only the named cases')
+    args = parser.parse_args()
+
+    cases = build_cases(args.size)
+    if args.only:
+        unknown = set(args.only) - set(cases)
+        if unknown:
+            parser.error(f"unknown case(s): {', '.join(sorted(unknown))}; choose from {', '.join(cases)}")
+        cases = {name: func for name, func in cases.items() if name in args.only}
+
+    results = {name: measure(func, args.size, args.repeat) for name, func in cases.items()}
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    print(f'{args.size} inputs per case, best of {args.repeat}\n')
+    print(f"{'case':<36}{'ops/s':>12}{'baseline':>12}{'change':>9}")
+    regressions = []
+    for name, ops in results.items():
+        base = (baseline or {}).get('results', {}).get(name)
+        if base:
+            change = ops / base - 1
+            flag = '  REGRESSION' if change < -args.threshold else ''
+            if flag:
+                regressions.append(name)
+            print(f'{name:<36}{ops:>12,.0f}{base:>12,.0f}{change:>+8.1%}{flag}')
+        else:
+            print(f'{name:<36}{ops:>12,.0f}{"-":>12}{"-":>9}')
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'recorded_at': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'machine': platform.platform(),
+                'size': args.size,
+                'results': results,
+            }, f, indent=2)
+        print(f'\nBaseline written to {args.baseline}')
+        return 0
+
+    if baseline is None:
+        print(f'\nNo baseline at {args.baseline}; run with --save-baseline to record one.')
+        return 0
+    if regressions:
+        print(f"\nThroughput regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f'\nNo case regressed more than {args.threshold:.0%}.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
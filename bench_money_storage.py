@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Compare NUMERIC (pounds, stored as SQLite REAL) and integer piaster money
+storage on the same synthetic data set.
+
+Each storage mode runs in its own subprocess, because the mode is fixed for
+the lifetime of a process. Aggregate endpoints (sales stats, sales and
+transactions summaries) and list endpoints (100-row pages) are timed through
+the Flask test client, and the raw SQL SUM of net company income is compared
+with the exact Decimal total to show the drift of REAL aggregation.
+
+Usage:
+    python bench_money_storage.py                       # 20k sales
+    python bench_money_storage.py --rows 100000 --repeat 20
+"""
+
+import sys
+import os
+import argparse
+import contextlib
+import io
+import json
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = (
+    ('sales stats', '/sales/api/sales-stats'),
+    ('sales summary', '/reports/api/sales-summary'),
+    ('transactions summary', '/reports/api/transactions-summary'),
+    ('sales list (100)', '/sales/api/sales?per_page=100'),
+    ('transactions list (100)', '/treasury/api/transactions?per_page=100'),
+)
+
+def build_app(db_path, mode):
+    from flask import Flask
+    from src.models.database import db, init_db, login_manager
+    from src.models.user import User
+    from src.routes.sales import sales_bp
+    from src.routes.treasury import treasury_bp
+    from src.routes.reports import reports_bp
+    from src.utils.init_data import initialize_all_data
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'bench'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['MONEY_STORAGE'] = mode
+    init_db(app)
+    app.register_blueprint(sales_bp, url_prefix='/sales')
+    app.register_blueprint(treasury_bp, url_prefix='/treasury')
+    app.register_blueprint(reports_bp, url_prefix='/reports')
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return db.session.get(User, int(user_id))
+
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        db.create_all()
+        initialize_all_data()
+    return app
+
+def seed(app, rows, seed=11):
+    """Insert `rows` sales and one transaction per sale; return the exact net total"""
+    from sqlalchemy import insert
+    from src.models.database import db
+    from src.models.sale import Sale
+    from src.models.transaction import Transaction
+
+    rng = random.Random(seed)
+    prices = [Decimal(rng.randint(50000000, 1500000000)).scaleb(-2) for _ in range(rows)]
+    amounts = Sale.calculate_sale_amounts_batch(
+        unit_prices=prices,
+        company_commission_rates=Decimal('0.0250'),
+        salesperson_commission_rates=Decimal('0.0100'),
+        salesperson_incentive_rates=Decimal('0.0050'),
+    )
+    start = date(2023, 1, 1)
+    now = datetime.utcnow()
+    sales, transactions = [], []
+    for i, price in enumerate(prices):
+        sale = {
+            'client_name': f'Client {i}', 'sale_date': start + timedelta(days=i % 700),
+            'unit_code': f'B-{i:07d}', 'unit_price': price, 'property_type': 'residential',
+            'company_commission_rate': Decimal('0.0250'), 'salesperson_commission_rate': Decimal('0.0100'),
+            'salesperson_incentive_rate': Decimal('0.0050'), 'created_at': now,
+        }
+        for field, column in amounts.items():
+            sale[field] = Decimal(column[i]).scaleb(-2)
+        sales.append(sale)
+        transactions.append({
+            'type': 'Sale' if i % 5 else 'Expense',
+            'amount': sale['net_company_income'] if i % 5 else -sale['vat_amount'],
+            'description': f'bench {i}', 'transaction_date': now,
+        })
+    with app.app_context():
+        db.session.execute(insert(Sale), sales)
+        db.session.execute(insert(Transaction), transactions)
+        Transaction.rebuild_ledger()  # bulk rows skip the ledger events
+        db.session.commit()
+    return sum((Decimal(value) for value in amounts['net_company_income']), Decimal('0')).scaleb(-2)
+
+def time_endpoint(client, url, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200, (url, response.status_code, response.get_data(as_text=True)[:200])
+    return statistics.median(samples) * 1000
+
+def worker(mode, rows, repeat):
+    from sqlalchemy import text
+    from src.models.database import db
+    from src.models.sale import Sale
+    from src.models.user import User
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'), mode)
+        exact_net = seed(app, rows)
+
+        client = app.test_client()
+        with app.app_context():
+            admin_id = User.query.filter_by(username='admin').first().id
+        with client.session_transaction() as session:
+            session['_user_id'] = str(admin_id)
+            session['_fresh'] = True
+
+        timings = {name: time_endpoint(client, url, repeat) for name, url in ENDPOINTS}
+        with app.app_context():
+            raw_sum = db.session.execute(text('SELECT SUM(net_company_income) FROM sales')).scalar()
+            orm_sum = db.session.query(db.func.sum(Sale.net_company_income)).scalar()
+        raw_net = Decimal(raw_sum).scaleb(-2) if mode == 'minor_units' else Decimal(repr(raw_sum))
+        print(json.dumps({
+            'mode': mode,
+            'timings_ms': timings,
+            'exact_net': str(exact_net),
+            'raw_sum_drift': str(raw_net - exact_net),
+            'orm_sum_drift': str(Decimal(orm_sum) - exact_net),
+            'db_bytes': os.path.getsize(os.path.join(tmp, 'bench.db')),
+        }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--worker', choices=('numeric', 'minor_units'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.rows, args.repeat)
+        return 0
+
+    results = {}
+    for mode in ('numeric', 'minor_units'):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', mode,
+             '--rows', str(args.rows), '--repeat', str(args.repeat)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    before, after = results['numeric'], results['minor_units']
+    print(f'{args.rows} sales / {args.rows} transactions, median of {args.repeat} requests\n')
+    print(f"{'endpoint':<26}{'numeric ms':>12}{'piasters ms':>13}{'speedup':>9}")
+    for name, _ in ENDPOINTS:
+        slow, fast = before['timings_ms'][name], after['timings_ms'][name]
+        print(f'{name:<26}{slow:>12.2f}{fast:>13.2f}{slow / fast:>8.2f}x')
+    print(f"\nexact net company income: {before['exact_net']}")
+    for result in (before, after):
+        print(f"{result['mode']:<12} raw SQL SUM drift: {result['raw_sum_drift']:>14}   "
+              f"ORM SUM drift: {result['orm_sum_drift']:>8}   file: {result['db_bytes'] / 1e6:.1f} MB")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Compare direct commits with the single-writer posting queue under many
+concurrent writers.
+
+Each writer thread posts income entries the way create_sale does: a
+Transaction row plus Treasury.increment().
+
+- 'direct' runs each posting in the writer's own session and commits it,
+  so every writer competes for the SQLite write lock (busy_timeout 5s).
+- 'queue' hands each posting to PostingQueue. Its one writer thread
+  commits whatever accumulated during the previous commit as one batch.
+
+Latency is measured per posting, from the call to the committed result.
+Failed postings (e.g. "database is locked") are counted, and the final
+treasury balance is compared with the postings that succeeded.
+
+Usage:
+    python bench_posting_queue.py                        # 50 writers x 40 posts
+    python bench_posting_queue.py --writers 100 --posts 20
+"""
+
+import sys
+import os
+import argparse
+import contextlib
+import io
+import tempfile
+import threading
+import time
+from decimal import Decimal
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+AMOUNT = Decimal('125.50')
+
+def build_app(db_path, posting_queue):
+    from flask import Flask
+    from src.models.database import db, init_db
+    from src.models import user, sale, transaction, treasury  # noqa: F401 (register the tables)
+    from src.utils.init_data import initialize_all_data
+    from src.utils.posting_queue import init_posting_queue
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'bench'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['POSTING_QUEUE'] = posting_queue
+    init_db(app)
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        db.create_all()
+        initialize_all_data()
+    init_posting_queue(app)
+    return app
+
+def post_income(amount):
+    from src.models.database import db
+    from src.models.treasury import Treasury
+    from src.models.transaction import Transaction
+
+    db.session.add(Transaction(type='Sale', amount=amount, description='bench'))
+    Treasury.increment(amount)
+    return str(amount)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+def run(strategy, writers, posts):
+    from src.models.database import db
+    from src.models.treasury import Treasury
+    from src.utils.posting_queue import submit_posting
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'), strategy == 'queue')
+        with app.app_context():
+            start_balance = Decimal(str(Treasury.get_current().current_balance))
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(writers + 1)
+
+        def writer():
+            with app.app_context():
+                barrier.wait()
+                for _ in range(posts):
+                    started = time.perf_counter()
+                    try:
+                        submit_posting(post_income, AMOUNT)
+                    except Exception as e:
+                        db.session.rollback()
+                        with lock:
+                            errors.append(str(e))
+                        continue
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+                db.session.remove()
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        posting_queue = app.extensions.get('posting_queue')
+        average_batch = posting_queue.stats()['average_batch'] if posting_queue else 1.0
+        if posting_queue:
+            posting_queue.close()
+        with app.app_context():
+            final = Decimal(str(Treasury.get_current().current_balance))
+            db.engine.dispose()
+        return {
+            'posts/s': len(latencies) / elapsed,
+            'p50 ms': percentile(latencies, 0.50) * 1000,
+            'p99 ms': percentile(latencies, 0.99) * 1000,
+            'max ms': max(latencies, default=0.0) * 1000,
+            'failed': len(errors),
+            'batch': average_batch,
+            'balanced': final == start_balance + AMOUNT * len(latencies),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=50)
+    parser.add_argument('--posts', type=int, default=40, help='posts per writer')
+    args = parser.parse_args()
+
+    print(f'{args.writers} writers x {args.posts} posts of {AMOUNT}')
+    print(f'{"strategy":<10}{"posts/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"max ms":>10}{"failed":>8}'
+          f'{"batch":>8}{"balanced":>10}')
+    for strategy in ('direct', 'queue'):
+        result = run(strategy, args.writers, args.posts)
+        print(f'{strategy:<10}{result["posts/s"]:>10.0f}{result["p50 ms"]:>10.1f}{result["p99 ms"]:>10.1f}'
+              f'{result["max ms"]:>10.1f}{result["failed"]:>8}{result["batch"]:>8.1f}{str(result["balanced"]):>10}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
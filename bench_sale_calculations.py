@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark the scalar Sale.calculate_sale_amounts loop against the columnar
+Sale.calculate_sale_amounts_batch engine on synthetic historical sales.
+
+Two scenarios are timed: "mixed" rows carry their own historical rates
+(thousands of rate combinations), while "re-rate" applies one new rate
+profile to every row, as happens when commission policy changes.
+
+Usage:
+    python bench_sale_calculations.py                 # 10k, 100k and 1M rows
+    python bench_sale_calculations.py --sizes 10000 50000
+"""
+
+import sys
+import os
+import argparse
+import gc
+import random
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from decimal import Decimal, ROUND_HALF_UP
+from src.models.sale import Sale
+
+def make_columns(count, seed=7):
+    """Build columnar inputs shaped like rows loaded from the sales table"""
+    rng = random.Random(seed)
+    rates = [Decimal(r) for r in ('0.0000', '0.0050', '0.0100', '0.0200', '0.0250', '0.0300', '0.0500')]
+    taxes = [Decimal(r) for r in ('0.0000', '0.1000', '0.1400', '0.2200', '0.2250')]
+    return {
+        'unit_prices': [Decimal(rng.randint(50000000, 1500000000)) / 100 for _ in range(count)],
+        'company_commission_rates': [rng.choice(rates[1:]) for _ in range(count)],
+        'salesperson_commission_rates': [rng.choice(rates) for _ in range(count)],
+        'salesperson_incentive_rates': [rng.choice(rates) for _ in range(count)],
+        'vat_rates': [Decimal('0.1400')] * count,
+        'sales_tax_rates': [Decimal('0.0500')] * count,
+        'annual_tax_rates': [Decimal('0.2250')] * count,
+        'salesperson_tax_rates': [rng.choice(taxes) for _ in range(count)],
+        'sales_manager_tax_rates': [rng.choice(taxes) for _ in range(count)],
+    }
+
+def uniform_rates(columns):
+    """Same prices, but every row re-rated with a single rate profile"""
+    return {key: (values if key == 'unit_prices' else values[0]) for key, values in columns.items()}
+
+def run_scalar(columns):
+    results = []
+    size = len(columns['unit_prices'])
+    column = lambda key: columns[key] if isinstance(columns[key], list) else [columns[key]] * size
+    rows = zip(column('unit_prices'), column('company_commission_rates'),
+               column('salesperson_commission_rates'), column('salesperson_incentive_rates'),
+               column('vat_rates'), column('sales_tax_rates'), column('annual_tax_rates'),
+               column('salesperson_tax_rates'), column('sales_manager_tax_rates'))
+    for price, company, salesperson, incentive, vat, sales_tax, annual_tax, sp_tax, sm_tax in rows:
+        results.append(Sale.calculate_sale_amounts(
+            unit_price=price,
+            company_commission_rate=company,
+            salesperson_commission_rate=salesperson,
+            salesperson_incentive_rate=incentive,
+            vat_rate=vat,
+            sales_tax_rate=sales_tax,
+            annual_tax_rate=annual_tax,
+            salesperson_tax_rate=sp_tax,
+            sales_manager_tax_rate=sm_tax
+        ))
+    return results
+
+def check_parity(scalar, batch, sample=1000):
+    step = max(1, len(scalar) // sample)
+    for i in range(0, len(scalar), step):
+        for key, value in scalar[i].items():
+            expected = int((value * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+            if batch[key][i] != expected:
+                raise AssertionError(f'Row {i} {key}: scalar {expected} != batch {batch[key][i]}')
+
+def timed(fn, *args, **kwargs):
+    # Like timeit, keep the cyclic GC out of the measurement
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        return result, time.perf_counter() - start
+    finally:
+        gc.enable()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'scenario':<9} {'rows':>10} {'scalar (s)':>12} {'batch (s)':>12} {'speedup':>9} {'batch rows/s':>14}")
+    for size in args.sizes:
+        mixed = make_columns(size)
+        for scenario, columns in (('mixed', mixed), ('re-rate', uniform_rates(mixed))):
+            batch, batch_time = timed(Sale.calculate_sale_amounts_batch, **columns)
+            scalar, scalar_time = timed(run_scalar, columns)
+            check_parity(scalar, batch)
+            del scalar, batch
+            print(f"{scenario:<9} {size:>10,} {scalar_time:>12.3f} {batch_time:>12.3f} "
+                  f"{scalar_time / batch_time:>8.1f}x {size / batch_time:>14,.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Compare the old read-modify-write treasury update with Treasury.increment()
+under concurrent writers.
+
+Each writer thread posts income entries the way a route does: a Transaction
+row plus the matching treasury change.
+
+- 'read-modify-write' reproduces the former helpers. The balance is read,
+  added to in Python floats and committed. The entry is then committed
+  separately, the way create_sale used to commit twice.
+- 'increment' issues one UPDATE ... SET current_balance = current_balance + :delta
+  and commits it together with the entry.
+
+Both run against a file database in WAL mode. The final balance is compared
+with the sum of every posted amount: the difference is lost updates.
+
+Usage:
+    python bench_treasury_increments.py                        # 8 writers x 200 posts
+    python bench_treasury_increments.py --writers 32 --posts 100
+"""
+
+import sys
+import os
+import argparse
+import contextlib
+import io
+import tempfile
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+AMOUNT = Decimal('125.50')
+
+def build_app(db_path):
+    from flask import Flask
+    from src.models.database import db, init_db
+    from src.models import user, sale, transaction, treasury  # noqa: F401 (register the tables)
+    from src.utils.init_data import initialize_all_data
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'bench'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    init_db(app)
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        db.create_all()
+        initialize_all_data()
+    return app
+
+def post_read_modify_write(amount):
+    from src.models.database import db
+    from src.models.treasury import Treasury
+    from src.models.transaction import Transaction
+
+    treasury = Treasury.get_current()
+    treasury.current_balance = float(treasury.current_balance) + float(amount)
+    treasury.last_updated = datetime.utcnow()
+    db.session.commit()
+    db.session.add(Transaction(type='Sale', amount=amount, description='bench'))
+    db.session.commit()
+
+def post_increment(amount):
+    from src.models.database import db
+    from src.models.treasury import Treasury
+    from src.models.transaction import Transaction
+
+    db.session.add(Transaction(type='Sale', amount=amount, description='bench'))
+    Treasury.increment(amount)
+    db.session.commit()
+
+STRATEGIES = {
+    'read-modify-write': post_read_modify_write,
+    'increment': post_increment,
+}
+
+def run(strategy, writers, posts):
+    from src.models.database import db
+    from src.models.treasury import Treasury
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            start_balance = Decimal(str(Treasury.get_current().current_balance))
+        post = STRATEGIES[strategy]
+        errors = []
+        barrier = threading.Barrier(writers + 1)
+
+        def writer():
+            with app.app_context():
+                barrier.wait()
+                for _ in range(posts):
+                    try:
+                        post(AMOUNT)
+                    except Exception as e:
+                        db.session.rollback()
+                        errors.append(str(e))
+                db.session.remove()
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with app.app_context():
+            final = Decimal(str(Treasury.get_current().current_balance))
+        succeeded = writers * posts - len(errors)
+        expected = start_balance + AMOUNT * succeeded
+        lost = (expected - final) / AMOUNT
+        return {
+            'posts/s': succeeded / elapsed,
+            'failed': len(errors),
+            'lost updates': int(lost),
+            'final balance': final,
+            'expected': expected,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--posts', type=int, default=200, help='posts per writer')
+    args = parser.parse_args()
+
+    print(f'{args.writers} writers x {args.posts} posts of {AMOUNT}')
+    print(f'{"strategy":<20}{"posts/s":>10}{"failed":>8}{"lost":>8}{"final balance":>18}{"expected":>18}')
+    for strategy in STRATEGIES:
+        result = run(strategy, args.writers, args.posts)
+        print(f'{strategy:<20}{result["posts/s"]:>10.0f}{result["failed"]:>8}{result["lost updates"]:>8}'
+              f'{result["final balance"]:>18}{result["expected"]:>18}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Convert the money columns of an existing database between NUMERIC pounds and
+integer piasters (minor units).
+
+Every Money column (sales amounts, transactions.amount,
+treasury.current_balance, ...) is rewritten in one transaction and the new
+mode is recorded in app_settings. Stop the application first and restart it
+afterwards: a running process keeps reading the columns in the old mode.
+
+Usage:
+    python migrate_money_storage.py                          # to minor units
+    python migrate_money_storage.py --to numeric             # back to NUMERIC
+    python migrate_money_storage.py --db path/to/other.db
+"""
+
+import sys
+import os
+import argparse
+import shutil
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from src.models.database import db
+from src.models.money import MONEY_STORAGE_MODES, MINOR_UNITS_STORAGE
+from src.models import user, treasury, transaction, sale, recalculation_job, app_setting  # noqa: F401 (register tables)
+from src.utils.money_storage import convert_money_storage, read_money_storage
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.path.join('src', 'database', 'broman_accounting.db'))
+    parser.add_argument('--to', choices=MONEY_STORAGE_MODES, default=MINOR_UNITS_STORAGE)
+    parser.add_argument('--no-backup', action='store_true', help='skip copying the database file first')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f'Database not found: {args.db}')
+        return 1
+
+    engine = create_engine(f'sqlite:///{os.path.abspath(args.db)}')
+    with engine.connect() as connection:
+        current = read_money_storage(connection) or 'numeric'
+    print(f'Current money storage: {current}')
+    if current == args.to:
+        print('Nothing to do.')
+        return 0
+
+    if not args.no_backup:
+        backup = f'{args.db}.before-{args.to}'
+        shutil.copy2(args.db, backup)
+        print(f'Backup written to {backup}')
+
+    converted = convert_money_storage(engine, db.metadata, args.to)
+    print(f'Converted {converted} columns to {args.to}. Restart the application to pick up the change.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Recompute the normalized search_text columns and rebuild the full-text
+search indexes (sales_fts, transactions_fts).
+
+The application fills missing search_text values and creates missing
+indexes on startup, and model events and triggers keep them in sync
+afterwards. Run this after restoring a backup, after scripts that recreate
+the sales or transactions table (e.g. fix_db_constraints.py), after changing
+the normalization rules, or whenever search results look stale.
+
+Usage:
+    python rebuild_search_index.py
+    python rebuild_search_index.py --db path/to/other.db
+"""
+
+import sys
+import os
+import argparse
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from src.utils.search import SEARCH_INDEXES, rebuild_search_indexes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.path.join('src', 'database', 'broman_accounting.db'))
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f'Database not found: {args.db}')
+        return 1
+
+    engine = create_engine(f'sqlite:///{os.path.abspath(args.db)}')
+    started = time.perf_counter()
+    if not rebuild_search_indexes(engine):
+        print('Full-text search is not available (needs SQLite 3.34+ with FTS5 and existing tables).')
+        return 1
+
+    with engine.connect() as connection:
+        for index_name, (content_table, _) in SEARCH_INDEXES.items():
+            rows = connection.execute(text(f'SELECT COUNT(*) FROM {content_table}')).scalar()
+            print(f'{index_name}: indexed {rows} rows of {content_table}')
+    print(f'Done in {time.perf_counter() - started:.1f}s')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
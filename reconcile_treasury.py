@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Check that the treasury balance still equals the sum of the posted
+transactions (see src/utils/reconciliation.py).
+
+By default only the entries posted since the last run and the blocks with
+edited entries are summed; --full re-sums the whole ledger, which also
+catches rows changed with manual SQL. Suitable for cron: the exit status is
+0 when balanced, 2 when discrepancies were found and 1 when the run failed.
+
+Usage:
+    python reconcile_treasury.py
+    python reconcile_treasury.py --full
+    python reconcile_treasury.py --db path/to/other.db
+"""
+
+import sys
+import os
+import argparse
+import contextlib
+import io
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def build_app(db_path):
+    from flask import Flask
+    from src.models.database import init_db
+    from src.models import user, sale, transaction, treasury, reconciliation  # noqa: F401 (register the tables)
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db(app)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.path.join('src', 'database', 'broman_accounting.db'))
+    parser.add_argument('--full', action='store_true', help='re-sum every block instead of the changed ones')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f'Database not found: {args.db}')
+        return 1
+
+    from src.utils.reconciliation import reconcile_treasury
+    app = build_app(os.path.abspath(args.db))
+    with app.app_context():
+        started = time.perf_counter()
+        result = reconcile_treasury(full=args.full).to_dict()
+        elapsed = time.perf_counter() - started
+
+    if result['status'] == 'failed':
+        print(f'Reconciliation failed: {result["error"]}')
+        return 1
+    print(f'{result["status"]}: checked {result["entries_checked"]} entries in {result["blocks_checked"]} blocks '
+          f'through posting_seq {result["through_seq"]} in {elapsed:.2f}s')
+    print(f'treasury {result["treasury_balance"]:,.2f}  ledger {result["ledger_total"]:,.2f}  '
+          f'difference {result["difference"]:,.2f}')
+    for discrepancy in result['discrepancies']:
+        print(f'  {discrepancy}')
+    return 0 if result['status'] == 'balanced' else 2
+
+if __name__ == '__main__':
+    sys.exit(main())
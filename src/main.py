@@ -6,6 +6,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.models.database import init_db, login_manager
+from src.utils.posting_queue import init_posting_queue
 from src.routes.user import user_bp
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
@@ -15,8 +16,16 @@ app.config['SECRET_KEY'] = 'broman_accounting_secret_key_2024'
 app.config['WTF_CSRF_ENABLED'] = True
 
 # Database configuration - using SQLite for now, can be changed to PostgreSQL later
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'broman_accounting.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL', f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'broman_accounting.db')}"
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Storage for money columns of a *new* database: 'numeric' or 'minor_units' (integer piasters).
+# Existing databases keep the mode recorded in them; use migrate_money_storage.py to convert.
+app.config['MONEY_STORAGE'] = os.environ.get('MONEY_STORAGE', 'numeric')
+# Route treasury postings (new sales) through one writer thread with group commits
+# instead of every request competing for the SQLite write lock (see src/utils/posting_queue.py)
+app.config['POSTING_QUEUE'] = os.environ.get('POSTING_QUEUE', '0') == '1'
 
 # Enable CORS for all routes
 CORS(app)
@@ -28,12 +37,28 @@ init_db(app)
 from src.models.user import User, Role, Permission
 from src.models.treasury import Treasury
 from src.models.transaction import Transaction
+from src.models.treasury_snapshot import TreasuryDailySnapshot, TreasuryDailyRollup
 from src.models.sale import Sale, PropertyTypeRates
+from src.models.table_version import TableVersion
+from src.models.recalculation_job import RecalculationJob
+from src.models.app_setting import AppSetting
+from src.models.reconciliation import LedgerCheckpoint, ReconciliationRun
 
 # Create all tables
 with app.app_context():
-    from src.models.database import db
+    from src.models.database import db, create_missing_indexes
     db.create_all()
+    create_missing_indexes()
+
+    from src.utils.search import ensure_search_indexes
+    ensure_search_indexes(db.engine)
+
+    # Jobs whose worker thread died with a previous process
+    from src.utils.recalculation import fail_orphaned_jobs
+    fail_orphaned_jobs()
+
+# The writer thread starts once the tables exist
+init_posting_queue(app)
 
 # Register blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
@@ -0,0 +1,28 @@
+from datetime import datetime
+from .database import db
+
+class AppSetting(db.Model):
+    """Key/value facts about the database itself (e.g. its money storage mode)"""
+    __tablename__ = 'app_settings'
+
+    key = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.String(255), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AppSetting {self.key}={self.value}>'
+
+    @classmethod
+    def get_value(cls, key, default=None):
+        setting = db.session.get(cls, key)
+        return setting.value if setting else default
+
+    @classmethod
+    def set_value(cls, key, value):
+        """Store a setting inside the caller's transaction (no commit)"""
+        setting = db.session.get(cls, key)
+        if setting:
+            setting.value = value
+            setting.updated_at = datetime.utcnow()
+        else:
+            db.session.add(cls(key=key, value=value, updated_at=datetime.utcnow()))
@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from sqlalchemy import event
+from sqlalchemy import event, inspect, text
 from sqlalchemy.engine import Engine
 import sqlite3
 
@@ -13,6 +13,18 @@ login_manager.login_view = 'auth.login'
 login_manager.login_message = 'يرجى تسجيل الدخول للوصول إلى هذه الصفحة.'
 login_manager.login_message_category = 'info'
 
+def create_missing_indexes():
+    """Create indexes declared on models whose tables already existed.
+
+    db.create_all() only creates indexes together with new tables, so indexes
+    added to a model later are created here (requires an app context).
+    """
+    existing_tables = set(inspect(db.engine).get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name in existing_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+
 def init_db(app):
     """Initialize database with Flask app"""
     db.init_app(app)
@@ -32,20 +44,33 @@ def init_db(app):
             cursor.close()
     
     with app.app_context():
+        # Every model is registered before create_all() and before the first
+        # query configures the mappers (Transaction's relationship needs Sale),
+        # whatever the caller imported so far
+        from src.models import (  # noqa: F401
+            app_setting, recalculation_job, reconciliation, sale, table_version, transaction, treasury,
+            treasury_snapshot, user
+        )
+
+        # Money columns are read differently depending on how this database
+        # stores them, so the mode must be settled before the first query.
+        from src.utils.money_storage import configure_money_storage, record_money_storage
+        money_storage = configure_money_storage(db.engine, app.config.get('MONEY_STORAGE', 'numeric'))
         db.create_all()
+        record_money_storage(db.engine, money_storage)
 
         # Backfill missing columns for existing SQLite DBs when model changed but migrations
-        # were not run. This is a small, safe add-only routine: it checks the `sales` table
-        # and adds columns that are defined on the SQLAlchemy model but missing in the
-        # SQLite schema. This avoids runtime "no such column" errors.
+        # were not run. This is a small, safe add-only routine: it checks the `sales` and
+        # `transactions` tables and adds columns that are defined on the SQLAlchemy models
+        # but missing in the SQLite schema. This avoids runtime "no such column" errors.
         try:
             engine = db.engine
-            inspector = __import__('sqlalchemy').inspect(engine)
-            if 'sales' in inspector.get_table_names():
-                existing_cols = {c['name'] for c in inspector.get_columns('sales')}
+            inspector = inspect(engine)
+            existing_tables = inspector.get_table_names()
 
-                # Define columns we expect in the sales table: mapping to SQLite column SQL
-                expected_columns = {
+            # Define columns we expect per table: mapping to SQLite column SQL
+            expected_columns = {
+                'sales': {
                     'company_commission_rate': 'NUMERIC',
                     'salesperson_commission_rate': 'NUMERIC',
                     'salesperson_incentive_rate': 'NUMERIC',
@@ -65,22 +90,57 @@ def init_db(app):
                     'sales_manager_tax_amount': 'NUMERIC',
                     'net_company_income': 'NUMERIC',
                     'net_salesperson_income': 'NUMERIC',
-                    'net_sales_manager_income': 'NUMERIC'
+                    'net_sales_manager_income': 'NUMERIC',
+                    'search_text': 'TEXT'
+                },
+                'transactions': {
+                    'search_text': 'TEXT',
+                    'posting_seq': 'INTEGER',
+                    'balance_after': 'NUMERIC'
+                },
+                'recalculation_jobs': {
+                    'mode': "VARCHAR(10) NOT NULL DEFAULT 'chunked'",
+                    'heartbeat_at': 'DATETIME'
                 }
+            }
 
-                missing = [col for col in expected_columns.keys() if col not in existing_cols]
+            for table_name, columns in expected_columns.items():
+                if table_name not in existing_tables:
+                    continue
+                existing_cols = {c['name'] for c in inspector.get_columns(table_name)}
+                missing = [col for col in columns.keys() if col not in existing_cols]
                 if missing:
-                    conn = engine.connect()
-                    for col in missing:
-                        col_type = expected_columns[col]
-                        # SQLite ALTER TABLE ADD COLUMN is limited but supports adding simple columns
-                        try:
-                            conn.execute(f'ALTER TABLE sales ADD COLUMN {col} {col_type}');
-                        except Exception:
-                            # If add fails, ignore and continue — we'll surface runtime errors elsewhere
-                            pass
-                    conn.close()
+                    with engine.begin() as conn:
+                        for col in missing:
+                            col_type = columns[col]
+                            # SQLite ALTER TABLE ADD COLUMN is limited but supports adding simple columns
+                            try:
+                                conn.execute(text(
+                                    f'ALTER TABLE {table_name} ADD COLUMN {col} {col_type}'
+                                ))
+                            except Exception:
+                                # If add fails, ignore and continue — we'll surface runtime errors elsewhere
+                                pass
         except Exception:
             # Don't break app initialization on best-effort migration attempt
             pass
 
+        # Indexes may cover the columns added above
+        create_missing_indexes()
+
+        # Number and chain ledger entries of databases that predate the
+        # ledger columns (also after rows were added with Core statements),
+        # and fill the daily snapshots and rollups of databases that predate them
+        from src.models.transaction import Transaction
+        from src.models.treasury_snapshot import TreasuryDailyRollup, TreasuryDailySnapshot
+        unsequenced = db.session.query(Transaction.id).filter(Transaction.posting_seq.is_(None)).first()
+        unsnapshotted = (db.session.query(TreasuryDailySnapshot.day).first() is None
+                         or db.session.query(TreasuryDailyRollup.day).first() is None) \
+            and db.session.query(Transaction.id).first() is not None
+        if unsequenced or unsnapshotted:
+            Transaction.rebuild_ledger()
+            db.session.commit()
+
+        # Search needs the shadow columns above, so it is prepared last
+        from src.utils.search import ensure_search_indexes
+        ensure_search_indexes(db.engine)
@@ -0,0 +1,71 @@
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import cast, func, type_coerce
+from sqlalchemy.types import TypeDecorator, Numeric, BigInteger
+
+NUMERIC_STORAGE = 'numeric'
+MINOR_UNITS_STORAGE = 'minor_units'
+MONEY_STORAGE_MODES = (NUMERIC_STORAGE, MINOR_UNITS_STORAGE)
+
+_CENT = Decimal('0.01')
+
+# Storage mode of the bound database, set once by init_db before the first
+# query. SQLAlchemy memoizes the dialect implementation per type, so the mode
+# cannot be switched for a running process; converting a database is done
+# with migrate_money_storage.py and a restart.
+_money_storage = {'mode': NUMERIC_STORAGE}
+
+def set_money_storage(mode):
+    """Select how Money columns are stored ('numeric' or 'minor_units')"""
+    if mode not in MONEY_STORAGE_MODES:
+        raise ValueError(f'Unknown money storage mode: {mode}')
+    _money_storage['mode'] = mode
+
+def get_money_storage():
+    return _money_storage['mode']
+
+def to_piasters(value):
+    """Convert a pound amount (Decimal, float, int or str) to integer piasters"""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int(value.quantize(_CENT, rounding=ROUND_HALF_UP).scaleb(2))
+
+def from_piasters(value):
+    """Convert integer piasters back to a two-place Decimal pound amount"""
+    return Decimal(int(value)).scaleb(-2)
+
+class Money(TypeDecorator):
+    """Pound amount stored either as NUMERIC(15, 2) or as integer piasters.
+
+    Application code always reads and writes Decimal pounds; in the
+    minor-unit mode the column holds a BIGINT number of piasters, so SQL SUM
+    and arithmetic run on exact integers instead of SQLite REALs.
+    """
+    impl = Numeric(15, 2)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if get_money_storage() == MINOR_UNITS_STORAGE:
+            return dialect.type_descriptor(BigInteger())
+        return dialect.type_descriptor(Numeric(15, 2))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or get_money_storage() != MINOR_UNITS_STORAGE:
+            return value
+        return to_piasters(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None or get_money_storage() != MINOR_UNITS_STORAGE:
+            return value
+        return from_piasters(value)
+
+def sql_piasters(expression):
+    """SQL expression reading a Money column (or expression) as integer piasters"""
+    if get_money_storage() == MINOR_UNITS_STORAGE:
+        return cast(expression, BigInteger)
+    return cast(func.round(type_coerce(expression, Numeric) * 100), BigInteger)
+
+def sql_money_value(piasters):
+    """SQL expression turning integer piasters into the value a Money column stores"""
+    if get_money_storage() == MINOR_UNITS_STORAGE:
+        return piasters
+    return piasters / 100.0
@@ -0,0 +1,55 @@
+from datetime import datetime
+from .database import db
+from .money import Money
+
+class RecalculationJob(db.Model):
+    """Progress of a chunked re-rating of existing sales after a rate change"""
+    __tablename__ = 'recalculation_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    property_type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed, cancelled
+    mode = db.Column(db.String(10), nullable=False, default='chunked')  # chunked, sql
+    chunk_size = db.Column(db.Integer, nullable=False, default=500)
+    total_sales = db.Column(db.Integer, nullable=False, default=0)
+    processed_sales = db.Column(db.Integer, nullable=False, default=0)
+    batches_committed = db.Column(db.Integer, nullable=False, default=0)
+    last_sale_id = db.Column(db.Integer, nullable=False, default=0)
+    net_adjustment = db.Column(Money(), nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # Touched by the worker after every commit; an active job whose heartbeat
+    # stops has lost its thread (see fail_orphaned_jobs)
+    heartbeat_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    ACTIVE_STATUSES = ('pending', 'running')
+    RESUMABLE_STATUSES = ('failed', 'cancelled')
+
+    def __repr__(self):
+        return f'<RecalculationJob {self.id} {self.property_type}: {self.status}>'
+
+    def to_dict(self):
+        progress = 100.0 if self.status == 'completed' else 0.0
+        if self.total_sales and self.status != 'completed':
+            progress = round(100.0 * self.processed_sales / self.total_sales, 1)
+        return {
+            'id': self.id,
+            'property_type': self.property_type,
+            'status': self.status,
+            'mode': self.mode,
+            'chunk_size': self.chunk_size,
+            'total_sales': self.total_sales,
+            'processed_sales': self.processed_sales,
+            'batches_committed': self.batches_committed,
+            'progress': progress,
+            'net_adjustment': float(self.net_adjustment or 0),
+            'error': self.error,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None
+        }
@@ -0,0 +1,91 @@
+import json
+from datetime import datetime
+from sqlalchemy import bindparam, update
+from .database import db
+from .money import Money
+
+# Entries per checkpoint: block k covers posting_seq k*SIZE+1 .. (k+1)*SIZE,
+# which is also the finest transaction range a discrepancy is reported at
+CHECKPOINT_BLOCK_SIZE = 1000
+
+class LedgerCheckpoint(db.Model):
+    """Verified count and amount total of one block of posting sequence numbers.
+
+    The reconciliation job sums the transactions of a block once and keeps
+    the result here; later runs only re-sum blocks past the verified
+    frontier and blocks marked stale because an entry in them was edited or
+    deleted (see mark_checkpoints_stale).
+    """
+    __tablename__ = 'ledger_checkpoints'
+
+    block = db.Column(db.Integer, primary_key=True)
+    through_seq = db.Column(db.Integer, nullable=False)  # highest posting_seq verified in the block
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+    amount_total = db.Column(Money(), nullable=False, default=0)
+    stale = db.Column(db.Boolean, nullable=False, default=False)
+    verified_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<LedgerCheckpoint {self.block} through {self.through_seq}: {self.amount_total}>'
+
+    @staticmethod
+    def block_of(posting_seq):
+        return (posting_seq - 1) // CHECKPOINT_BLOCK_SIZE
+
+    @staticmethod
+    def block_range(block):
+        """First and last posting_seq of a block"""
+        return block * CHECKPOINT_BLOCK_SIZE + 1, (block + 1) * CHECKPOINT_BLOCK_SIZE
+
+class ReconciliationRun(db.Model):
+    """Result of one treasury reconciliation (see src/utils/reconciliation.py)"""
+    __tablename__ = 'reconciliation_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, balanced, discrepancy, failed
+    full = db.Column(db.Boolean, nullable=False, default=False)
+    through_seq = db.Column(db.Integer, nullable=False, default=0)
+    blocks_checked = db.Column(db.Integer, nullable=False, default=0)
+    entries_checked = db.Column(db.Integer, nullable=False, default=0)
+    ledger_total = db.Column(Money(), nullable=True)
+    treasury_balance = db.Column(Money(), nullable=True)
+    difference = db.Column(Money(), nullable=True)  # treasury_balance - ledger_total
+    discrepancies = db.Column(db.Text, nullable=True)  # JSON list
+    error = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    FINISHED_STATUSES = ('balanced', 'discrepancy')
+
+    def __repr__(self):
+        return f'<ReconciliationRun {self.id}: {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'full': self.full,
+            'through_seq': self.through_seq,
+            'blocks_checked': self.blocks_checked,
+            'entries_checked': self.entries_checked,
+            'ledger_total': float(self.ledger_total) if self.ledger_total is not None else None,
+            'treasury_balance': float(self.treasury_balance) if self.treasury_balance is not None else None,
+            'difference': float(self.difference) if self.difference is not None else None,
+            'discrepancies': json.loads(self.discrepancies) if self.discrepancies else [],
+            'error': self.error,
+            'created_by': self.created_by,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+# Built once; the blocks are bound per call
+_mark_stale_statement = update(LedgerCheckpoint.__table__) \
+    .where(LedgerCheckpoint.__table__.c.block.in_(bindparam('blocks', expanding=True))) \
+    .values(stale=True)
+
+def mark_checkpoints_stale(connection, posting_seqs):
+    """Flag the checkpoints covering edited or deleted entries for re-verification (no commit)"""
+    blocks = sorted({LedgerCheckpoint.block_of(seq) for seq in posting_seqs})
+    if blocks:
+        connection.execute(_mark_stale_statement, {'blocks': blocks})
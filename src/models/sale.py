@@ -1,6 +1,169 @@
 from datetime import datetime, date
 from .database import db
-from decimal import Decimal
+from .money import Money, sql_piasters
+from .table_version import TableVersion
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import BigInteger, and_, case, cast, event, func, or_
+from src.utils.search import SEARCH_SOURCES, build_search_text
+from src.utils.fieldsets import as_float, as_isoformat, serialize
+
+def _scaled_column(values, size, default=0, scale=2):
+    """Convert a column (or a scalar broadcast to `size` rows) to scaled integers.
+
+    Returns (ints, scale) such that ints[i] / 10**scale equals the Decimal the
+    scalar engine would build from values[i], so no precision is lost. For long
+    columns of distinct values `scale` is a first guess that grows if any value
+    carries more decimal places.
+    """
+    if values is None or isinstance(values, (int, float, Decimal, str)):
+        values = [values]
+    elif len(values) != size:
+        raise ValueError('All input columns must have the same length')
+
+    # Rate columns hold a handful of distinct values: convert each one once, at the
+    # smallest scale that represents all of them (smaller integers are cheaper)
+    sample = values[:64]
+    if len(values) == 1 or len(set(sample)) * 2 <= len(sample):
+        distinct = list(dict.fromkeys(values))
+        if len(distinct) * 2 <= len(values) or len(values) == 1:
+            decimals = [value if type(value) is Decimal else Decimal(str(value or default))
+                        for value in distinct]
+            scale = max([0] + [-d.normalize().as_tuple().exponent for d in decimals])
+            mapping = {value: int(d.scaleb(scale)) for value, d in zip(distinct, decimals)}
+            if len(values) == 1:
+                return [mapping[distinct[0]]] * size, scale
+            return [mapping[value] for value in values], scale
+
+    # Values loaded from Numeric columns are already Decimals; anything else goes
+    # through str() exactly like the scalar engine
+    decimals = [value if type(value) is Decimal else Decimal(str(value or default))
+                for value in values]
+    factor = Decimal(10) ** scale
+    scaled = [d * factor for d in decimals]
+    ints = [int(x) for x in scaled]
+    if ints == scaled:
+        return ints, scale
+    needed = max(-d.as_tuple().exponent for d in decimals)
+    return _scaled_column(decimals, size, default, needed)
+
+def _rescale(ints, scale, target):
+    """Bring a scaled-integer column from `scale` up to `target`."""
+    if scale == target:
+        return ints
+    factor = 10 ** (target - scale)
+    return [i * factor for i in ints]
+
+def _amount_coefficients(rates, rate_unit):
+    """Multipliers of the unit price for each batch output, at scale 2*rate_scale + 1.
+
+    Every amount in calculate_sale_amounts is the unit price times a factor that
+    depends only on the rates, so a sale's amounts are exact integer products.
+    """
+    (company, salesperson, incentive, vat, sales_tax, annual_tax,
+     salesperson_tax, sales_manager_tax) = rates
+    salesperson_total = salesperson + incentive
+    return (
+        company * rate_unit * 10,                       # company_commission_amount
+        salesperson * rate_unit * 10,                   # salesperson_commission_amount
+        incentive * rate_unit * 10,                     # salesperson_incentive_amount
+        company * rate_unit,                            # sales_manager_commission_amount (10%)
+        company * vat * 10,                             # vat_amount
+        company * sales_tax * 10,                       # sales_tax_amount
+        company * annual_tax * 10,                      # annual_tax_amount
+        salesperson_total * salesperson_tax * 10,       # salesperson_tax_amount
+        company * sales_manager_tax,                    # sales_manager_tax_amount
+        company * (rate_unit * 9 - (vat + sales_tax + annual_tax) * 10 - sales_manager_tax),
+        salesperson_total * (rate_unit - salesperson_tax) * 10,
+        company * (rate_unit - sales_manager_tax),      # net_sales_manager_income
+    )
+
+_BATCH_AMOUNT_FIELDS = (
+    'company_commission_amount', 'salesperson_commission_amount', 'salesperson_incentive_amount',
+    'sales_manager_commission_amount', 'vat_amount', 'sales_tax_amount', 'annual_tax_amount',
+    'salesperson_tax_amount', 'sales_manager_tax_amount', 'net_company_income',
+    'net_salesperson_income', 'net_sales_manager_income'
+)
+
+_BATCH_CHUNK_ROWS = 8192
+
+def _round_products(prices, coefficients, divisor):
+    """Round price * coefficient to piasters, ROUND_HALF_UP like Decimal.quantize.
+
+    `coefficients` is a single int shared by every row or one int per row.
+    """
+    half = divisor // 2
+    non_negative_prices = not prices or min(prices) >= 0
+    if isinstance(coefficients, int):
+        k = coefficients
+        if k >= 0 and non_negative_prices:
+            return [(p * k + half) // divisor for p in prices]
+        products = [p * k for p in prices]
+    elif non_negative_prices and min(coefficients) >= 0:
+        return [(p * k + half) // divisor for p, k in zip(prices, coefficients)]
+    else:
+        products = [p * k for p, k in zip(prices, coefficients)]
+    return [(x + half) // divisor if x >= 0 else -((half - x) // divisor) for x in products]
+
+# Rates are stored as Numeric(5, 4), so the SQL formulas work at a fixed rate
+# scale: coefficients are at scale 2*4 + 1 and amounts divide by 10**9
+_SQL_RATE_SCALE = 4
+_SQL_RATE_UNIT = 10 ** _SQL_RATE_SCALE
+_SQL_AMOUNT_DIVISOR = 10 ** (2 * _SQL_RATE_SCALE + 1)
+
+_SQL_RATE_ARGUMENTS = (
+    'company_commission_rate', 'salesperson_commission_rate', 'salesperson_incentive_rate',
+    'vat_rate', 'sales_tax_rate', 'annual_tax_rate', 'salesperson_tax_rate', 'sales_manager_tax_rate'
+)
+
+def _sql_rate(value, column):
+    """Rate as an integer at _SQL_RATE_SCALE: a literal for a given value, else the row's column"""
+    if column is not None:
+        return cast(func.round(func.coalesce(column, 0) * _SQL_RATE_UNIT), BigInteger)
+    scaled = Decimal(str(value or 0)).scaleb(_SQL_RATE_SCALE)
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f'Rate {value} has more than {_SQL_RATE_SCALE} decimal places')
+    return int(scaled)
+
+def _sql_round_product(price, coefficient):
+    """SQL for price * coefficient / _SQL_AMOUNT_DIVISOR with ROUND_HALF_UP.
+
+    The product can exceed 64 bits, so the price is split into high and low
+    parts and the quotient is assembled from pieces that each fit (prices up
+    to 10**13 piasters). Integer division truncates in SQLite and PostgreSQL,
+    hence the work on absolute values and the sign applied at the end.
+    """
+    split, shift = 10 ** 5, _SQL_AMOUNT_DIVISOR // 10 ** 5
+    abs_price = func.abs(price)
+    abs_coefficient = abs(coefficient) if isinstance(coefficient, int) else func.abs(coefficient)
+    high = abs_price // split * abs_coefficient
+    low = abs_price % split * abs_coefficient
+    rounded = high // shift + ((high % shift) * split + low + _SQL_AMOUNT_DIVISOR // 2) // _SQL_AMOUNT_DIVISOR
+
+    if isinstance(coefficient, int):
+        negative = price < 0 if coefficient >= 0 else price >= 0
+    else:
+        negative = or_(and_(coefficient < 0, price >= 0), and_(coefficient >= 0, price < 0))
+    return case((negative, -rounded), else_=rounded)
+
+RATE_FIELDS = (
+    'company_commission_rate', 'salesperson_commission_rate', 'salesperson_incentive_rate',
+    'additional_incentive_tax_rate', 'vat_rate', 'sales_tax_rate', 'annual_tax_rate',
+    'sales_manager_commission_rate'
+)
+
+class RateProfile(namedtuple('RateProfile', ('id', 'property_type') + RATE_FIELDS)):
+    """Immutable snapshot of a PropertyTypeRates row (rates as Decimals)"""
+    __slots__ = ()
+
+    def to_dict(self):
+        data = {'id': self.id, 'property_type': self.property_type}
+        for field in RATE_FIELDS:
+            data[field] = float(getattr(self, field) or 0)
+        return data
+
+# Process-local rate profile cache: (table version it was loaded at, profiles by type)
+_rate_profile_cache = (None, {})
 
 class PropertyTypeRates(db.Model):
     """Property type rates for commissions and taxes"""
@@ -34,20 +197,64 @@ class PropertyTypeRates(db.Model):
             'sales_manager_commission_rate': float(self.sales_manager_commission_rate)
         }
 
+    @classmethod
+    def get_rate_profiles(cls):
+        """All rate profiles keyed by property type, served from the process cache.
+
+        The rates table changes a few times a year, so each call only checks the
+        shared table version and reloads the rows when another worker changed it.
+        """
+        global _rate_profile_cache
+        version = TableVersion.get_version(cls.__tablename__)
+        cached_version, profiles = _rate_profile_cache
+        if cached_version == version:
+            return profiles
+
+        # Read the version before the rows: a concurrent change then shows up as
+        # a newer version on the next call instead of being cached as current
+        rows = cls.query.order_by(cls.id).all()
+        profiles = {
+            row.property_type: RateProfile(row.id, row.property_type,
+                                           *(getattr(row, field) for field in RATE_FIELDS))
+            for row in rows
+        }
+        _rate_profile_cache = (version, profiles)
+        return profiles
+
+    @classmethod
+    def invalidate_rate_profiles(cls):
+        """Mark cached profiles stale in every worker; commits with the caller's transaction"""
+        global _rate_profile_cache
+        TableVersion.bump(cls.__tablename__)
+        _rate_profile_cache = (None, {})
+
     @classmethod
     def get_rates_for_property_type(cls, property_type):
-        """Get rates for a specific property type"""
-        return cls.query.filter_by(property_type=property_type).first()
+        """Get the cached, immutable rate profile for a specific property type"""
+        return cls.get_rate_profiles().get(property_type)
 
 class Sale(db.Model):
     """Sale model for real estate transactions with enhanced calculation support"""
     __tablename__ = 'sales'
+    __table_args__ = (
+        # Newest-first listing and its keyset cursor
+        db.Index('ix_sales_created_at_id', 'created_at', 'id'),
+        # Property type filter and the re-rating job's keyset walk
+        db.Index('ix_sales_property_type_id', 'property_type', 'id'),
+        # Sale date ranges and monthly revenue (covering)
+        db.Index('ix_sales_sale_date_unit_price', 'sale_date', 'unit_price'),
+        # Revenue/income totals and per-type breakdown read this instead of the wide rows
+        db.Index('ix_sales_property_type_totals', 'property_type', 'unit_price', 'net_company_income'),
+        # Project and salesperson filters and their facet counts
+        db.Index('ix_sales_project_name', 'project_name'),
+        db.Index('ix_sales_salesperson_name', 'salesperson_name'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     client_name = db.Column(db.String(255), nullable=False)
     sale_date = db.Column(db.Date, nullable=False)
     unit_code = db.Column(db.String(100), unique=True, nullable=False)
-    unit_price = db.Column(db.Numeric(15, 2), nullable=False)
+    unit_price = db.Column(Money(), nullable=False)
     property_type = db.Column(db.String(50), nullable=False)
     project_name = db.Column(db.String(255), nullable=True)
     salesperson_name = db.Column(db.String(255), nullable=True)
@@ -67,25 +274,28 @@ class Sale(db.Model):
     sales_manager_tax_rate = db.Column(db.Numeric(5, 4), nullable=True, default=0)
 
     # Calculated amounts (based on Excel logic)
-    company_commission_amount = db.Column(db.Numeric(15, 2), nullable=False)
-    salesperson_commission_amount = db.Column(db.Numeric(15, 2), nullable=True, default=0)
-    salesperson_incentive_amount = db.Column(db.Numeric(15, 2), nullable=True, default=0)
-    sales_manager_commission_amount = db.Column(db.Numeric(15, 2), nullable=True, default=0)
+    company_commission_amount = db.Column(Money(), nullable=False)
+    salesperson_commission_amount = db.Column(Money(), nullable=True, default=0)
+    salesperson_incentive_amount = db.Column(Money(), nullable=True, default=0)
+    sales_manager_commission_amount = db.Column(Money(), nullable=True, default=0)
     # Legacy support columns still present in existing SQLite (keep optional)
-    total_company_commission_before_tax = db.Column(db.Numeric(15, 2), nullable=True, default=0)
-    total_salesperson_incentive_paid = db.Column(db.Numeric(15, 2), nullable=True, default=0)
+    total_company_commission_before_tax = db.Column(Money(), nullable=True, default=0)
+    total_salesperson_incentive_paid = db.Column(Money(), nullable=True, default=0)
 
     # Tax amounts
-    vat_amount = db.Column(db.Numeric(15, 2), nullable=True, default=0)
-    sales_tax_amount = db.Column(db.Numeric(15, 2), nullable=True, default=0)
-    annual_tax_amount = db.Column(db.Numeric(15, 2), nullable=True, default=0)
-    salesperson_tax_amount = db.Column(db.Numeric(15, 2), nullable=True, default=0)
-    sales_manager_tax_amount = db.Column(db.Numeric(15, 2), nullable=True, default=0)
+    vat_amount = db.Column(Money(), nullable=True, default=0)
+    sales_tax_amount = db.Column(Money(), nullable=True, default=0)
+    annual_tax_amount = db.Column(Money(), nullable=True, default=0)
+    salesperson_tax_amount = db.Column(Money(), nullable=True, default=0)
+    sales_manager_tax_amount = db.Column(Money(), nullable=True, default=0)
 
     # Net amounts
-    net_company_income = db.Column(db.Numeric(15, 2), nullable=False)
-    net_salesperson_income = db.Column(db.Numeric(15, 2), nullable=True, default=0)
-    net_sales_manager_income = db.Column(db.Numeric(15, 2), nullable=True, default=0)
+    net_company_income = db.Column(Money(), nullable=False)
+    net_salesperson_income = db.Column(Money(), nullable=True, default=0)
+    net_sales_manager_income = db.Column(Money(), nullable=True, default=0)
+
+    # Normalized client/unit/project/salesperson text for search (see src/utils/search.py)
+    search_text = db.Column(db.Text, nullable=True)
 
     # Foreign key to transaction
     transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), unique=True, nullable=True)
@@ -94,49 +304,92 @@ class Sale(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # to_dict() field -> JSON converter (None: already JSON-ready); also the
+    # names accepted by the APIs' `fields` parameter
+    DICT_FIELDS = {
+        'id': None,
+        'client_name': None,
+        'sale_date': as_isoformat,
+        'unit_code': None,
+        'unit_price': as_float,
+        'property_type': None,
+        'project_name': None,
+        'salesperson_name': None,
+        'sales_manager_name': None,
+        'notes': None,
+        'company_commission_rate': as_float,
+        'salesperson_commission_rate': as_float,
+        'salesperson_incentive_rate': as_float,
+        'additional_incentive_tax_rate': as_float,
+        'vat_rate': as_float,
+        'sales_tax_rate': as_float,
+        'annual_tax_rate': as_float,
+        'salesperson_tax_rate': as_float,
+        'sales_manager_tax_rate': as_float,
+        'company_commission_amount': as_float,
+        'salesperson_commission_amount': as_float,
+        'salesperson_incentive_amount': as_float,
+        'sales_manager_commission_amount': as_float,
+        'total_company_commission_before_tax': as_float,
+        'total_salesperson_incentive_paid': as_float,
+        'vat_amount': as_float,
+        'sales_tax_amount': as_float,
+        'annual_tax_amount': as_float,
+        'salesperson_tax_amount': as_float,
+        'sales_manager_tax_amount': as_float,
+        'net_company_income': as_float,
+        'net_salesperson_income': as_float,
+        'net_sales_manager_income': as_float,
+        'created_by': None,
+        'transaction_id': None,
+        'created_at': as_isoformat,
+        'updated_at': as_isoformat,
+    }
+
     def __repr__(self):
         return f'<Sale {self.unit_code} - {self.client_name}>'
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'client_name': self.client_name,
-            'sale_date': self.sale_date.isoformat() if self.sale_date else None,
-            'unit_code': self.unit_code,
-            'unit_price': float(self.unit_price or 0),
-            'property_type': self.property_type,
-            'project_name': self.project_name,
-            'salesperson_name': self.salesperson_name,
-            'sales_manager_name': self.sales_manager_name,
-            'notes': self.notes,
-            'company_commission_rate': float(self.company_commission_rate or 0),
-            'salesperson_commission_rate': float(self.salesperson_commission_rate or 0),
-            'salesperson_incentive_rate': float(self.salesperson_incentive_rate or 0),
-            'additional_incentive_tax_rate': float(self.additional_incentive_tax_rate or 0),
-            'vat_rate': float(self.vat_rate or 0),
-            'sales_tax_rate': float(self.sales_tax_rate or 0),
-            'annual_tax_rate': float(self.annual_tax_rate or 0),
-            'salesperson_tax_rate': float(self.salesperson_tax_rate or 0),
-            'sales_manager_tax_rate': float(self.sales_manager_tax_rate or 0),
-            'company_commission_amount': float(self.company_commission_amount or 0),
-            'salesperson_commission_amount': float(self.salesperson_commission_amount or 0),
-            'salesperson_incentive_amount': float(self.salesperson_incentive_amount or 0),
-            'sales_manager_commission_amount': float(self.sales_manager_commission_amount or 0),
-            'total_company_commission_before_tax': float(self.total_company_commission_before_tax or 0),
-            'total_salesperson_incentive_paid': float(self.total_salesperson_incentive_paid or 0),
-            'vat_amount': float(self.vat_amount or 0),
-            'sales_tax_amount': float(self.sales_tax_amount or 0),
-            'annual_tax_amount': float(self.annual_tax_amount or 0),
-            'salesperson_tax_amount': float(self.salesperson_tax_amount or 0),
-            'sales_manager_tax_amount': float(self.sales_manager_tax_amount or 0),
-            'net_company_income': float(self.net_company_income or 0),
-            'net_salesperson_income': float(self.net_salesperson_income or 0),
-            'net_sales_manager_income': float(self.net_sales_manager_income or 0),
-            'created_by': self.created_by,
-            'transaction_id': self.transaction_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    def to_dict(self, fields=None):
+        """JSON-ready dict of the sale, limited to `fields` when given (see DICT_FIELDS)"""
+        return serialize(self, self.DICT_FIELDS, fields)
+
+    def post_income(self, user_id=None, transaction_date=None):
+        """Bring the linked income transaction in line with net_company_income (no commit).
+
+        The linked transaction carries max(net_company_income, 0); it is created
+        the first time the sale has a positive net income and kept afterwards.
+        The treasury moves by the change in its amount, so the balance stays
+        the sum of the transactions. The sale must already have an id (flushed).
+        Returns that change.
+        """
+        from .transaction import Transaction
+        from .treasury import Treasury
+
+        amount = max(Decimal(str(self.net_company_income or 0)), Decimal('0'))
+        transaction = db.session.get(Transaction, self.transaction_id) if self.transaction_id else None
+        if transaction is None:
+            if not amount:
+                return Decimal('0')
+            transaction = Transaction(
+                type=Transaction.SALE_INCOME_TYPE,
+                amount=amount,
+                transaction_date=transaction_date or datetime.now(),
+                user_id=user_id,
+                related_entity_id=self.id,
+                related_entity_type='sale'
+            )
+            db.session.add(transaction)
+            delta = amount
+        else:
+            delta = amount - Decimal(str(transaction.amount))
+            transaction.amount = amount
+        transaction.description = Transaction.sale_income_description(self.unit_code, self.client_name)
+        db.session.flush()
+        self.transaction_id = transaction.id
+
+        if delta:
+            Treasury.increment(delta)
+        return delta
 
     @classmethod
     def calculate_sale_amounts(cls, unit_price, company_commission_rate,
@@ -209,3 +462,126 @@ class Sale(db.Model):
             'net_salesperson_income': net_salesperson_income,
             'net_sales_manager_income': net_sales_manager_income
         }
+
+    @classmethod
+    def amount_sql_expressions(cls, **rates):
+        """SQL counterparts of calculate_sale_amounts for set-based updates
+
+        Keyword arguments are rates to apply (as in calculate_sale_amounts);
+        any rate not given is read from each sale's own column. The unit price
+        always comes from the row. Every expression evaluates to integer
+        piasters, rounded exactly like calculate_sale_amounts_batch.
+
+        Returns:
+            Dictionary with the same keys as calculate_sale_amounts, each mapped
+            to a SQL expression over the sales table
+        """
+        unknown = set(rates) - set(_SQL_RATE_ARGUMENTS)
+        if unknown:
+            raise TypeError(f"Unknown rate(s): {', '.join(sorted(unknown))}")
+
+        price = sql_piasters(func.coalesce(cls.unit_price, 0))
+        rate_ints = tuple(
+            _sql_rate(rates[name], None) if name in rates else _sql_rate(None, getattr(cls, name))
+            for name in _SQL_RATE_ARGUMENTS
+        )
+        coefficients = _amount_coefficients(rate_ints, _SQL_RATE_UNIT)
+        amounts = {field: _sql_round_product(price, k) for field, k in zip(_BATCH_AMOUNT_FIELDS, coefficients)}
+        amounts['total_company_commission_before_tax'] = amounts['company_commission_amount']
+        amounts['total_salesperson_incentive_paid'] = amounts['salesperson_incentive_amount']
+        return amounts
+
+    @classmethod
+    def calculate_sale_amounts_batch(cls, unit_prices, company_commission_rates,
+                                     salesperson_commission_rates=0, salesperson_incentive_rates=0,
+                                     vat_rates=0.14, sales_tax_rates=0.05, annual_tax_rates=0.225,
+                                     salesperson_tax_rates=0, sales_manager_tax_rates=0):
+        """
+        Columnar version of calculate_sale_amounts for re-rating many sales at once
+
+        Every argument is either a sequence with one entry per sale or a single
+        value applied to all rows. The formulas are evaluated in exact scaled-integer
+        arithmetic, so each output equals the scalar result rounded to piasters
+        with ROUND_HALF_UP.
+
+        Returns:
+            Dictionary with the same keys as calculate_sale_amounts, each mapped to
+            a list of integer amounts in piasters (divide by 100 for EGP)
+        """
+        if isinstance(unit_prices, (int, float, Decimal, str)):
+            unit_prices = [unit_prices]
+        size = len(unit_prices)
+
+        # The company rate has no default: the scalar engine fails on None, so must this one
+        if company_commission_rates is None or (
+                not isinstance(company_commission_rates, (int, float, Decimal, str))
+                and None in company_commission_rates):
+            raise InvalidOperation('company_commission_rate is required')
+
+        prices, price_scale = _scaled_column(unit_prices, size)
+        rate_columns = [
+            _scaled_column(company_commission_rates, size),
+            _scaled_column(salesperson_commission_rates, size),
+            _scaled_column(salesperson_incentive_rates, size),
+            _scaled_column(vat_rates, size),
+            _scaled_column(sales_tax_rates, size),
+            _scaled_column(annual_tax_rates, size),
+            _scaled_column(salesperson_tax_rates, size),
+            _scaled_column(sales_manager_tax_rates, size),
+        ]
+        rate_scale = max(scale for _, scale in rate_columns)
+        rate_ints = [_rescale(ints, scale, rate_scale) for ints, scale in rate_columns]
+        rate_unit = 10 ** rate_scale
+
+        # price * coefficient is the exact amount at scale price_scale + 2*rate_scale + 1
+        amount_scale = price_scale + 2 * rate_scale + 1
+        if amount_scale < 2:
+            prices = [p * 10 ** (2 - amount_scale) for p in prices]
+            amount_scale = 2
+        divisor = 10 ** (amount_scale - 2)
+
+        # Sales share a few rate combinations, so each combination's coefficients
+        # are computed once and every output column is a single pass over the prices
+        rate_inputs = (company_commission_rates, salesperson_commission_rates,
+                       salesperson_incentive_rates, vat_rates, sales_tax_rates, annual_tax_rates,
+                       salesperson_tax_rates, sales_manager_tax_rates)
+        if size and all(rates is None or isinstance(rates, (int, float, Decimal, str))
+                        for rates in rate_inputs):
+            rate_keys = [tuple(ints[0] for ints in rate_ints)]
+        else:
+            rate_keys = list(zip(*rate_ints))
+        table = {key: _amount_coefficients(key, rate_unit) for key in dict.fromkeys(rate_keys)}
+        if len(table) <= 1:
+            coefficients = next(iter(table.values()), (0,) * len(_BATCH_AMOUNT_FIELDS))
+            columns = [_round_products(prices, k, divisor) for k in coefficients]
+        else:
+            # Gather per-row coefficients in slices to keep the working set small
+            columns = [[] for _ in _BATCH_AMOUNT_FIELDS]
+            for start in range(0, size, _BATCH_CHUNK_ROWS):
+                chunk_prices = prices[start:start + _BATCH_CHUNK_ROWS]
+                per_row = [table[key] for key in rate_keys[start:start + _BATCH_CHUNK_ROWS]]
+                for j, column in enumerate(columns):
+                    column.extend(_round_products(chunk_prices, [row[j] for row in per_row], divisor))
+
+        amounts = dict(zip(_BATCH_AMOUNT_FIELDS, columns))
+        return {
+            'company_commission_amount': amounts['company_commission_amount'],
+            'salesperson_commission_amount': amounts['salesperson_commission_amount'],
+            'salesperson_incentive_amount': amounts['salesperson_incentive_amount'],
+            'sales_manager_commission_amount': amounts['sales_manager_commission_amount'],
+            'total_company_commission_before_tax': list(amounts['company_commission_amount']),
+            'total_salesperson_incentive_paid': list(amounts['salesperson_incentive_amount']),
+            'vat_amount': amounts['vat_amount'],
+            'sales_tax_amount': amounts['sales_tax_amount'],
+            'annual_tax_amount': amounts['annual_tax_amount'],
+            'salesperson_tax_amount': amounts['salesperson_tax_amount'],
+            'sales_manager_tax_amount': amounts['sales_manager_tax_amount'],
+            'net_company_income': amounts['net_company_income'],
+            'net_salesperson_income': amounts['net_salesperson_income'],
+            'net_sales_manager_income': amounts['net_sales_manager_income']
+        }
+
+@event.listens_for(Sale, 'before_insert')
+@event.listens_for(Sale, 'before_update')
+def _update_sale_search_text(mapper, connection, target):
+    target.search_text = build_search_text(*(getattr(target, name) for name in SEARCH_SOURCES['sales']))
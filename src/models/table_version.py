@@ -0,0 +1,81 @@
+from datetime import datetime
+from itertools import chain
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+from .database import db
+
+# Tables whose version is bumped automatically by every ORM write (flushes and
+# bulk insert/update/delete statements), for caches and HTTP validators of
+# query results over them
+TRACKED_TABLES = frozenset({'sales', 'transactions', 'treasury'})
+
+class TableVersion(db.Model):
+    """Per-table change counters shared by every worker process.
+
+    In-process caches remember the version they were built from and compare it
+    with this table (a single primary-key read) to notice writes made by other
+    workers.
+    """
+    __tablename__ = 'table_versions'
+
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TableVersion {self.table_name}: {self.version}>'
+
+    @classmethod
+    def get_version(cls, table_name):
+        """Current version of a table (0 if it was never bumped)"""
+        version = db.session.execute(
+            select(cls.version).where(cls.table_name == table_name)
+        ).scalar()
+        return version or 0
+
+    @classmethod
+    def get_versions(cls, table_names):
+        """Current versions of several tables in one query, as {table: version}"""
+        rows = db.session.execute(
+            select(cls.table_name, cls.version).where(cls.table_name.in_(table_names))
+        ).all()
+        versions = dict.fromkeys(table_names, 0)
+        versions.update(rows)
+        return versions
+
+    @classmethod
+    def bump(cls, table_name):
+        """Increment a table's version inside the caller's transaction (no commit)"""
+        _bump_tables(db.session, [table_name])
+
+def _bump_tables(session, table_names):
+    """Increment versions on the session's connection, so it also works mid-flush"""
+    connection = session.connection()
+    versions = TableVersion.__table__
+    now = datetime.utcnow()
+    for table_name in sorted(table_names):
+        result = connection.execute(
+            update(versions)
+            .where(versions.c.table_name == table_name)
+            .values(version=versions.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(versions).values(table_name=table_name, version=1, updated_at=now))
+
+@event.listens_for(Session, 'before_flush')
+def _bump_flushed_tables(session, flush_context, instances):
+    changed = {
+        getattr(type(obj), '__tablename__', None)
+        for obj in chain(session.new, session.deleted, (o for o in session.dirty if session.is_modified(o)))
+    }
+    changed &= TRACKED_TABLES
+    if changed:
+        _bump_tables(session, changed)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bump_bulk_tables(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    target = getattr(orm_execute_state.statement, 'table', None)
+    if target is not None and target.name in TRACKED_TABLES:
+        _bump_tables(orm_execute_state.session, [target.name])
@@ -1,37 +1,111 @@
 from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import bindparam, event, func, inspect, select, tuple_, update
+from sqlalchemy.orm import Session, column_property, object_session
 from .database import db
+from .money import Money, get_money_storage, sql_money_value, sql_piasters, to_piasters
+from .treasury_snapshot import post_daily_changes, rebuild_daily_snapshots
+from .reconciliation import mark_checkpoints_stale
+from src.utils.search import SEARCH_SOURCES, build_search_text
+from src.utils.fieldsets import as_float, as_isoformat, serialize
 
 class Transaction(db.Model):
     """Transaction model for all financial transactions"""
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Newest-first listing and its keyset cursor
+        db.Index('ix_transactions_transaction_date_id', 'transaction_date', 'id'),
+        # Type filter with the same newest-first order
+        db.Index('ix_transactions_type_transaction_date_id', 'type', 'transaction_date', 'id'),
+        # Income/expense totals (amount sign) read from the index alone
+        db.Index('ix_transactions_amount', 'amount'),
+        # Ledger order for balance history and re-chaining after backdated entries
+        db.Index('ix_transactions_ledger', 'transaction_date', 'posting_seq'),
+        db.Index('ix_transactions_posting_seq', 'posting_seq', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    type = db.Column(db.String(50), nullable=False)  # 'Sale', 'Expense', 'Deposit', etc.
-    amount = db.Column(db.Numeric(15, 2), nullable=False)  # Positive for income, negative for expense
+    # Ledger inputs load their previous value before being overwritten, so the
+    # flush events can take back what an edited entry posted
+    type = column_property(db.Column(db.String(50), nullable=False), active_history=True)  # 'Sale', 'Expense', 'Deposit', etc.
+    amount = column_property(db.Column(Money(), nullable=False), active_history=True)  # Positive for income, negative for expense
     description = db.Column(db.Text, nullable=True)
-    transaction_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    transaction_date = column_property(db.Column(db.DateTime, nullable=False, default=datetime.utcnow),
+                                       active_history=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     related_entity_id = db.Column(db.Integer, nullable=True)  # ID of related entity (e.g., Sale.id)
     related_entity_type = db.Column(db.String(50), nullable=True)  # Type of related entity (e.g., 'Sale')
+    # Normalized description/type text for search (see src/utils/search.py)
+    search_text = db.Column(db.Text, nullable=True)
+
+    # Ledger: posting_seq numbers entries in the order they were posted (never
+    # reused); balance_after is the running sum of amounts in
+    # (transaction_date, posting_seq) order. Both are maintained by the mapper
+    # events below; rows written with Core/bulk statements need rebuild_ledger().
+    posting_seq = db.Column(db.Integer, nullable=True)
+    balance_after = db.Column(Money(), nullable=True)
     
     # Relationship with sales (one-to-one)
     sale = db.relationship('Sale', backref='transaction', uselist=False)
+
+    # Type of a sale's linked net income entry (see Sale.post_income)
+    SALE_INCOME_TYPE = 'إيراد من بيع عقار'
     
+    # to_dict() field -> JSON converter (None: already JSON-ready); also the
+    # names accepted by the APIs' `fields` parameter
+    DICT_FIELDS = {
+        'id': None,
+        'type': None,
+        'amount': float,
+        'description': None,
+        'transaction_date': as_isoformat,
+        'user_id': None,
+        'related_entity_id': None,
+        'related_entity_type': None,
+        'balance_after': as_float,
+    }
+
     def __repr__(self):
         return f'<Transaction {self.type}: {self.amount}>'
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'type': self.type,
-            'amount': float(self.amount),
-            'description': self.description,
-            'transaction_date': self.transaction_date.isoformat() if self.transaction_date else None,
-            'user_id': self.user_id,
-            'related_entity_id': self.related_entity_id,
-            'related_entity_type': self.related_entity_type
-        }
+    def to_dict(self, fields=None):
+        """JSON-ready dict of the transaction, limited to `fields` when given (see DICT_FIELDS)"""
+        return serialize(self, self.DICT_FIELDS, fields)
     
+    @classmethod
+    def ledger_head_balance(cls):
+        """balance_after of the latest entry in ledger order (0 when there are none)"""
+        balance = db.session.execute(
+            select(cls.balance_after)
+            .order_by(cls.transaction_date.desc(), cls.posting_seq.desc())
+            .limit(1)
+        ).scalar()
+        return balance if balance is not None else Decimal('0')
+
+    @classmethod
+    def rebuild_ledger(cls):
+        """Number unsequenced entries and recompute every running balance and
+        daily snapshot (no commit).
+
+        Set-based statements with window functions, for existing databases and
+        rows inserted with Core statements.
+        """
+        table = cls.__table__
+        next_seq = (db.session.execute(select(func.max(table.c.posting_seq))).scalar() or 0) + 1
+        numbered = select(
+            table.c.id, (func.row_number().over(order_by=table.c.id) + next_seq - 1).label('seq')
+        ).where(table.c.posting_seq.is_(None)).subquery()
+        db.session.execute(update(table).values(posting_seq=numbered.c.seq).where(table.c.id == numbered.c.id))
+
+        connection = db.session.connection()
+        _rechain(connection)
+        rebuild_daily_snapshots(connection, table)
+
+    @staticmethod
+    def sale_income_description(unit_code, client_name):
+        """Description of a sale's linked net income entry"""
+        return f'صافي إيراد من بيع الوحدة {unit_code} - {client_name}'
+
     @classmethod
     def create_sale_transaction(cls, sale_data, user_id=None):
         """Create a transaction for a sale"""
@@ -61,3 +135,106 @@ class Transaction(db.Model):
         
         return transaction
 
+@event.listens_for(Transaction, 'before_insert')
+@event.listens_for(Transaction, 'before_update')
+def _update_transaction_search_text(mapper, connection, target):
+    target.search_text = build_search_text(*(getattr(target, name) for name in SEARCH_SOURCES['transactions']))
+
+# ----------------------------------------------------------------------------
+# Ledger maintenance. After a flush the running balances are recomputed from
+# the earliest ledger position it touched, with one windowed UPDATE over the
+# (transaction_date, posting_seq) index; for entries dated now that is just
+# the new rows at the end of the ledger. The daily snapshots and rollups are
+# updated from the same postings.
+# ----------------------------------------------------------------------------
+
+# Ledger statements per money storage mode, built once (positions and the
+# starting balance are bound per call)
+_ledger_statements = {}
+
+def _ledger_statement(name):
+    mode = get_money_storage()
+    statements = _ledger_statements.get(mode)
+    if statements is None:
+        table = Transaction.__table__
+        ledger = tuple_(table.c.transaction_date, table.c.posting_seq)
+        position = tuple_(bindparam('date', type_=table.c.transaction_date.type),
+                          bindparam('seq', type_=table.c.posting_seq.type))
+        running = select(
+            table.c.id,
+            func.sum(sql_piasters(table.c.amount)).over(
+                order_by=(table.c.transaction_date, table.c.posting_seq), rows=(None, 0)
+            ).label('piasters')
+        )
+
+        def rechain(rows):
+            rows = rows.subquery()
+            return update(table) \
+                .values(balance_after=sql_money_value(rows.c.piasters + bindparam('base'))) \
+                .where(table.c.id == rows.c.id)
+
+        statements = _ledger_statements[mode] = {
+            'previous': select(table.c.balance_after).where(ledger < position)
+                .order_by(table.c.transaction_date.desc(), table.c.posting_seq.desc()).limit(1),
+            'rechain_from': rechain(running.where(ledger >= position)),
+            'rechain_all': rechain(running),
+        }
+    return statements[name]
+
+def _rechain(connection, position=None):
+    """Recompute balance_after from `position` ((date, posting_seq)) to the end; None: everything"""
+    if position is None:
+        connection.execute(_ledger_statement('rechain_all'), {'base': 0})
+        return
+    date, seq = position
+    previous = connection.execute(_ledger_statement('previous'), {'date': date, 'seq': seq}).scalar()
+    base = to_piasters(previous) if previous is not None else 0
+    connection.execute(_ledger_statement('rechain_from'), {'date': date, 'seq': seq, 'base': base})
+
+def _committed_value(target, name):
+    history = inspect(target).attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(target, name)
+
+@event.listens_for(Session, 'before_flush')
+def _reset_ledger_numbering(session, flush_context, instances):
+    # A failed flush may have left its counter behind
+    session.info.pop('ledger_next_seq', None)
+
+@event.listens_for(Transaction, 'before_insert')
+def _number_ledger_entry(mapper, connection, target):
+    if target.transaction_date is None:
+        target.transaction_date = datetime.utcnow()
+    # The flush already holds the write lock (table versions were bumped), so
+    # no other writer can take the same numbers
+    session = object_session(target)
+    next_seq = session.info.get('ledger_next_seq')
+    if next_seq is None:
+        next_seq = (connection.execute(select(func.max(Transaction.posting_seq))).scalar() or 0) + 1
+    target.posting_seq = next_seq
+    session.info['ledger_next_seq'] = next_seq + 1
+
+@event.listens_for(Session, 'after_flush')
+def _post_flushed_entries(session, flush_context):
+    session.info.pop('ledger_next_seq', None)
+    # new/dirty/deleted and attribute history still show the pre-flush state
+    # here. Postings are (transaction_date, posting_seq, type, amount, sign);
+    # sign -1 takes back the committed version of an edited or deleted entry.
+    postings = [(obj.transaction_date, obj.posting_seq, obj.type, obj.amount, 1)
+                for obj in session.new if isinstance(obj, Transaction)]
+    for obj in session.dirty:
+        if isinstance(obj, Transaction) and obj.posting_seq is not None:
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in ('amount', 'transaction_date', 'type')):
+                postings.append((_committed_value(obj, 'transaction_date'), obj.posting_seq,
+                                 _committed_value(obj, 'type'), _committed_value(obj, 'amount'), -1))
+                postings.append((obj.transaction_date, obj.posting_seq, obj.type, obj.amount, 1))
+    postings += [(_committed_value(obj, 'transaction_date'), obj.posting_seq, _committed_value(obj, 'type'),
+                  _committed_value(obj, 'amount'), -1)
+                 for obj in session.deleted if isinstance(obj, Transaction) and obj.posting_seq is not None]
+    if postings:
+        connection = session.connection()
+        _rechain(connection, min((date, seq) for date, seq, _, _, _ in postings))
+        post_daily_changes(connection, [(date, entry_type, amount, sign)
+                                        for date, _, entry_type, amount, sign in postings])
+        # Entries already verified by the reconciliation job are checked again
+        mark_checkpoints_stale(connection, [seq for _, seq, _, _, sign in postings if sign < 0])
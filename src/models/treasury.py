@@ -1,12 +1,20 @@
 from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
 from .database import db
+from .money import Money, get_money_storage, sql_money_value, sql_piasters, to_piasters
+
+# Treasury.increment()'s UPDATE, per money storage mode
+_increment_statements = {}
 
 class Treasury(db.Model):
     """Treasury model for company balance management"""
     __tablename__ = 'treasury'
     
     id = db.Column(db.Integer, primary_key=True)
-    current_balance = db.Column(db.Numeric(15, 2), nullable=False, default=0.00)
+    current_balance = db.Column(Money(), nullable=False, default=0.00)
     last_updated = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     def __repr__(self):
@@ -40,29 +48,69 @@ class Treasury(db.Model):
         return treasury
 
     @classmethod
-    def set_balance(cls, new_balance: float):
-        """Set absolute balance value and update timestamp."""
-        treasury = cls.get_current()
-        treasury.current_balance = float(new_balance)
-        treasury.last_updated = datetime.utcnow()
-        db.session.commit()
-        return treasury.current_balance
+    def set_balance(cls, new_balance, now=None):
+        """Set the absolute balance; does not commit. Returns (old_balance, new_balance).
+
+        increment(0) takes the write lock and returns the balance under it, so
+        the difference posted next cannot be computed from a stale read.
+        """
+        now = now or datetime.utcnow()
+        old_balance = cls.increment(0, now)
+        delta = Decimal(str(new_balance)) - Decimal(str(old_balance))
+        return old_balance, cls.increment(delta, now)
+
+    @classmethod
+    def _increment_statement(cls):
+        # Built once per money storage mode; delta and timestamp are bound per call
+        mode = get_money_storage()
+        statement = _increment_statements.get(mode)
+        if statement is None:
+            new_balance = sql_money_value(sql_piasters(cls.current_balance) + bindparam('delta_piasters'))
+            statement = update(cls.__table__) \
+                .where(cls.id == select(func.min(cls.id)).scalar_subquery()) \
+                .values(current_balance=new_balance, last_updated=bindparam('now')) \
+                .returning(cls.id, cls.current_balance)
+            _increment_statements[mode] = statement
+        return statement
+
+    @classmethod
+    def increment(cls, delta, now=None):
+        """Add `delta` (negative to subtract) to the balance; does not commit.
+
+        Runs as one `UPDATE treasury SET current_balance = current_balance + delta`,
+        so concurrent writers cannot lose each other's changes, and the change
+        commits or rolls back with the caller's transaction. The sum is taken in
+        whole piasters. Returns the new balance.
+        """
+        now = now or datetime.utcnow()
+        row = db.session.execute(cls._increment_statement(),
+                                 {'delta_piasters': to_piasters(delta), 'now': now}).first()
+        if row is None:
+            treasury = cls(current_balance=delta, last_updated=now)
+            db.session.add(treasury)
+            db.session.flush()
+            return treasury.current_balance
+
+        # Keep a treasury object already loaded in this session in step
+        treasury = db.session.identity_map.get(identity_key(cls, row.id))
+        if treasury is not None:
+            set_committed_value(treasury, 'current_balance', row.current_balance)
+            set_committed_value(treasury, 'last_updated', now)
+        return row.current_balance
 
     @classmethod
     def add_to_balance(cls, amount: float):
-        treasury = cls.get_current()
-        treasury.current_balance = float(treasury.current_balance) + float(amount)
-        treasury.last_updated = datetime.utcnow()
+        """Kept for older callers: increment() followed by a commit"""
+        new_balance = cls.increment(amount)
         db.session.commit()
-        return treasury.current_balance
+        return new_balance
 
     @classmethod
     def subtract_from_balance(cls, amount: float):
-        treasury = cls.get_current()
-        treasury.current_balance = float(treasury.current_balance) - float(amount)
-        treasury.last_updated = datetime.utcnow()
+        """Kept for older callers: increment() followed by a commit"""
+        new_balance = cls.increment(-amount)
         db.session.commit()
-        return treasury.current_balance
+        return new_balance
 
     @classmethod
     def get_current_balance(cls):
@@ -72,7 +120,7 @@ class Treasury(db.Model):
     @classmethod
     def update_balance(cls, amount, description=None):
         """Update treasury balance by adding/subtracting amount and log txn."""
-        new_balance = cls.add_to_balance(amount)
+        new_balance = cls.increment(amount)
         # Create a transaction record
         from .transaction import Transaction
         transaction = Transaction(
@@ -84,4 +132,3 @@ class Treasury(db.Model):
         db.session.add(transaction)
         db.session.commit()
         return new_balance
-
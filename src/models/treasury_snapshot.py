@@ -0,0 +1,247 @@
+from datetime import timedelta
+from decimal import Decimal
+from sqlalchemy import bindparam, case, func, insert, select, update
+from .database import db
+from .money import Money, from_piasters, get_money_storage, sql_money_value, sql_piasters, to_piasters
+
+class TreasuryDailySnapshot(db.Model):
+    """Per-day totals of the transaction ledger.
+
+    One row per day that has entries: income and expense (both positive) and
+    the ledger balance before and after the day, so balance series are range
+    reads of this table instead of sums over every transaction. Rows are kept
+    in step by the transaction flush events (see post_daily_changes); rows
+    written with Core statements need Transaction.rebuild_ledger().
+    """
+    __tablename__ = 'treasury_daily_snapshots'
+
+    day = db.Column(db.Date, primary_key=True)
+    opening_balance = db.Column(Money(), nullable=False, default=0)
+    closing_balance = db.Column(Money(), nullable=False, default=0)
+    income = db.Column(Money(), nullable=False, default=0)
+    expense = db.Column(Money(), nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<TreasuryDailySnapshot {self.day}: {self.closing_balance}>'
+
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat(),
+            'opening_balance': float(self.opening_balance),
+            'closing_balance': float(self.closing_balance),
+            'income': float(self.income),
+            'expense': float(self.expense),
+        }
+
+    @classmethod
+    def closing_before(cls, day):
+        """Ledger balance at the start of `day` (0 before the first entry)"""
+        balance = db.session.execute(
+            select(cls.closing_balance).where(cls.day < day).order_by(cls.day.desc()).limit(1)
+        ).scalar()
+        return balance if balance is not None else Decimal('0')
+
+    @classmethod
+    def daily_series(cls, start, end):
+        """One dict per day from `start` to `end` (dates, inclusive).
+
+        A primary-key seek for the balance before `start` plus one range read;
+        days without entries carry the previous closing balance.
+        """
+        closing = cls.closing_before(start)
+        snapshots = {row.day: row for row in cls.query.filter(cls.day >= start, cls.day <= end).order_by(cls.day)}
+        series = []
+        day = start
+        while day <= end:
+            row = snapshots.get(day)
+            if row is None:
+                series.append({'day': day.isoformat(), 'opening_balance': float(closing),
+                               'closing_balance': float(closing), 'income': 0.0, 'expense': 0.0})
+            else:
+                series.append(row.to_dict())
+                closing = row.closing_balance
+            day += timedelta(days=1)
+        return series
+
+    @classmethod
+    def closing_balances(cls, days):
+        """Ledger balance at the end of each of `days`, as {day: Decimal}, from one range read"""
+        if not days:
+            return {}
+        first, last = min(days), max(days)
+        closing = cls.closing_before(first)
+        rows = db.session.execute(
+            select(cls.day, cls.closing_balance).where(cls.day >= first, cls.day <= last).order_by(cls.day)
+        ).all()
+        balances = {}
+        index = 0
+        for day in sorted(days):
+            while index < len(rows) and rows[index].day <= day:
+                closing = rows[index].closing_balance
+                index += 1
+            balances[day] = closing
+        return balances
+
+
+class TreasuryDailyRollup(db.Model):
+    """Count and total of the entries of each (day, type, sign).
+
+    sign is 1 for income, -1 for expenses and 0 for zero amounts. The
+    treasury dashboard reads its period totals and type summary from these
+    rows, a bounded number per day, instead of filtering the transactions.
+    Maintained together with the daily snapshots.
+    """
+    __tablename__ = 'treasury_daily_rollups'
+
+    day = db.Column(db.Date, primary_key=True)
+    type = db.Column(db.String(50), primary_key=True)
+    sign = db.Column(db.SmallInteger, primary_key=True)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(Money(), nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<TreasuryDailyRollup {self.day} {self.type} {self.sign}: {self.entry_count}>'
+
+    @classmethod
+    def rows_since(cls, day):
+        """(day, type, sign, entry_count, total) of every rollup from `day` on, in one range read"""
+        return db.session.execute(
+            select(cls.day, cls.type, cls.sign, cls.entry_count, cls.total)
+            .where(cls.day >= day, cls.entry_count > 0)
+        ).all()
+
+# ----------------------------------------------------------------------------
+# Maintenance. A flush that posts, edits or removes transactions changes the
+# totals of the days involved and shifts the balances of every later day; for
+# entries dated today that is one primary-key UPDATE per table (plus an INSERT
+# for the day's or type's first entry) and a shift that matches no rows.
+# ----------------------------------------------------------------------------
+
+# Statements per money storage mode, built once (days and amounts are bound per call)
+_snapshot_statements = {}
+
+def _snapshot_statement(name):
+    mode = get_money_storage()
+    statements = _snapshot_statements.get(mode)
+    if statements is None:
+        table = TreasuryDailySnapshot.__table__
+        rollups = TreasuryDailyRollup.__table__
+        day = bindparam('on_day', type_=table.c.day.type)
+
+        def plus(column, name):
+            return sql_money_value(sql_piasters(column) + bindparam(name))
+
+        statements = _snapshot_statements[mode] = {
+            'previous': select(table.c.closing_balance).where(table.c.day < day)
+                .order_by(table.c.day.desc()).limit(1),
+            'post': update(table).where(table.c.day == day).values(
+                income=plus(table.c.income, 'income_piasters'),
+                expense=plus(table.c.expense, 'expense_piasters'),
+                closing_balance=plus(table.c.closing_balance, 'net_piasters'),
+            ),
+            'insert': insert(table),
+            'shift': update(table).where(table.c.day > day).values(
+                opening_balance=plus(table.c.opening_balance, 'net_piasters'),
+                closing_balance=plus(table.c.closing_balance, 'net_piasters'),
+            ),
+            'post_rollup': update(rollups).where(
+                rollups.c.day == day,
+                rollups.c.type == bindparam('of_type', type_=rollups.c.type.type),
+                rollups.c.sign == bindparam('of_sign', type_=rollups.c.sign.type),
+            ).values(
+                entry_count=rollups.c.entry_count + bindparam('count_delta'),
+                total=plus(rollups.c.total, 'total_piasters'),
+            ),
+            'insert_rollup': insert(rollups),
+        }
+    return statements[name]
+
+def _amount_sign(piasters):
+    return (piasters > 0) - (piasters < 0)
+
+def post_daily_changes(connection, postings):
+    """Apply ledger changes to the daily snapshots and rollups (no commit).
+
+    `postings` holds (transaction_date, type, amount, sign) tuples: sign 1
+    adds an entry, -1 takes back one that was posted before.
+    """
+    changes = {}
+    rollup_changes = {}
+    for when, entry_type, amount, sign in postings:
+        piasters = to_piasters(amount)
+        income, expense = changes.get(when.date(), (0, 0))
+        if piasters > 0:
+            income += sign * piasters
+        else:
+            expense -= sign * piasters
+        changes[when.date()] = (income, expense)
+        key = (when.date(), entry_type, _amount_sign(piasters))
+        count, total = rollup_changes.get(key, (0, 0))
+        rollup_changes[key] = (count + sign, total + sign * piasters)
+
+    for day, (income, expense) in sorted(changes.items()):
+        if not income and not expense:
+            continue
+        net = income - expense
+        posted = connection.execute(_snapshot_statement('post'),
+                                    {'on_day': day, 'income_piasters': income, 'expense_piasters': expense,
+                                     'net_piasters': net})
+        if not posted.rowcount:
+            previous = connection.execute(_snapshot_statement('previous'), {'on_day': day}).scalar()
+            opening = to_piasters(previous) if previous is not None else 0
+            connection.execute(_snapshot_statement('insert'), {
+                'day': day,
+                'opening_balance': from_piasters(opening),
+                'closing_balance': from_piasters(opening + net),
+                'income': from_piasters(income),
+                'expense': from_piasters(expense),
+            })
+        if net:
+            connection.execute(_snapshot_statement('shift'), {'on_day': day, 'net_piasters': net})
+
+    for (day, entry_type, amount_sign), (count, total) in sorted(rollup_changes.items()):
+        if not count and not total:
+            continue
+        posted = connection.execute(_snapshot_statement('post_rollup'), {
+            'on_day': day, 'of_type': entry_type, 'of_sign': amount_sign,
+            'count_delta': count, 'total_piasters': total,
+        })
+        if not posted.rowcount:
+            connection.execute(_snapshot_statement('insert_rollup'), {
+                'day': day, 'type': entry_type, 'sign': amount_sign,
+                'entry_count': count, 'total': from_piasters(total),
+            })
+
+def rebuild_daily_snapshots(connection, transactions):
+    """Recompute every snapshot and rollup from the `transactions` table (no commit).
+
+    Two INSERT ... SELECTs grouping the entries by day (and type and sign),
+    with a window sum for the running balances.
+    """
+    table = TreasuryDailySnapshot.__table__
+    rollups = TreasuryDailyRollup.__table__
+    piasters = sql_piasters(transactions.c.amount)
+    day = func.date(transactions.c.transaction_date)
+    net = func.sum(piasters)
+    closing = func.sum(net).over(order_by=day)
+    daily = select(
+        day.label('day'),
+        sql_money_value(closing - net),
+        sql_money_value(closing),
+        sql_money_value(func.sum(case((piasters > 0, piasters), else_=0))),
+        sql_money_value(func.sum(case((piasters < 0, -piasters), else_=0))),
+    ).group_by(day)
+    amount_sign = case((piasters > 0, 1), (piasters < 0, -1), else_=0)
+    by_type = select(
+        day.label('day'),
+        transactions.c.type,
+        amount_sign.label('sign'),
+        func.count(),
+        sql_money_value(net),
+    ).group_by(day, transactions.c.type, amount_sign)
+    connection.execute(table.delete())
+    connection.execute(insert(table).from_select(
+        ['day', 'opening_balance', 'closing_balance', 'income', 'expense'], daily
+    ))
+    connection.execute(rollups.delete())
+    connection.execute(insert(rollups).from_select(['day', 'type', 'sign', 'entry_count', 'total'], by_type))
@@ -5,6 +5,7 @@ from src.models.user import User
 from src.models.treasury import Treasury
 from src.models.transaction import Transaction
 from src.models.sale import Sale
+from src.utils.conditional import conditional_get
 from sqlalchemy import func
 from datetime import datetime, timedelta
 
@@ -18,6 +19,7 @@ def index():
 
 @dashboard_bp.route('/api/dashboard-stats', methods=['GET'])
 @login_required
+@conditional_get('sales', 'transactions', 'treasury', daily=True)
 def dashboard_stats():
     """Get dashboard statistics"""
     try:
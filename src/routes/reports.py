@@ -3,8 +3,10 @@ from flask_login import login_required, current_user
 from src.models.database import db
 from src.models.sale import Sale
 from src.models.transaction import Transaction
+from src.utils.conditional import conditional_get
+from src.utils.numbers import to_decimal
 from datetime import datetime
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, select
 
 reports_bp = Blueprint('reports', __name__)
 
@@ -29,6 +31,7 @@ def index():
 @reports_bp.route('/api/sales-summary')
 @login_required
 @require_permission('view_reports')
+@conditional_get('sales')
 def sales_summary():
     try:
         date_from = request.args.get('date_from')
@@ -46,6 +49,7 @@ def sales_summary():
 @reports_bp.route('/api/transactions-summary')
 @login_required
 @require_permission('view_reports')
+@conditional_get('transactions')
 def transactions_summary():
     try:
         date_from = request.args.get('date_from')
@@ -66,4 +70,114 @@ def transactions_summary():
     except Exception as e:
         return jsonify({'error': f'خطأ في تقرير المعاملات: {str(e)}'}), 500
 
+# Rates a scenario may override; anything not overridden keeps each sale's own rate
+SCENARIO_RATE_FIELDS = {
+    'company_commission_rate': 'company_commission_rates',
+    'salesperson_commission_rate': 'salesperson_commission_rates',
+    'salesperson_incentive_rate': 'salesperson_incentive_rates',
+    'vat_rate': 'vat_rates',
+    'sales_tax_rate': 'sales_tax_rates',
+    'annual_tax_rate': 'annual_tax_rates',
+    'salesperson_tax_rate': 'salesperson_tax_rates',
+    'sales_manager_tax_rate': 'sales_manager_tax_rates',
+}
+SCENARIO_METRICS = (
+    'company_commission_amount', 'vat_amount', 'sales_tax_amount', 'annual_tax_amount',
+    'net_company_income', 'net_salesperson_income', 'net_sales_manager_income'
+)
+SCENARIO_CHUNK_SIZE = 5000
 
+def _scenario_totals(group):
+    """Convert accumulated piasters to the API's float amounts with deltas"""
+    result = {'count': group['count'], 'unit_price': group['unit_price'] / 100}
+    for metric in SCENARIO_METRICS:
+        baseline = group['baseline'][metric]
+        scenario = group['scenario'][metric]
+        result[metric] = {
+            'baseline': baseline / 100,
+            'scenario': scenario / 100,
+            'delta': (scenario - baseline) / 100
+        }
+    return result
+
+def _new_scenario_group():
+    return {
+        'count': 0,
+        'unit_price': 0,
+        'baseline': dict.fromkeys(SCENARIO_METRICS, 0),
+        'scenario': dict.fromkeys(SCENARIO_METRICS, 0)
+    }
+
+@reports_bp.route('/api/rate-scenario', methods=['POST'])
+@login_required
+@require_permission('view_reports')
+def rate_scenario():
+    """What-if: re-price historical sales under hypothetical rates without saving.
+
+    Body: {"overrides": {"company_commission_rate": 0.025, "vat_rate": 0.15, ...},
+           "date_from": "2024-01-01", "date_to": "2024-12-31",
+           "property_type": "شقة", "project_name": "..."}
+    Sales are streamed from the database in chunks and run through the batch
+    calculation engine twice (own rates, then overrides), aggregating by month
+    and property type in a single pass, so memory stays bounded by the chunk size.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        overrides = data.get('overrides') or {}
+        if not isinstance(overrides, dict) or not overrides:
+            return jsonify({'error': 'يجب تحديد نسبة واحدة على الأقل للسيناريو'}), 400
+        unknown = [field for field in overrides if field not in SCENARIO_RATE_FIELDS]
+        if unknown:
+            return jsonify({'error': f'حقول غير معروفة في السيناريو: {", ".join(unknown)}'}), 400
+        scenario_rates = {SCENARIO_RATE_FIELDS[field]: to_decimal(value, 0)
+                          for field, value in overrides.items()}
+
+        columns = [Sale.sale_date, Sale.property_type, Sale.unit_price]
+        columns += [getattr(Sale, field) for field in SCENARIO_RATE_FIELDS]
+        query = select(*columns)
+        if data.get('date_from'):
+            query = query.where(Sale.sale_date >= datetime.strptime(data['date_from'], '%Y-%m-%d').date())
+        if data.get('date_to'):
+            query = query.where(Sale.sale_date <= datetime.strptime(data['date_to'], '%Y-%m-%d').date())
+        if data.get('property_type'):
+            query = query.where(Sale.property_type == data['property_type'])
+        if data.get('project_name'):
+            query = query.where(Sale.project_name == data['project_name'])
+
+        groups = {}
+        overall = _new_scenario_group()
+        result = db.session.execute(query.execution_options(yield_per=SCENARIO_CHUNK_SIZE))
+        for rows in result.partitions():
+            own_rates = {
+                argument: [getattr(row, field) or 0 for row in rows]
+                for field, argument in SCENARIO_RATE_FIELDS.items()
+            }
+            prices = [row.unit_price or 0 for row in rows]
+            baseline = Sale.calculate_sale_amounts_batch(prices, **own_rates)
+            scenario = Sale.calculate_sale_amounts_batch(prices, **{**own_rates, **scenario_rates})
+
+            for i, row in enumerate(rows):
+                key = (row.sale_date.strftime('%Y-%m') if row.sale_date else None, row.property_type)
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = _new_scenario_group()
+                price = int(round((row.unit_price or 0) * 100))
+                for target in (group, overall):
+                    target['count'] += 1
+                    target['unit_price'] += price
+                    for metric in SCENARIO_METRICS:
+                        target['baseline'][metric] += baseline[metric][i]
+                        target['scenario'][metric] += scenario[metric][i]
+
+        return jsonify({
+            'overrides': {field: float(value) for field, value in zip(overrides, scenario_rates.values())},
+            'totals': _scenario_totals(overall),
+            'groups': [
+                {'month': month, 'property_type': property_type, **_scenario_totals(group)}
+                for (month, property_type), group in sorted(groups.items(), key=lambda item: (item[0][0] or '', item[0][1] or ''))
+            ]
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': f'بيانات السيناريو غير صحيحة: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'خطأ في حساب السيناريو: {str(e)}'}), 500
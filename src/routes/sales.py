@@ -1,13 +1,29 @@
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, request, jsonify, render_template, current_app
 from flask_login import login_required, current_user
 from src.models.database import db
 from src.models.sale import Sale, PropertyTypeRates
-from src.models.treasury import Treasury
-from src.models.transaction import Transaction
 from src.models.user import User
+from src.models.recalculation_job import RecalculationJob
+from src.utils.recalculation import (
+    start_recalculation_job, cancel_recalculation_job, resume_recalculation_job, fail_orphaned_jobs,
+    DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE
+)
+from src.utils.search import fts_matches, normalize_search_text
+from src.utils.fieldsets import InvalidFields, load_only_fields, parse_fields, serialize
+from src.utils.export import EXPORT_BATCH_SIZE, EXPORT_FORMATS, XLSX_MAX_ROWS, export_response
+from src.utils.conditional import conditional_get
+from src.utils.facets import facet_counts
+from src.utils.sales_import import (
+    DEFAULT_IMPORT_BATCH_SIZE, MAX_IMPORT_BATCH_SIZE, ImportFileError, import_sales, read_sheet
+)
+from src.utils.pagination import (
+    COUNT_MODES, InvalidCursor, MAX_CURSOR_PAGE_SIZE, count_rows, encode_cursor, keyset_order, keyset_page,
+    offset_page
+)
 from datetime import datetime, timedelta
+from math import ceil
 from decimal import Decimal
-from sqlalchemy import func, desc
+from sqlalchemy import func, select
 
 sales_bp = Blueprint('sales', __name__)
 
@@ -56,60 +72,137 @@ def edit_sale(sale_id):
     sale = Sale.query.get_or_404(sale_id)
     return render_template("sales/form_enhanced.html", sale=sale)
 
+def _sales_filters(args, include_search=True, exclude=None):
+    """Filter criteria shared by the sales list endpoints.
+
+    Filters: search, property type, project, salesperson, month (YYYY-MM) and
+    sale date range. `exclude` names one facet filter to leave out.
+    """
+    criteria = []
+    search = args.get('search', '')
+    date_from = args.get('date_from', '')
+    date_to = args.get('date_to', '')
+
+    if search and include_search:
+        matches = fts_matches(db.engine, 'sales_fts', search)
+        if matches is not None:
+            criteria.append(Sale.id.in_(select(matches.c.id)))
+        else:
+            criteria.append(Sale.search_text.contains(normalize_search_text(search)))
+
+    for name in ('property_type', 'project_name', 'salesperson_name'):
+        value = args.get(name, '')
+        if value and name != exclude:
+            criteria.append(getattr(Sale, name) == value)
+
+    month = args.get('month', '')
+    if month and exclude != 'month':
+        # A date range, so the sale_date index still applies
+        start = datetime.strptime(month, '%Y-%m').date()
+        end = (start + timedelta(days=32)).replace(day=1)
+        criteria.append(Sale.sale_date >= start)
+        criteria.append(Sale.sale_date < end)
+
+    if date_from:
+        criteria.append(Sale.sale_date >= datetime.strptime(date_from, '%Y-%m-%d'))
+
+    if date_to:
+        criteria.append(Sale.sale_date <= datetime.strptime(date_to, '%Y-%m-%d'))
+
+    return criteria
+
+# Sales list facets and the expression each one groups on
+SALES_FACETS = {
+    'property_type': Sale.property_type,
+    'project_name': Sale.project_name,
+    'salesperson_name': Sale.salesperson_name,
+    # strftime is SQLite-only (like the month grouping in get_sales_stats); another
+    # database needs its own YYYY-MM expression here (to_char, date_format)
+    'month': func.strftime('%Y-%m', Sale.sale_date),
+}
+
 # API Routes
 @sales_bp.route('/api/sales', methods=['GET'])
 @login_required
 @require_permission('view_sales')
+@conditional_get('sales')
 def get_sales():
-    """Get all sales with pagination and filtering"""
+    """Get all sales with pagination and filtering.
+
+    Passing `cursor` (empty for the first page) switches to keyset pagination:
+    no total is computed unless `count` asks for one, and each response carries
+    the `next_cursor` token. Without it the classic page/per_page response is
+    returned.
+
+    `count` picks how `total` is computed: `exact` (default for offset pages,
+    cached until the table changes), `estimate` (may reuse a slightly stale
+    total; `total_is_estimate` says so) or `none` (no total or pages).
+    """
     try:
-        page = request.args.get('page', 1, type=int)
+        page = max(request.args.get('page', 1, type=int), 1)
         per_page = request.args.get('per_page', 25, type=int)
-        search = request.args.get('search', '')
-        property_type = request.args.get('property_type', '')
-        date_from = request.args.get('date_from', '')
-        date_to = request.args.get('date_to', '')
-        
+        cursor = request.args.get('cursor')
+        count_mode = request.args.get('count', 'none' if cursor is not None else 'exact')
+        if count_mode not in COUNT_MODES:
+            return jsonify({'error': 'قيمة count غير صالحة'}), 400
+        try:
+            fields = parse_fields(request.args.get('fields'), Sale.DICT_FIELDS)
+        except InvalidFields as e:
+            return jsonify({'error': f'حقول غير معروفة: {e}'}), 400
+
         # Build query
-        query = Sale.query
-        
-        # Apply filters
-        if search:
-            query = query.filter(
-                db.or_(
-                    Sale.client_name.contains(search),
-                    Sale.unit_code.contains(search),
-                    Sale.project_name.contains(search)
-                )
-            )
-        
-        if property_type:
-            query = query.filter(Sale.property_type == property_type)
-        
-        if date_from:
-            query = query.filter(Sale.sale_date >= datetime.strptime(date_from, '%Y-%m-%d'))
-        
-        if date_to:
-            query = query.filter(Sale.sale_date <= datetime.strptime(date_to, '%Y-%m-%d'))
-        
-        # Order by creation date (newest first)
-        query = query.order_by(desc(Sale.created_at))
-        
-        # Paginate
-        pagination = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+        query = Sale.query.filter(*_sales_filters(request.args))
+
+        if cursor is not None:
+            per_page = min(max(per_page, 1), MAX_CURSOR_PAGE_SIZE)
+            if fields:
+                query = query.options(load_only_fields(Sale, fields, Sale.created_at))
+            try:
+                sales, next_cursor = keyset_page(query, Sale.created_at, Sale.id, cursor, per_page)
+            except InvalidCursor:
+                return jsonify({'error': 'مؤشر الصفحة غير صالح'}), 400
+            total, total_is_estimate = count_rows(query, Sale.id, count_mode)
+            return jsonify({
+                'sales': [sale.to_dict(fields) for sale in sales],
+                'total': total,
+                'total_is_estimate': total_is_estimate,
+                'per_page': per_page,
+                'has_next': next_cursor is not None,
+                'next_cursor': next_cursor
+            }), 200
+
+        # Order by creation date (newest first); full-text searches rank best matches first
+        per_page = max(per_page, 1)
+        total, total_is_estimate = count_rows(query, Sale.id, count_mode)
+
+        ranking = fts_matches(db.engine, 'sales_fts', request.args.get('search', ''))
+        if ranking is not None:
+            query = Sale.query.join(ranking, ranking.c.id == Sale.id) \
+                .filter(*_sales_filters(request.args, include_search=False)) \
+                .order_by(ranking.c.rank, *keyset_order(Sale.created_at, Sale.id))
+        else:
+            query = query.order_by(*keyset_order(Sale.created_at, Sale.id))
+        if fields:
+            query = query.options(load_only_fields(Sale, fields, Sale.created_at))
+
+        sales, has_next = offset_page(query, page, per_page)
+
+        # Lets offset clients continue with cursors from here
+        next_cursor = None
+        if has_next:
+            last = sales[-1]
+            next_cursor = encode_cursor(last.created_at, last.id)
         
         return jsonify({
-            'sales': [sale.to_dict() for sale in pagination.items],
-            'total': pagination.total,
-            'pages': pagination.pages,
+            'sales': [sale.to_dict(fields) for sale in sales],
+            'total': total,
+            'total_is_estimate': total_is_estimate,
+            'pages': ceil(total / per_page) if total is not None else None,
             'current_page': page,
             'per_page': per_page,
-            'has_next': pagination.has_next,
-            'has_prev': pagination.has_prev
+            'has_next': has_next,
+            'has_prev': page > 1,
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -117,6 +210,9 @@ def get_sales():
 
 from src.routes.sales_new import create_sale as create_sale_new
 from src.routes.sales_new import calculate_preview as calculate_preview_api
+from src.routes.sales_new import calculate_preview_batch as calculate_preview_batch_api
+from src.routes.sales_new import calculate_preview_cache_stats as calculate_preview_cache_stats_api
+from src.routes.sales_new import get_posting_status as get_posting_status_new
 
 @sales_bp.route("/api/sales", methods=["POST"])
 @login_required
@@ -125,6 +221,13 @@ def create_sale():
     """Create new sale with enhanced calculation logic"""
     return create_sale_new()
 
+@sales_bp.route('/api/postings/<posting_id>', methods=['GET'])
+@login_required
+@require_permission('view_sales')
+def get_posting_status(posting_id):
+    """Check a sale that create_sale answered with 202 (still being committed)"""
+    return get_posting_status_new(posting_id)
+
 
 # Expose calculate-preview endpoint implemented in sales_new through this blueprint
 # so client requests to /sales/api/calculate-preview reach the handler (fixes 405)
@@ -134,18 +237,137 @@ def create_sale():
 def calculate_preview():
     return calculate_preview_api()
 
+@sales_bp.route('/api/calculate-preview/batch', methods=['POST'])
+@login_required
+@require_permission('view_sales')
+def calculate_preview_batch():
+    """Preview a whole floor of units in one round trip"""
+    return calculate_preview_batch_api()
+
+@sales_bp.route('/api/calculate-preview/cache-stats', methods=['GET'])
+@login_required
+@require_permission('view_sales')
+def calculate_preview_cache_stats():
+    return calculate_preview_cache_stats_api()
+
+@sales_bp.route('/api/sales/facets', methods=['GET'])
+@login_required
+@require_permission('view_sales')
+@conditional_get('sales')
+def get_sales_facets():
+    """Counts per property type, project, salesperson and month for the list filters.
+
+    Takes the list endpoint's filters. Each facet is counted under all other
+    active filters, so a count is what the list shows after picking that value.
+    """
+    try:
+        queries = {name: Sale.query.filter(*_sales_filters(request.args, exclude=name))
+                   for name in SALES_FACETS}
+        total, _ = count_rows(Sale.query.filter(*_sales_filters(request.args)), Sale.id)
+        return jsonify({
+            'facets': facet_counts(queries, SALES_FACETS, Sale.id),
+            'total': total
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'خطأ في جلب عدادات التصفية: {str(e)}'}), 500
+
+@sales_bp.route('/api/sales/export', methods=['GET'])
+@login_required
+@require_permission('view_sales')
+@require_permission('export_data')
+def export_sales():
+    """Download the sales matching the list filters as CSV or XLSX.
+
+    Takes the same filters as the list endpoint plus `format` (csv, xlsx) and
+    `fields`. Rows are streamed newest first while they are read, so large
+    exports start at once and use constant memory.
+    """
+    try:
+        export_format = request.args.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': 'صيغة التصدير غير مدعومة'}), 400
+        try:
+            fields = parse_fields(request.args.get('fields'), Sale.DICT_FIELDS) or list(Sale.DICT_FIELDS)
+        except InvalidFields as e:
+            return jsonify({'error': f'حقول غير معروفة: {e}'}), 400
+
+        criteria = _sales_filters(request.args)
+        if export_format == 'xlsx':
+            total, _ = count_rows(Sale.query.filter(*criteria), Sale.id)
+            if total > XLSX_MAX_ROWS:
+                return jsonify({'error': f'عدد الصفوف ({total}) يتجاوز حد ملفات Excel، استخدم صيغة CSV'}), 400
+
+        # Plain column rows instead of ORM objects, fetched in batches
+        statement = select(*(getattr(Sale, name) for name in fields)) \
+            .where(*criteria) \
+            .order_by(*keyset_order(Sale.created_at, Sale.id)) \
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        result = db.session.execute(statement)
+        rows = (serialize(row, Sale.DICT_FIELDS, fields) for row in result)
+        return export_response(export_format, 'sales', fields, rows, sheet_name='المبيعات')
+
+    except Exception as e:
+        return jsonify({'error': f'خطأ في تصدير المبيعات: {str(e)}'}), 500
+
+@sales_bp.route('/api/sales/import', methods=['POST'])
+@login_required
+@require_permission('create_sales')
+def import_sales_file():
+    """Import sales from an uploaded CSV or XLSX sheet.
+
+    Multipart fields: `file`, optional `dry_run` (validate and calculate
+    without writing) and `batch_size`. Each batch commits on its own with one
+    treasury entry for its net income; invalid rows are skipped and listed.
+    """
+    try:
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return jsonify({'error': 'يرجى اختيار ملف للاستيراد'}), 400
+        dry_run = request.form.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        try:
+            batch_size = int(request.form.get('batch_size', DEFAULT_IMPORT_BATCH_SIZE))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'حجم الدفعة غير صحيح'}), 400
+        if batch_size < 1 or batch_size > MAX_IMPORT_BATCH_SIZE:
+            return jsonify({'error': f'حجم الدفعة يجب أن يكون بين 1 و {MAX_IMPORT_BATCH_SIZE}'}), 400
+
+        try:
+            report = import_sales(read_sheet(upload.stream, upload.filename), user_id=current_user.id,
+                                  dry_run=dry_run, batch_size=batch_size)
+        except ImportFileError as e:
+            return jsonify({'error': str(e)}), 400
+
+        report['net_company_income'] = float(report['net_company_income'])
+        if dry_run:
+            message = f'الملف صالح للاستيراد: {report["imported"]} من {report["total_rows"]} معاملة'
+        else:
+            message = f'تم استيراد {report["imported"]} من {report["total_rows"]} معاملة بيع'
+        return jsonify({'message': message, 'report': report})
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'خطأ في استيراد المبيعات: {str(e)}'}), 500
+
 @sales_bp.route('/api/sales/<int:sale_id>', methods=['GET'])
 @login_required
 @require_permission('view_sales')
+@conditional_get('sales')
 def get_sale(sale_id):
-    """Get specific sale"""
+    """Get specific sale (`fields` limits the response to those fields)"""
     try:
-        sale = Sale.query.get_or_404(sale_id)
-        return jsonify(sale.to_dict()), 200
+        try:
+            fields = parse_fields(request.args.get('fields'), Sale.DICT_FIELDS)
+        except InvalidFields as e:
+            return jsonify({'error': f'حقول غير معروفة: {e}'}), 400
+        query = Sale.query.options(load_only_fields(Sale, fields)) if fields else Sale.query
+        sale = query.get_or_404(sale_id)
+        return jsonify(sale.to_dict(fields)), 200
     except Exception as e:
         return jsonify({'error': f'خطأ في جلب معاملة البيع: {str(e)}'}), 500
 
 from src.routes.sales_new import update_sale as update_sale_new
+from src.routes.sales_new import delete_sale as delete_sale_new
 
 @sales_bp.route('/api/sales/<int:sale_id>', methods=['PUT'])
 @login_required
@@ -159,24 +381,7 @@ def update_sale(sale_id):
 @require_permission('delete_sales')
 def delete_sale(sale_id):
     """Delete sale"""
-    try:
-        sale = Sale.query.get_or_404(sale_id)
-        
-        # Delete related transactions
-        Transaction.query.filter_by(reference_type='sale', reference_id=sale_id).delete()
-        
-        # Update treasury balance (subtract the net income)
-        if sale.net_company_income > 0:
-            Treasury.subtract_from_balance(sale.net_company_income)
-        
-        db.session.delete(sale)
-        db.session.commit()
-        
-        return jsonify({'message': 'تم حذف معاملة البيع بنجاح'}), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': f'خطأ في حذف معاملة البيع: {str(e)}'}), 500
+    return delete_sale_new(sale_id)
 
 @sales_bp.route('/api/property-types', methods=['GET'])
 @login_required
@@ -184,8 +389,8 @@ def delete_sale(sale_id):
 def get_property_types():
     """Get all property types with their rates"""
     try:
-        property_types = PropertyTypeRates.query.all()
-        return jsonify([pt.to_dict() for pt in property_types]), 200
+        profiles = PropertyTypeRates.get_rate_profiles()
+        return jsonify([profile.to_dict() for profile in profiles.values()]), 200
     except Exception as e:
         return jsonify({'error': f'خطأ في جلب أنواع العقارات: {str(e)}'}), 500
 
@@ -218,6 +423,7 @@ def create_property_type():
         )
         
         db.session.add(property_type)
+        PropertyTypeRates.invalidate_rate_profiles()
         db.session.commit()
         
         return jsonify({
@@ -253,6 +459,7 @@ def update_property_type(type_id):
             if field in data:
                 setattr(property_type, field, float(data[field]))
         
+        PropertyTypeRates.invalidate_rate_profiles()
         db.session.commit()
         
         return jsonify({
@@ -264,9 +471,118 @@ def update_property_type(type_id):
         db.session.rollback()
         return jsonify({'error': f'خطأ في تحديث أسعار نوع العقار: {str(e)}'}), 500
 
+@sales_bp.route('/api/property-types/<int:type_id>/recalculate', methods=['POST'])
+@login_required
+@require_permission('manage_property_rates')
+def recalculate_property_type(type_id):
+    """Start a background job that re-applies a property type's rates to its sales"""
+    try:
+        property_type = PropertyTypeRates.query.get_or_404(type_id)
+        data = request.get_json(silent=True) or {}
+
+        try:
+            chunk_size = int(data.get('chunk_size', DEFAULT_CHUNK_SIZE))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'حجم الدفعة غير صحيح'}), 400
+        if chunk_size < 1 or chunk_size > MAX_CHUNK_SIZE:
+            return jsonify({'error': f'حجم الدفعة يجب أن يكون بين 1 و {MAX_CHUNK_SIZE}'}), 400
+
+        # 'chunked' re-rates through the Python engine in short transactions;
+        # 'sql' runs one set-based UPDATE (a single longer write lock)
+        mode = data.get('mode', 'chunked')
+        if mode not in ('chunked', 'sql'):
+            return jsonify({'error': "طريقة إعادة الاحتساب يجب أن تكون 'chunked' أو 'sql'"}), 400
+
+        # A job left behind by a dead worker must not block the property type
+        fail_orphaned_jobs()
+        active = RecalculationJob.query.filter(
+            RecalculationJob.property_type == property_type.property_type,
+            RecalculationJob.status.in_(RecalculationJob.ACTIVE_STATUSES)
+        ).first()
+        if active:
+            return jsonify({
+                'error': 'يوجد إعادة احتساب قيد التنفيذ لهذا النوع بالفعل',
+                'job': active.to_dict()
+            }), 409
+
+        job = RecalculationJob(
+            property_type=property_type.property_type,
+            chunk_size=chunk_size,
+            mode=mode,
+            created_by=current_user.id
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        start_recalculation_job(current_app._get_current_object(), job.id, set_based=(mode == 'sql'))
+
+        return jsonify({
+            'message': 'تم بدء إعادة احتساب المبيعات',
+            'job': job.to_dict()
+        }), 202
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'خطأ في بدء إعادة الاحتساب: {str(e)}'}), 500
+
+@sales_bp.route('/api/recalculation-jobs/<int:job_id>', methods=['GET'])
+@login_required
+@require_permission('view_sales')
+def get_recalculation_job(job_id):
+    """Get progress of a recalculation job"""
+    try:
+        job = RecalculationJob.query.get_or_404(job_id)
+        return jsonify(job.to_dict()), 200
+    except Exception as e:
+        return jsonify({'error': f'خطأ في جلب حالة إعادة الاحتساب: {str(e)}'}), 500
+
+@sales_bp.route('/api/recalculation-jobs/<int:job_id>/cancel', methods=['POST'])
+@login_required
+@require_permission('manage_property_rates')
+def cancel_recalculation(job_id):
+    """Cancel a pending or running recalculation job"""
+    try:
+        job = RecalculationJob.query.get_or_404(job_id)
+        if not cancel_recalculation_job(job.id):
+            return jsonify({'error': 'المهمة ليست قيد التنفيذ', 'job': job.to_dict()}), 409
+
+        db.session.refresh(job)
+        return jsonify({'message': 'تم إلغاء إعادة الاحتساب', 'job': job.to_dict()}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'خطأ في إلغاء إعادة الاحتساب: {str(e)}'}), 500
+
+@sales_bp.route('/api/recalculation-jobs/<int:job_id>/resume', methods=['POST'])
+@login_required
+@require_permission('manage_property_rates')
+def resume_recalculation(job_id):
+    """Resume a failed or cancelled recalculation job from its last committed chunk"""
+    try:
+        job = RecalculationJob.query.get_or_404(job_id)
+        active = RecalculationJob.query.filter(
+            RecalculationJob.property_type == job.property_type,
+            RecalculationJob.status.in_(RecalculationJob.ACTIVE_STATUSES)
+        ).first()
+        if active:
+            return jsonify({
+                'error': 'يوجد إعادة احتساب قيد التنفيذ لهذا النوع بالفعل',
+                'job': active.to_dict()
+            }), 409
+        if resume_recalculation_job(current_app._get_current_object(), job.id) is None:
+            return jsonify({'error': 'لا يمكن استئناف هذه المهمة', 'job': job.to_dict()}), 409
+
+        db.session.refresh(job)
+        return jsonify({'message': 'تم استئناف إعادة الاحتساب', 'job': job.to_dict()}), 202
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'خطأ في استئناف إعادة الاحتساب: {str(e)}'}), 500
+
 @sales_bp.route('/api/sales-stats', methods=['GET'])
 @login_required
 @require_permission('view_sales')
+@conditional_get('sales', daily=True)
 def get_sales_stats():
     """Get sales statistics"""
     try:
@@ -1,41 +1,42 @@
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, request, jsonify, render_template, Response
 from flask_login import login_required, current_user
 from src.models.database import db
+from src.models.money import to_piasters
 from src.models.sale import Sale, PropertyTypeRates
 from src.models.treasury import Treasury
 from src.models.transaction import Transaction
 from src.models.user import User
+from src.utils.cache import LRUCache
+from src.utils.numbers import to_decimal
+from src.utils.posting_queue import PostingPending, PostingTimeout, posting_status, submit_posting
 from datetime import datetime, timedelta
 from decimal import Decimal
 from sqlalchemy import func, desc
+import json
 
 sales_bp = Blueprint('sales', __name__)
 
-def _to_decimal(value, default=0):
-    """Robustly convert incoming form values to Decimal.
-    - Treat None/"" as default
-    - Strip spaces, commas, percent signs
-    - Accept numeric types directly
-    """
-    if value is None or value == "":
-        return Decimal(str(default))
-    if isinstance(value, (int, float, Decimal)):
-        return Decimal(str(value))
-    if isinstance(value, str):
-        cleaned = value.strip()
-        # Replace common formatting
-        cleaned = cleaned.replace(',', '').replace('%', '')
-        # Convert Arabic numerals to Western if present
-        arabic_digits = '٠١٢٣٤٥٦٧٨٩'
-        for i, d in enumerate(arabic_digits):
-            cleaned = cleaned.replace(d, str(i))
-        if cleaned == '':
-            return Decimal(str(default))
-        try:
-            return Decimal(cleaned)
-        except Exception:
-            return Decimal(str(default))
-    return Decimal(str(default))
+# Rate fields accepted by the preview endpoints with their form defaults
+PREVIEW_RATE_FIELDS = [
+    ('company_commission_rate', 0),
+    ('salesperson_commission_rate', 0),
+    ('salesperson_incentive_rate', 0),
+    ('vat_rate', 0.14),
+    ('sales_tax_rate', 0.05),
+    ('annual_tax_rate', 0.225),
+    ('salesperson_tax_rate', 0),
+    ('sales_manager_tax_rate', 0),
+]
+
+# Preview results keyed by the normalized Decimal inputs; the enhanced form
+# re-sends identical values on every keystroke
+PREVIEW_CACHE_SIZE = 2048
+preview_cache = LRUCache(maxsize=PREVIEW_CACHE_SIZE)
+
+# Batch previews above this many units are streamed back chunk by chunk
+PREVIEW_BATCH_MAX_UNITS = 5000
+PREVIEW_BATCH_STREAM_THRESHOLD = 100
+PREVIEW_BATCH_CHUNK_SIZE = 100
 
 def require_permission(permission_name):
     """Decorator to require specific permission"""
@@ -141,6 +142,19 @@ def get_sales():
     except Exception as e:
         return jsonify({'error': f'خطأ في جلب المبيعات: {str(e)}'}), 500
 
+def _post_sale(sale_values, user_id):
+    """Record a sale with its net income transaction and treasury increment
+    (no commit; a posting for submit_posting). Returns the sale's dict.
+    """
+    sale = Sale(**sale_values, created_by=user_id)
+    db.session.add(sale)
+    db.session.flush()  # Get the sale ID
+
+    # Linked net income transaction and treasury increment
+    sale.post_income(user_id)
+
+    return sale.to_dict()
+
 @sales_bp.route('/api/sales', methods=['POST'])
 @login_required
 @require_permission('create_sales')
@@ -174,16 +188,16 @@ def create_sale():
             return jsonify({'error': 'تاريخ البيع غير صحيح'}), 400
 
         # Extract rates from form data (convert from percentage to decimal)
-        unit_price = _to_decimal(data.get('unit_price'), 0)
-        company_commission_rate = _to_decimal(data.get('company_commission_rate'), 0)
-        salesperson_commission_rate = _to_decimal(data.get('salesperson_commission_rate'), 0)
-        salesperson_incentive_rate = _to_decimal(data.get('salesperson_incentive_rate'), 0)
-        additional_incentive_tax_rate = _to_decimal(data.get('additional_incentive_tax_rate'), 0)
-        vat_rate = _to_decimal(data.get('vat_rate'), 0.14)
-        sales_tax_rate = _to_decimal(data.get('sales_tax_rate'), 0.05)
-        annual_tax_rate = _to_decimal(data.get('annual_tax_rate'), 0.225)
-        salesperson_tax_rate = _to_decimal(data.get('salesperson_tax_rate'), 0)
-        sales_manager_tax_rate = _to_decimal(data.get('sales_manager_tax_rate'), 0)
+        unit_price = to_decimal(data.get('unit_price'), 0)
+        company_commission_rate = to_decimal(data.get('company_commission_rate'), 0)
+        salesperson_commission_rate = to_decimal(data.get('salesperson_commission_rate'), 0)
+        salesperson_incentive_rate = to_decimal(data.get('salesperson_incentive_rate'), 0)
+        additional_incentive_tax_rate = to_decimal(data.get('additional_incentive_tax_rate'), 0)
+        vat_rate = to_decimal(data.get('vat_rate'), 0.14)
+        sales_tax_rate = to_decimal(data.get('sales_tax_rate'), 0.05)
+        annual_tax_rate = to_decimal(data.get('annual_tax_rate'), 0.225)
+        salesperson_tax_rate = to_decimal(data.get('salesperson_tax_rate'), 0)
+        sales_manager_tax_rate = to_decimal(data.get('sales_manager_tax_rate'), 0)
 
         # Calculate all amounts using the enhanced logic
         calculated_amounts = Sale.calculate_sale_amounts(
@@ -198,23 +212,7 @@ def create_sale():
             sales_manager_tax_rate=sales_manager_tax_rate
         )
 
-        # Create treasury transaction for net company income first
-        transaction = None
-        net_company_income = calculated_amounts['net_company_income']
-        if net_company_income > 0:
-            transaction = Transaction(
-                type='إيراد من بيع عقار',
-                amount=net_company_income,
-                description=f'صافي إيراد من بيع الوحدة {data["unit_code"]} - {data["client_name"]}',
-                transaction_date=datetime.now(),
-                related_entity_type='sale',
-                user_id=current_user.id
-            )
-            db.session.add(transaction)
-            db.session.flush()  # ensure transaction.id is available
-
-        # Create sale record
-        sale = Sale(
+        sale_values = dict(
             client_name=data['client_name'],
             unit_code=data['unit_code'],
             property_type=data['property_type'],
@@ -251,34 +249,39 @@ def create_sale():
             net_company_income=calculated_amounts['net_company_income'],
             net_salesperson_income=calculated_amounts['net_salesperson_income'],
             net_sales_manager_income=calculated_amounts['net_sales_manager_income'],
-
-            transaction_id=transaction.id if transaction is not None else None,
-            created_by=current_user.id
         )
 
-        db.session.add(sale)
-        db.session.flush()  # Get the sale ID
-
-        # Link transaction to sale (set related_entity_id)
-        if transaction is not None:
-            transaction.related_entity_id = sale.id
-            db.session.add(transaction)
-
-        # Update treasury balance
-        if net_company_income > 0:
-            Treasury.add_to_balance(net_company_income)
-
-        db.session.commit()
+        # Written by the posting queue's writer when it is enabled
+        sale = submit_posting(_post_sale, sale_values, current_user.id)
 
         return jsonify({
             'message': 'تم إنشاء معاملة البيع بنجاح',
-            'sale': sale.to_dict()
+            'sale': sale
         }), 201
 
+    except PostingPending as e:
+        # Still being committed: retrying could record the sale twice
+        return jsonify({
+            'message': 'جاري تسجيل معاملة البيع، تحقق من حالتها قبل إعادة المحاولة',
+            'posting_id': e.posting_id,
+            'status': 'pending'
+        }), 202
+    except PostingTimeout:
+        return jsonify({'error': 'انتهت مهلة تسجيل معاملة البيع ولم يتم حفظها، يمكن إعادة المحاولة'}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'خطأ في إنشاء معاملة البيع: {str(e)}'}), 500
 
+@sales_bp.route('/api/postings/<posting_id>', methods=['GET'])
+@login_required
+@require_permission('view_sales')
+def get_posting_status(posting_id):
+    """Outcome of a sale posting that was still being committed when create_sale answered"""
+    status = posting_status(posting_id)
+    if status is None:
+        return jsonify({'error': 'عملية التسجيل غير موجودة'}), 404
+    return jsonify(status), 200
+
 @sales_bp.route('/api/sales/<int:sale_id>', methods=['GET'])
 @login_required
 @require_permission('view_sales')
@@ -290,6 +293,56 @@ def get_sale(sale_id):
     except Exception as e:
         return jsonify({'error': f'خطأ في جلب معاملة البيع: {str(e)}'}), 500
 
+# Sale fields update_sale accepts; a new price, property type or rate
+# recalculates the amounts
+SALE_UPDATABLE_FIELDS = [
+    'client_name', 'unit_code', 'property_type', 'unit_price',
+    'sale_date', 'project_name', 'salesperson_name',
+    'sales_manager_name', 'notes'
+]
+SALE_RATE_FIELDS = [
+    'company_commission_rate', 'salesperson_commission_rate',
+    'salesperson_incentive_rate', 'additional_incentive_tax_rate', 'vat_rate', 'sales_tax_rate',
+    'annual_tax_rate', 'salesperson_tax_rate', 'sales_manager_tax_rate'
+]
+SALE_RECALCULATED_FIELDS = {'unit_price', 'property_type', *SALE_RATE_FIELDS}
+
+def _update_sale(sale_id, changes, user_id):
+    """Apply validated field changes to a sale and bring its amounts and linked
+    income transaction up to date (no commit; a posting for submit_posting).
+    Returns the sale's dict.
+    """
+    sale = db.session.get(Sale, sale_id)
+    if sale is None:
+        raise LookupError('معاملة البيع غير موجودة')
+    for field, value in changes.items():
+        setattr(sale, field, value)
+
+    # Recalculate amounts if needed
+    if SALE_RECALCULATED_FIELDS.intersection(changes):
+        calculated_amounts = Sale.calculate_sale_amounts(
+            unit_price=sale.unit_price,
+            company_commission_rate=sale.company_commission_rate,
+            salesperson_commission_rate=sale.salesperson_commission_rate or 0,
+            salesperson_incentive_rate=sale.salesperson_incentive_rate or 0,
+            vat_rate=sale.vat_rate or 0,
+            sales_tax_rate=sale.sales_tax_rate or 0,
+            annual_tax_rate=sale.annual_tax_rate or 0,
+            salesperson_tax_rate=sale.salesperson_tax_rate or 0,
+            sales_manager_tax_rate=sale.sales_manager_tax_rate or 0
+        )
+
+        # Update calculated amounts
+        for field, value in calculated_amounts.items():
+            setattr(sale, field, value)
+
+        # Move the linked transaction and the treasury by the change
+        # against what the transaction currently carries
+        sale.post_income(user_id)
+
+    sale.updated_at = datetime.now()
+    return sale.to_dict()
+
 @sales_bp.route('/api/sales/<int:sale_id>', methods=['PUT'])
 @login_required
 @require_permission('edit_sales')
@@ -311,110 +364,81 @@ def update_sale(sale_id):
             if existing_sale:
                 return jsonify({'error': 'كود الوحدة موجود بالفعل'}), 400
 
-        # Store old net company income for treasury adjustment
-        old_net_company_income = sale.net_company_income
-
-        # Update basic fields
-        updatable_fields = [
-            'client_name', 'unit_code', 'property_type', 'unit_price',
-            'sale_date', 'project_name', 'salesperson_name',
-            'sales_manager_name', 'notes'
-        ]
-
-        recalculate_needed = False
-
-        for field in updatable_fields:
+        changes = {}
+        for field in SALE_UPDATABLE_FIELDS:
             if field in data:
                 if field == 'sale_date':
                     try:
-                        sale.sale_date = datetime.strptime(data[field], '%Y-%m-%d').date()
+                        changes[field] = datetime.strptime(data[field], '%Y-%m-%d').date()
                     except ValueError:
                         return jsonify({'error': 'تاريخ البيع غير صحيح'}), 400
-                elif field in ['unit_price', 'property_type']:
-                    setattr(sale, field, data[field])
-                    recalculate_needed = True
                 else:
-                    setattr(sale, field, data[field])
+                    changes[field] = data[field]
 
         # Update rates if provided
-        rate_fields = [
-            'company_commission_rate', 'salesperson_commission_rate',
-            'salesperson_incentive_rate', 'additional_incentive_tax_rate', 'vat_rate', 'sales_tax_rate',
-            'annual_tax_rate', 'salesperson_tax_rate', 'sales_manager_tax_rate'
-        ]
-
-        for field in rate_fields:
+        for field in SALE_RATE_FIELDS:
             if field in data:
-                setattr(sale, field, Decimal(str(data[field])))
-                recalculate_needed = True
-
-        # Recalculate amounts if needed
-        if recalculate_needed:
-            calculated_amounts = Sale.calculate_sale_amounts(
-                unit_price=sale.unit_price,
-                company_commission_rate=sale.company_commission_rate,
-                salesperson_commission_rate=sale.salesperson_commission_rate or 0,
-                salesperson_incentive_rate=sale.salesperson_incentive_rate or 0,
-                vat_rate=sale.vat_rate or 0,
-                sales_tax_rate=sale.sales_tax_rate or 0,
-                annual_tax_rate=sale.annual_tax_rate or 0,
-                salesperson_tax_rate=sale.salesperson_tax_rate or 0,
-                sales_manager_tax_rate=sale.sales_manager_tax_rate or 0
-            )
+                changes[field] = Decimal(str(data[field]))
 
-            # Update calculated amounts
-            for field, value in calculated_amounts.items():
-                setattr(sale, field, value)
-
-            # Update treasury balance (subtract old, add new)
-            if old_net_company_income > 0:
-                Treasury.subtract_from_balance(old_net_company_income)
-            if calculated_amounts['net_company_income'] > 0:
-                Treasury.add_to_balance(calculated_amounts['net_company_income'])
-
-            # Update transaction amount if exists
-            if sale.transaction_id:
-                transaction = Transaction.query.get(sale.transaction_id)
-                if transaction:
-                    transaction.amount = calculated_amounts['net_company_income']
-                    transaction.description = f'صافي إيراد من بيع الوحدة {sale.unit_code} - {sale.client_name}'
-                    db.session.add(transaction)
-
-        sale.updated_at = datetime.now()
-        db.session.commit()
+        # Written by the posting queue's writer when it is enabled
+        sale = submit_posting(_update_sale, sale_id, changes, current_user.id)
 
         return jsonify({
             'message': 'تم تحديث معاملة البيع بنجاح',
-            'sale': sale.to_dict()
+            'sale': sale
         }), 200
 
+    except PostingPending as e:
+        # Still being committed: check its status before sending the change again
+        return jsonify({
+            'message': 'جاري تحديث معاملة البيع، تحقق من حالتها قبل إعادة المحاولة',
+            'posting_id': e.posting_id,
+            'status': 'pending'
+        }), 202
+    except PostingTimeout:
+        return jsonify({'error': 'انتهت مهلة تحديث معاملة البيع ولم يتم حفظها، يمكن إعادة المحاولة'}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'خطأ في تحديث معاملة البيع: {str(e)}'}), 500
 
+def _delete_sale(sale_id):
+    """Delete a sale and take back what its linked transaction posted
+    (no commit; a posting for submit_posting)
+    """
+    sale = db.session.get(Sale, sale_id)
+    if sale is None:
+        raise LookupError('معاملة البيع غير موجودة')
+
+    # A sale without a linked transaction never moved the treasury
+    if sale.transaction_id:
+        transaction = db.session.get(Transaction, sale.transaction_id)
+        if transaction:
+            Treasury.increment(-transaction.amount)
+            db.session.delete(transaction)
+
+    db.session.delete(sale)
+
 @sales_bp.route('/api/sales/<int:sale_id>', methods=['DELETE'])
 @login_required
 @require_permission('delete_sales')
 def delete_sale(sale_id):
     """Delete sale"""
     try:
-        sale = Sale.query.get_or_404(sale_id)
-
-        # Delete related transactions
-        if sale.transaction_id:
-            transaction = Transaction.query.get(sale.transaction_id)
-            if transaction:
-                db.session.delete(transaction)
+        Sale.query.get_or_404(sale_id)
 
-        # Update treasury balance (subtract the net income)
-        if sale.net_company_income > 0:
-            Treasury.subtract_from_balance(sale.net_company_income)
-
-        db.session.delete(sale)
-        db.session.commit()
+        # Written by the posting queue's writer when it is enabled
+        submit_posting(_delete_sale, sale_id)
 
         return jsonify({'message': 'تم حذف معاملة البيع بنجاح'}), 200
 
+    except PostingPending as e:
+        return jsonify({
+            'message': 'جاري حذف معاملة البيع، تحقق من حالتها قبل إعادة المحاولة',
+            'posting_id': e.posting_id,
+            'status': 'pending'
+        }), 202
+    except PostingTimeout:
+        return jsonify({'error': 'انتهت مهلة حذف معاملة البيع ولم يتم حذفها، يمكن إعادة المحاولة'}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'خطأ في حذف معاملة البيع: {str(e)}'}), 500
@@ -446,16 +470,25 @@ def calculate_preview():
             return jsonify({'error': 'سعر الوحدة ونسبة عمولة الشركة مطلوبان'}), 400
 
         # Extract rates from form data
-        unit_price = _to_decimal(data.get('unit_price'), 0)
-        company_commission_rate = _to_decimal(data.get('company_commission_rate'), 0)
-        salesperson_commission_rate = _to_decimal(data.get('salesperson_commission_rate'), 0)
-        salesperson_incentive_rate = _to_decimal(data.get('salesperson_incentive_rate'), 0)
-        additional_incentive_tax_rate = _to_decimal(data.get('additional_incentive_tax_rate'), 0)
-        vat_rate = _to_decimal(data.get('vat_rate'), 0.14)
-        sales_tax_rate = _to_decimal(data.get('sales_tax_rate'), 0.05)
-        annual_tax_rate = _to_decimal(data.get('annual_tax_rate'), 0.225)
-        salesperson_tax_rate = _to_decimal(data.get('salesperson_tax_rate'), 0)
-        sales_manager_tax_rate = _to_decimal(data.get('sales_manager_tax_rate'), 0)
+        unit_price = to_decimal(data.get('unit_price'), 0)
+        company_commission_rate = to_decimal(data.get('company_commission_rate'), 0)
+        salesperson_commission_rate = to_decimal(data.get('salesperson_commission_rate'), 0)
+        salesperson_incentive_rate = to_decimal(data.get('salesperson_incentive_rate'), 0)
+        additional_incentive_tax_rate = to_decimal(data.get('additional_incentive_tax_rate'), 0)
+        vat_rate = to_decimal(data.get('vat_rate'), 0.14)
+        sales_tax_rate = to_decimal(data.get('sales_tax_rate'), 0.05)
+        annual_tax_rate = to_decimal(data.get('annual_tax_rate'), 0.225)
+        salesperson_tax_rate = to_decimal(data.get('salesperson_tax_rate'), 0)
+        sales_manager_tax_rate = to_decimal(data.get('sales_manager_tax_rate'), 0)
+
+        # Equal Decimals hash equally ('0.05' == '0.050'), so the parsed tuple is
+        # a normalized key no matter how the form formatted the numbers
+        cache_key = (unit_price, company_commission_rate, salesperson_commission_rate,
+                     salesperson_incentive_rate, vat_rate, sales_tax_rate, annual_tax_rate,
+                     salesperson_tax_rate, sales_manager_tax_rate)
+        result = preview_cache.get(cache_key)
+        if result is not None:
+            return jsonify(result), 200
 
         # Calculate all amounts
         calculated_amounts = Sale.calculate_sale_amounts(
@@ -470,16 +503,120 @@ def calculate_preview():
             sales_manager_tax_rate=sales_manager_tax_rate
         )
 
-        # Convert Decimal to float for JSON serialization
+        # Rounded to piasters as stored (and as the batch preview returns them)
         result = {}
         for key, value in calculated_amounts.items():
-            result[key] = float(value)
+            result[key] = to_piasters(value) / 100
 
+        preview_cache.set(cache_key, result)
         return jsonify(result), 200
 
     except Exception as e:
         return jsonify({'error': f'خطأ في حساب المعاينة: {str(e)}'}), 500
 
+@sales_bp.route('/api/calculate-preview/cache-stats', methods=['GET'])
+@login_required
+@require_permission('view_sales')
+def calculate_preview_cache_stats():
+    """Report preview cache hit/miss counters"""
+    return jsonify(preview_cache.stats()), 200
+
+def _preview_batch_rows(units, columns):
+    """Yield one breakdown per unit followed by the deal totals (in piasters).
+
+    The calculation engine runs on PREVIEW_BATCH_CHUNK_SIZE units at a time so
+    large batches can be written out while the rest is still being computed.
+    """
+    total_price = Decimal('0')
+    totals = {}
+    for start in range(0, len(units), PREVIEW_BATCH_CHUNK_SIZE):
+        end = start + PREVIEW_BATCH_CHUNK_SIZE
+        amounts = Sale.calculate_sale_amounts_batch(
+            unit_prices=columns['unit_price'][start:end],
+            company_commission_rates=columns['company_commission_rate'][start:end],
+            salesperson_commission_rates=columns['salesperson_commission_rate'][start:end],
+            salesperson_incentive_rates=columns['salesperson_incentive_rate'][start:end],
+            vat_rates=columns['vat_rate'][start:end],
+            sales_tax_rates=columns['sales_tax_rate'][start:end],
+            annual_tax_rates=columns['annual_tax_rate'][start:end],
+            salesperson_tax_rates=columns['salesperson_tax_rate'][start:end],
+            sales_manager_tax_rates=columns['sales_manager_tax_rate'][start:end]
+        )
+        for offset, unit in enumerate(units[start:end]):
+            row = {'index': start + offset, 'unit_code': unit.get('unit_code'),
+                   'unit_price': float(columns['unit_price'][start + offset])}
+            total_price += columns['unit_price'][start + offset]
+            for key, values in amounts.items():
+                row[key] = values[offset] / 100
+                totals[key] = totals.get(key, 0) + values[offset]
+            yield row
+    yield {'unit_price': float(total_price), **{key: value / 100 for key, value in totals.items()}}
+
+@sales_bp.route('/api/calculate-preview/batch', methods=['POST'])
+@login_required
+@require_permission('view_sales')
+def calculate_preview_batch():
+    """Calculate previews for many units of one deal in a single request.
+
+    Accepts either a list of unit payloads or {"units": [...], "defaults": {...}},
+    where defaults (typically the shared rates of a floor) fill any field a unit
+    omits. Each unit takes the same fields as /api/calculate-preview. Amounts are
+    rounded to piasters as they would be stored; totals are summed exactly.
+    """
+    try:
+        data = request.get_json()
+
+        if isinstance(data, list):
+            units, defaults = data, {}
+        elif isinstance(data, dict):
+            units, defaults = data.get('units'), data.get('defaults') or {}
+        else:
+            units, defaults = None, {}
+
+        if not units or not isinstance(units, list):
+            return jsonify({'error': 'لا توجد وحدات للحساب'}), 400
+
+        if len(units) > PREVIEW_BATCH_MAX_UNITS:
+            return jsonify({'error': f'الحد الأقصى {PREVIEW_BATCH_MAX_UNITS} وحدة في الطلب الواحد'}), 400
+
+        # Parse every unit up front so a bad row is reported before anything is streamed
+        merged_units = []
+        columns = {'unit_price': []}
+        columns.update({field: [] for field, _ in PREVIEW_RATE_FIELDS})
+        for index, unit in enumerate(units):
+            if not isinstance(unit, dict):
+                return jsonify({'error': f'بيانات الوحدة رقم {index + 1} غير صحيحة', 'index': index}), 400
+            unit = {**defaults, **unit}
+            if not unit.get('unit_price') or not unit.get('company_commission_rate'):
+                return jsonify({
+                    'error': f'سعر الوحدة ونسبة عمولة الشركة مطلوبان (الوحدة رقم {index + 1})',
+                    'index': index
+                }), 400
+            merged_units.append(unit)
+            columns['unit_price'].append(to_decimal(unit.get('unit_price'), 0))
+            for field, default in PREVIEW_RATE_FIELDS:
+                columns[field].append(to_decimal(unit.get(field), default))
+
+        rows = _preview_batch_rows(merged_units, columns)
+
+        if len(merged_units) <= PREVIEW_BATCH_STREAM_THRESHOLD:
+            results = list(rows)
+            totals = results.pop()
+            return jsonify({'count': len(results), 'results': results, 'totals': totals}), 200
+
+        def generate():
+            yield '{"count": %d, "results": [' % len(merged_units)
+            for index, row in enumerate(rows):
+                if index == len(merged_units):
+                    yield '], "totals": ' + json.dumps(row) + '}'
+                else:
+                    yield (',' if index else '') + json.dumps(row, ensure_ascii=False)
+
+        return Response(generate(), mimetype='application/json'), 200
+
+    except Exception as e:
+        return jsonify({'error': f'خطأ في حساب المعاينة: {str(e)}'}), 500
+
 @sales_bp.route('/api/sales/stats', methods=['GET'])
 @login_required
 @require_permission('view_sales')
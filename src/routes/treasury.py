@@ -3,9 +3,23 @@ from flask_login import login_required, current_user
 from src.models.database import db
 from src.models.treasury import Treasury
 from src.models.transaction import Transaction
+from src.models.treasury_snapshot import TreasuryDailyRollup, TreasuryDailySnapshot
 from src.models.user import User
+from src.models.reconciliation import ReconciliationRun
+from src.utils.search import fts_matches, normalize_search_text
+from src.utils.fieldsets import InvalidFields, load_only_fields, parse_fields, serialize
+from src.utils.export import EXPORT_BATCH_SIZE, EXPORT_FORMATS, XLSX_MAX_ROWS, export_response
+from src.utils.conditional import conditional_get
+from src.utils.reconciliation import reconcile_treasury
+from src.utils.posting_queue import PostingPending, PostingTimeout, submit_posting
+from src.utils.pagination import (
+    COUNT_MODES, InvalidCursor, MAX_CURSOR_PAGE_SIZE, count_rows, encode_cursor, keyset_order, keyset_page,
+    offset_page
+)
 from datetime import datetime, timedelta
-from sqlalchemy import func, desc, and_
+from decimal import Decimal
+from math import ceil
+from sqlalchemy import desc, select
 
 treasury_bp = Blueprint('treasury', __name__)
 
@@ -65,6 +79,7 @@ def edit_transaction(transaction_id):
 @treasury_bp.route('/api/balance', methods=['GET'])
 @login_required
 @require_permission('view_treasury')
+@conditional_get('treasury')
 def get_balance():
     """Get current treasury balance"""
     try:
@@ -76,6 +91,24 @@ def get_balance():
     except Exception as e:
         return jsonify({'error': f'خطأ في جلب الرصيد: {str(e)}'}), 500
 
+def _set_balance(new_balance, reason, user_id):
+    """Set the treasury balance and record the difference as a transaction
+    (no commit; a posting for submit_posting). Returns the old and new balance.
+    """
+    old_balance, new_balance = Treasury.set_balance(new_balance)
+
+    # Create transaction record
+    db.session.add(Transaction(
+        type='تعديل رصيد',
+        amount=new_balance - old_balance,
+        description=f'{reason} - الرصيد السابق: {old_balance:,.2f} جنيه',
+        transaction_date=datetime.now(),
+        related_entity_type='manual',
+        related_entity_id=None,
+        user_id=user_id
+    ))
+    return {'balance': float(new_balance), 'old_balance': float(old_balance)}
+
 @treasury_bp.route('/api/balance', methods=['POST'])
 @login_required
 @require_permission('manage_treasury')
@@ -87,91 +120,135 @@ def set_balance():
         if not data or 'balance' not in data:
             return jsonify({'error': 'الرصيد مطلوب'}), 400
         
-        new_balance = float(data['balance'])
+        new_balance = Decimal(str(data['balance']))
         reason = data.get('reason', 'تعديل الرصيد من قبل الإدارة')
         
-        # Get current balance
-        treasury = Treasury.get_current()
-        old_balance = float(treasury.balance)
+        # Written by the posting queue's writer when it is enabled
+        balances = submit_posting(_set_balance, new_balance, reason, current_user.id)
         
-        # Update balance
-        Treasury.set_balance(new_balance)
-        
-        # Create transaction record
-        transaction = Transaction(
-            type='تعديل رصيد',
-            amount=float(new_balance - old_balance),
-            description=f'{reason} - الرصيد السابق: {old_balance:,.2f} جنيه',
-            transaction_date=datetime.now(),
-            related_entity_type='manual',
-            related_entity_id=None,
-            user_id=current_user.id
-        )
-        db.session.add(transaction)
-        db.session.commit()
+        return jsonify({'message': 'تم تحديث الرصيد بنجاح', **balances}), 200
         
+    except PostingPending as e:
         return jsonify({
-            'message': 'تم تحديث الرصيد بنجاح',
-            'balance': float(new_balance),
-            'old_balance': float(old_balance)
-        }), 200
-        
+            'message': 'جاري تحديث الرصيد، تحقق من حالته قبل إعادة المحاولة',
+            'posting_id': e.posting_id,
+            'status': 'pending'
+        }), 202
+    except PostingTimeout:
+        return jsonify({'error': 'انتهت مهلة تحديث الرصيد ولم يتم حفظه، يمكن إعادة المحاولة'}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'خطأ في تحديث الرصيد: {str(e)}'}), 500
 
+def _transaction_filters(args, include_search=True):
+    """Filter criteria shared by the transaction list endpoints (search, type, date range)"""
+    criteria = []
+    search = args.get('search', '')
+    transaction_type = args.get('type', '')
+    date_from = args.get('date_from', '')
+    date_to = args.get('date_to', '')
+
+    if search and include_search:
+        matches = fts_matches(db.engine, 'transactions_fts', search)
+        if matches is not None:
+            criteria.append(Transaction.id.in_(select(matches.c.id)))
+        else:
+            criteria.append(Transaction.search_text.contains(normalize_search_text(search)))
+
+    if transaction_type:
+        criteria.append(Transaction.type == transaction_type)
+
+    if date_from:
+        criteria.append(Transaction.transaction_date >= datetime.strptime(date_from, '%Y-%m-%d'))
+
+    if date_to:
+        criteria.append(Transaction.transaction_date <= datetime.strptime(date_to, '%Y-%m-%d'))
+
+    return criteria
+
 @treasury_bp.route('/api/transactions', methods=['GET'])
 @login_required
 @require_permission('view_transactions')
+@conditional_get('transactions')
 def get_transactions():
-    """Get all transactions with pagination and filtering"""
+    """Get all transactions with pagination and filtering.
+
+    Passing `cursor` (empty for the first page) switches to keyset pagination:
+    no total is computed unless `count` asks for one, and each response carries
+    the `next_cursor` token. Without it the classic page/per_page response is
+    returned.
+
+    `count` picks how `total` is computed: `exact` (default for offset pages,
+    cached until the table changes), `estimate` (may reuse a slightly stale
+    total; `total_is_estimate` says so) or `none` (no total or pages).
+    """
     try:
-        page = request.args.get('page', 1, type=int)
+        page = max(request.args.get('page', 1, type=int), 1)
         per_page = request.args.get('per_page', 25, type=int)
-        search = request.args.get('search', '')
-        transaction_type = request.args.get('type', '')
-        date_from = request.args.get('date_from', '')
-        date_to = request.args.get('date_to', '')
-        
+        cursor = request.args.get('cursor')
+        count_mode = request.args.get('count', 'none' if cursor is not None else 'exact')
+        if count_mode not in COUNT_MODES:
+            return jsonify({'error': 'قيمة count غير صالحة'}), 400
+        try:
+            fields = parse_fields(request.args.get('fields'), Transaction.DICT_FIELDS)
+        except InvalidFields as e:
+            return jsonify({'error': f'حقول غير معروفة: {e}'}), 400
+
         # Build query
-        query = Transaction.query
-        
-        # Apply filters
-        if search:
-            query = query.filter(
-                db.or_(
-                    Transaction.description.contains(search),
-                    Transaction.type.contains(search)
+        query = Transaction.query.filter(*_transaction_filters(request.args))
+
+        if cursor is not None:
+            per_page = min(max(per_page, 1), MAX_CURSOR_PAGE_SIZE)
+            if fields:
+                query = query.options(load_only_fields(Transaction, fields, Transaction.transaction_date))
+            try:
+                transactions, next_cursor = keyset_page(
+                    query, Transaction.transaction_date, Transaction.id, cursor, per_page
                 )
-            )
-        
-        if transaction_type:
-            query = query.filter(Transaction.type == transaction_type)
-        
-        if date_from:
-            query = query.filter(Transaction.transaction_date >= datetime.strptime(date_from, '%Y-%m-%d'))
-        
-        if date_to:
-            query = query.filter(Transaction.transaction_date <= datetime.strptime(date_to, '%Y-%m-%d'))
-        
-        # Order by transaction date (newest first)
-        query = query.order_by(desc(Transaction.transaction_date))
-        
-        # Paginate
-        pagination = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+            except InvalidCursor:
+                return jsonify({'error': 'مؤشر الصفحة غير صالح'}), 400
+            total, total_is_estimate = count_rows(query, Transaction.id, count_mode)
+            return jsonify({
+                'transactions': [transaction.to_dict(fields) for transaction in transactions],
+                'total': total,
+                'total_is_estimate': total_is_estimate,
+                'per_page': per_page,
+                'has_next': next_cursor is not None,
+                'next_cursor': next_cursor
+            }), 200
+
+        # Order by transaction date (newest first); full-text searches rank best matches first
+        per_page = max(per_page, 1)
+        total, total_is_estimate = count_rows(query, Transaction.id, count_mode)
+
+        ranking = fts_matches(db.engine, 'transactions_fts', request.args.get('search', ''))
+        if ranking is not None:
+            query = Transaction.query.join(ranking, ranking.c.id == Transaction.id) \
+                .filter(*_transaction_filters(request.args, include_search=False)) \
+                .order_by(ranking.c.rank, *keyset_order(Transaction.transaction_date, Transaction.id))
+        else:
+            query = query.order_by(*keyset_order(Transaction.transaction_date, Transaction.id))
+        if fields:
+            query = query.options(load_only_fields(Transaction, fields, Transaction.transaction_date))
+
+        transactions, has_next = offset_page(query, page, per_page)
+
+        # Lets offset clients continue with cursors from here
+        next_cursor = None
+        if has_next:
+            last = transactions[-1]
+            next_cursor = encode_cursor(last.transaction_date, last.id)
         
         return jsonify({
-            'transactions': [transaction.to_dict() for transaction in pagination.items],
-            'total': pagination.total,
-            'pages': pagination.pages,
+            'transactions': [transaction.to_dict(fields) for transaction in transactions],
+            'total': total,
+            'total_is_estimate': total_is_estimate,
+            'pages': ceil(total / per_page) if total is not None else None,
             'current_page': page,
             'per_page': per_page,
-            'has_next': pagination.has_next,
-            'has_prev': pagination.has_prev
+            'has_next': has_next,
+            'has_prev': page > 1,
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -219,11 +296,8 @@ def create_transaction():
         db.session.add(transaction)
         db.session.flush()  # Get the transaction ID
         
-        # Update treasury balance
-        if amount > 0:
-            Treasury.add_to_balance(float(amount))
-        else:
-            Treasury.subtract_from_balance(float(abs(amount)))
+        # Update treasury balance (committed together with the transaction)
+        Treasury.increment(amount)
         
         db.session.commit()
         
@@ -236,69 +310,126 @@ def create_transaction():
         db.session.rollback()
         return jsonify({'error': f'خطأ في إنشاء المعاملة: {str(e)}'}), 500
 
+@treasury_bp.route('/api/transactions/export', methods=['GET'])
+@login_required
+@require_permission('view_transactions')
+@require_permission('export_data')
+def export_transactions():
+    """Download the transactions matching the list filters as CSV or XLSX.
+
+    Takes the same filters as the list endpoint plus `format` (csv, xlsx) and
+    `fields`. Rows are streamed newest first while they are read, so large
+    exports start at once and use constant memory.
+    """
+    try:
+        export_format = request.args.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': 'صيغة التصدير غير مدعومة'}), 400
+        try:
+            fields = parse_fields(request.args.get('fields'), Transaction.DICT_FIELDS) or list(Transaction.DICT_FIELDS)
+        except InvalidFields as e:
+            return jsonify({'error': f'حقول غير معروفة: {e}'}), 400
+
+        criteria = _transaction_filters(request.args)
+        if export_format == 'xlsx':
+            total, _ = count_rows(Transaction.query.filter(*criteria), Transaction.id)
+            if total > XLSX_MAX_ROWS:
+                return jsonify({'error': f'عدد الصفوف ({total}) يتجاوز حد ملفات Excel، استخدم صيغة CSV'}), 400
+
+        # Plain column rows instead of ORM objects, fetched in batches
+        statement = select(*(getattr(Transaction, name) for name in fields)) \
+            .where(*criteria) \
+            .order_by(*keyset_order(Transaction.transaction_date, Transaction.id)) \
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        result = db.session.execute(statement)
+        rows = (serialize(row, Transaction.DICT_FIELDS, fields) for row in result)
+        return export_response(export_format, 'transactions', fields, rows, sheet_name='المعاملات')
+
+    except Exception as e:
+        return jsonify({'error': f'خطأ في تصدير المعاملات: {str(e)}'}), 500
+
 @treasury_bp.route('/api/transactions/<int:transaction_id>', methods=['GET'])
 @login_required
 @require_permission('view_transactions')
+@conditional_get('transactions')
 def get_transaction(transaction_id):
-    """Get specific transaction"""
+    """Get specific transaction (`fields` limits the response to those fields)"""
     try:
-        transaction = Transaction.query.get_or_404(transaction_id)
-        return jsonify(transaction.to_dict()), 200
+        try:
+            fields = parse_fields(request.args.get('fields'), Transaction.DICT_FIELDS)
+        except InvalidFields as e:
+            return jsonify({'error': f'حقول غير معروفة: {e}'}), 400
+        query = Transaction.query.options(load_only_fields(Transaction, fields)) if fields else Transaction.query
+        transaction = query.get_or_404(transaction_id)
+        return jsonify(transaction.to_dict(fields)), 200
     except Exception as e:
         return jsonify({'error': f'خطأ في جلب المعاملة: {str(e)}'}), 500
 
+def _update_transaction(transaction_id, changes):
+    """Apply validated field changes to a transaction and move the treasury by
+    the change in its amount (no commit; a posting for submit_posting).
+    Returns the transaction's dict.
+    """
+    transaction = db.session.get(Transaction, transaction_id)
+    if transaction is None:
+        raise LookupError('المعاملة غير موجودة')
+
+    # Store old amount for balance adjustment
+    old_amount = transaction.amount
+    for field, value in changes.items():
+        setattr(transaction, field, value)
+
+    # Adjust treasury balance by the change in amount
+    if old_amount != transaction.amount:
+        Treasury.increment(Decimal(str(transaction.amount)) - Decimal(str(old_amount)))
+
+    transaction.updated_at = datetime.now()
+    return transaction.to_dict()
+
 @treasury_bp.route('/api/transactions/<int:transaction_id>', methods=['PUT'])
 @login_required
 @require_permission('edit_transactions')
 def update_transaction(transaction_id):
     """Update transaction"""
     try:
-        transaction = Transaction.query.get_or_404(transaction_id)
+        Transaction.query.get_or_404(transaction_id)
         data = request.get_json()
         
         if not data:
             return jsonify({'error': 'لا توجد بيانات'}), 400
         
-        # Store old amount for balance adjustment
-        old_amount = transaction.amount
-        
         # Update basic fields
         updatable_fields = ['type', 'amount', 'description', 'transaction_date']
+        changes = {}
         
         for field in updatable_fields:
             if field in data:
                 if field == 'transaction_date':
                     try:
-                        transaction.transaction_date = datetime.strptime(data[field], '%Y-%m-%d')
+                        changes[field] = datetime.strptime(data[field], '%Y-%m-%d')
                     except ValueError:
                         return jsonify({'error': 'تاريخ المعاملة غير صحيح'}), 400
                 elif field == 'amount':
-                    transaction.amount = float(data[field])
+                    changes[field] = float(data[field])
                 else:
-                    setattr(transaction, field, data[field])
-        
-        # Adjust treasury balance if amount changed
-        if old_amount != transaction.amount:
-            # Reverse old amount
-            if old_amount > 0:
-                Treasury.subtract_from_balance(old_amount)
-            else:
-                Treasury.add_to_balance(abs(old_amount))
-            
-            # Apply new amount
-            if transaction.amount > 0:
-                Treasury.add_to_balance(transaction.amount)
-            else:
-                Treasury.subtract_from_balance(abs(transaction.amount))
+                    changes[field] = data[field]
         
-        transaction.updated_at = datetime.now()
-        db.session.commit()
+        # Written by the posting queue's writer when it is enabled
+        transaction = submit_posting(_update_transaction, transaction_id, changes)
         
         return jsonify({
             'message': 'تم تحديث المعاملة بنجاح',
-            'transaction': transaction.to_dict()
+            'transaction': transaction
         }), 200
         
+    except PostingPending as e:
+        return jsonify({
+            'message': 'جاري تحديث المعاملة، تحقق من حالتها قبل إعادة المحاولة',
+            'posting_id': e.posting_id,
+            'status': 'pending'
+        }), 202
+    except PostingTimeout:
+        return jsonify({'error': 'انتهت مهلة تحديث المعاملة ولم يتم حفظها، يمكن إعادة المحاولة'}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'خطأ في تحديث المعاملة: {str(e)}'}), 500
@@ -316,10 +447,7 @@ def delete_transaction(transaction_id):
             return jsonify({'error': 'لا يمكن حذف المعاملات المولدة تلقائياً من النظام'}), 400
         
         # Reverse the transaction amount from treasury
-        if transaction.amount > 0:
-            Treasury.subtract_from_balance(transaction.amount)
-        else:
-            Treasury.add_to_balance(abs(transaction.amount))
+        Treasury.increment(-Decimal(str(transaction.amount)))
         
         db.session.delete(transaction)
         db.session.commit()
@@ -365,6 +493,7 @@ def get_transaction_types():
 @treasury_bp.route('/api/treasury-stats', methods=['GET'])
 @login_required
 @require_permission('view_treasury')
+@conditional_get('transactions', 'treasury', daily=True)
 def get_treasury_stats():
     """Get treasury statistics"""
     try:
@@ -372,66 +501,37 @@ def get_treasury_stats():
         treasury = Treasury.get_current()
         current_balance = float(treasury.balance)
         
-        # Today's transactions
+        # Today's and this month's totals and the month's type summary, from
+        # one read of the month's daily rollups
         today = datetime.now().date()
-        today_income = db.session.query(func.sum(Transaction.amount)).filter(
-            and_(
-                Transaction.transaction_date >= today,
-                Transaction.amount > 0
-            )
-        ).scalar() or 0
-        
-        today_expenses = db.session.query(func.sum(Transaction.amount)).filter(
-            and_(
-                Transaction.transaction_date >= today,
-                Transaction.amount < 0
-            )
-        ).scalar() or 0
-        
-        # This month's transactions
         month_start = datetime.now().replace(day=1)
-        month_income = db.session.query(func.sum(Transaction.amount)).filter(
-            and_(
-                Transaction.transaction_date >= month_start,
-                Transaction.amount > 0
-            )
-        ).scalar() or 0
-        
-        month_expenses = db.session.query(func.sum(Transaction.amount)).filter(
-            and_(
-                Transaction.transaction_date >= month_start,
-                Transaction.amount < 0
-            )
-        ).scalar() or 0
+        today_income = today_expenses = month_income = month_expenses = Decimal('0')
+        type_summary = {}
+        for row in TreasuryDailyRollup.rows_since(month_start.date()):
+            if row.sign > 0:
+                month_income += row.total
+                if row.day >= today:
+                    today_income += row.total
+            elif row.sign < 0:
+                month_expenses += row.total
+                if row.day >= today:
+                    today_expenses += row.total
+            count, total = type_summary.get(row.type, (0, Decimal('0')))
+            type_summary[row.type] = (count + row.entry_count, total + row.total)
         
         # Recent transactions
         recent_transactions = Transaction.query.order_by(
             desc(Transaction.transaction_date)
         ).limit(10).all()
         
-        # Monthly balance history (last 12 months)
-        monthly_balances = []
-        for i in range(12):
-            month_date = datetime.now().replace(day=1) - timedelta(days=30*i)
-            month_transactions = db.session.query(func.sum(Transaction.amount)).filter(
-                Transaction.transaction_date <= month_date
-            ).scalar() or 0
-            
-            monthly_balances.append({
-                'month': month_date.strftime('%Y-%m'),
-                'balance': float(month_transactions)
-            })
-        
-        monthly_balances.reverse()
-        
-        # Transaction types summary
-        type_summary = db.session.query(
-            Transaction.type,
-            func.count(Transaction.id).label('count'),
-            func.sum(Transaction.amount).label('total')
-        ).filter(
-            Transaction.transaction_date >= month_start
-        ).group_by(Transaction.type).all()
+        # Monthly balance history (last 12 months): ledger balance at the end
+        # of each month's sample day, from one range read of the snapshots
+        month_days = [(month_start - timedelta(days=30*i)).date() for i in range(12)]
+        closing_balances = TreasuryDailySnapshot.closing_balances(month_days)
+        monthly_balances = [{
+            'month': day.strftime('%Y-%m'),
+            'balance': float(closing_balances[day])
+        } for day in reversed(month_days)]
         
         return jsonify({
             'current_balance': current_balance,
@@ -443,10 +543,10 @@ def get_treasury_stats():
             'monthly_balances': monthly_balances,
             'type_summary': [
                 {
-                    'type': row.type,
-                    'count': row.count,
-                    'total': float(row.total or 0)
-                } for row in type_summary
+                    'type': entry_type,
+                    'count': count,
+                    'total': float(total)
+                } for entry_type, (count, total) in type_summary.items()
             ]
         }), 200
         
@@ -456,39 +556,101 @@ def get_treasury_stats():
 @treasury_bp.route('/api/balance-history', methods=['GET'])
 @login_required
 @require_permission('view_treasury')
+@conditional_get('transactions', 'treasury', daily=True)
 def get_balance_history():
-    """Get balance history over time"""
+    """Get balance history over time.
+
+    Reads the ledger's running balances with one range scan of the
+    (transaction_date, posting_seq) index. Balances are shifted by the gap
+    between the treasury and the ledger head, so an opening balance that has
+    no transaction behind it is carried through.
+    """
     try:
         days = request.args.get('days', 30, type=int)
         
         # Get transactions for the specified period
         start_date = datetime.now() - timedelta(days=days)
-        transactions = Transaction.query.filter(
-            Transaction.transaction_date >= start_date
-        ).order_by(Transaction.transaction_date).all()
-        
-        # Calculate running balance
-        current_balance = Treasury.get_current().balance
-        
-        # Start with current balance and work backwards
-        balance_history = []
-        running_balance = current_balance
-        
-        # Work backwards from current balance
-        for transaction in reversed(transactions):
-            balance_history.append({
-                'date': transaction.transaction_date.strftime('%Y-%m-%d'),
-                'balance': float(running_balance),
-                'transaction_amount': float(transaction.amount),
-                'transaction_type': transaction.type,
-                'description': transaction.description
-            })
-            running_balance -= transaction.amount
-        
-        balance_history.reverse()
+        rows = db.session.execute(
+            select(Transaction.transaction_date, Transaction.amount, Transaction.type,
+                   Transaction.description, Transaction.balance_after)
+            .where(Transaction.transaction_date >= start_date)
+            .order_by(Transaction.transaction_date, Transaction.posting_seq)
+        ).all()
+        if not rows:
+            return jsonify([]), 200
+        
+        opening = Decimal(str(Treasury.get_current().balance)) - Transaction.ledger_head_balance()
+        balance_history = [{
+            'date': row.transaction_date.strftime('%Y-%m-%d'),
+            'balance': float(opening + (row.balance_after or 0)),
+            'transaction_amount': float(row.amount),
+            'transaction_type': row.type,
+            'description': row.description
+        } for row in rows]
         
         return jsonify(balance_history), 200
         
     except Exception as e:
         return jsonify({'error': f'خطأ في جلب تاريخ الرصيد: {str(e)}'}), 500
 
+# Longest daily series served in one response (about ten years)
+MAX_DAILY_SERIES_DAYS = 3660
+
+@treasury_bp.route('/api/daily-balances', methods=['GET'])
+@login_required
+@require_permission('view_treasury')
+@conditional_get('transactions', 'treasury', daily=True)
+def get_daily_balances():
+    """Opening/closing balance, income and expense for each of the last `days` days.
+
+    One range read of the daily snapshots, whatever the number of
+    transactions behind them; balances are shifted like balance-history.
+    """
+    try:
+        days = request.args.get('days', 30, type=int)
+        if days < 1 or days > MAX_DAILY_SERIES_DAYS:
+            return jsonify({'error': f'عدد الأيام يجب أن يكون بين 1 و {MAX_DAILY_SERIES_DAYS}'}), 400
+        
+        end = datetime.now().date()
+        series = TreasuryDailySnapshot.daily_series(end - timedelta(days=days - 1), end)
+        opening = float(Decimal(str(Treasury.get_current().balance)) - Transaction.ledger_head_balance())
+        for point in series:
+            point['opening_balance'] = round(point['opening_balance'] + opening, 2)
+            point['closing_balance'] = round(point['closing_balance'] + opening, 2)
+        
+        return jsonify(series), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'خطأ في جلب الأرصدة اليومية: {str(e)}'}), 500
+
+@treasury_bp.route('/api/reconciliation', methods=['POST'])
+@login_required
+@require_permission('manage_treasury')
+def run_reconciliation():
+    """Check that the treasury balance matches the posted transactions.
+
+    Incremental by default (entries since the last verified checkpoints and
+    edited blocks); {"full": true} re-sums the whole ledger. Runs in the
+    request: it takes seconds even on millions of entries.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        run = reconcile_treasury(full=bool(data.get('full', False)), user_id=current_user.id)
+        if run.status == 'failed':
+            return jsonify({'error': f'خطأ في مطابقة الخزنة: {run.error}', 'run': run.to_dict()}), 500
+        return jsonify(run.to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'خطأ في مطابقة الخزنة: {str(e)}'}), 500
+
+@treasury_bp.route('/api/reconciliation', methods=['GET'])
+@login_required
+@require_permission('view_treasury')
+def get_reconciliation_runs():
+    """Latest reconciliation runs, newest first"""
+    try:
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        runs = ReconciliationRun.query.order_by(ReconciliationRun.id.desc()).limit(limit).all()
+        return jsonify([run.to_dict() for run in runs]), 200
+    except Exception as e:
+        return jsonify({'error': f'خطأ في جلب نتائج مطابقة الخزنة: {str(e)}'}), 500
@@ -0,0 +1,56 @@
+"""
+Conditional GET for read-only JSON endpoints.
+
+The ETag of a response is derived from the request (path and query string)
+and the change counters of the tables the endpoint reads (TableVersion), so
+it is computed with a single primary-key lookup. A client that sends a
+matching If-None-Match gets 304 Not Modified before the endpoint runs any of
+its queries.
+"""
+
+import hashlib
+import json
+from datetime import date
+from functools import wraps
+from flask import Response, make_response, request
+from src.models.table_version import TableVersion
+
+def compute_etag(tables, daily=False):
+    """Validator for the current request over `tables`.
+
+    `daily` adds today's date, for endpoints whose figures depend on it
+    ("today", "this month", the last N days) and so change at midnight even
+    without writes.
+    """
+    state = [
+        request.path,
+        sorted(request.args.items(multi=True)),
+        sorted(TableVersion.get_versions(tables).items()),
+        date.today().isoformat() if daily else None,
+    ]
+    return hashlib.sha1(json.dumps(state, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def conditional_get(*tables, daily=False):
+    """Decorator answering If-None-Match with 304 while `tables` are unchanged.
+
+    Place it below the login/permission decorators so only authorized
+    requests are answered.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Versions are read before the endpoint's queries: a write racing
+            # with them yields a newer ETag on the next request, never a stale 304
+            etag = compute_etag(tables, daily)
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Browsers keep the copy but revalidate it on every load
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,44 @@
+"""
+Faceted filter counts for the list pages.
+
+Each dimension is counted with one GROUP BY query under every active filter
+except its own, so the counts say how many rows each alternative value would
+show. The result for a filter set is cached until the table version changes.
+"""
+
+from sqlalchemy import func
+from src.models.table_version import TableVersion
+from src.utils.cache import LRUCache
+
+# Facet results keyed by (table, compiled grouped queries) -> (table version, facets)
+FACET_CACHE_SIZE = 256
+facet_cache = LRUCache(maxsize=FACET_CACHE_SIZE)
+
+def _grouped(query, expression, id_column):
+    return query.with_entities(expression, func.count(id_column)).group_by(expression).order_by(None)
+
+def facet_counts(queries, dimensions, id_column):
+    """Counts of each dimension's values.
+
+    `dimensions` maps a facet name to the column or SQL expression it groups
+    on; `queries` maps the same names to the list query filtered by everything
+    except that facet. Returns {name: [{'value': ..., 'count': n}, ...]} with
+    the most common values first.
+    """
+    table_name = id_column.table.name
+    # Read the version before counting (see count_rows)
+    version = TableVersion.get_version(table_name)
+    statements = {name: _grouped(queries[name], expression, id_column)
+                  for name, expression in dimensions.items()}
+    compiled = [statement.statement.compile() for statement in statements.values()]
+    key = (table_name, tuple((str(c), tuple(sorted(c.params.items()))) for c in compiled))
+    cached = facet_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    facets = {}
+    for name, statement in statements.items():
+        counts = sorted(statement.all(), key=lambda row: (-row[1], row[0] is None, str(row[0])))
+        facets[name] = [{'value': value, 'count': count} for value, count in counts]
+    facet_cache.set(key, (version, facets))
+    return facets
@@ -0,0 +1,46 @@
+"""
+Sparse fieldsets for the sales and transaction APIs (`?fields=id,client_name`).
+
+Models describe their JSON output as a field -> converter map (DICT_FIELDS).
+Routes load only the columns behind the requested fields with load_only()
+and to_dict(fields) converts only those, so narrow list pages read, convert
+and send a fraction of each row.
+"""
+
+from sqlalchemy.orm import load_only
+
+class InvalidFields(ValueError):
+    """Raised when `fields` names something the model does not serialize"""
+
+def as_isoformat(value):
+    return value.isoformat() if value else None
+
+def as_float(value):
+    return float(value or 0)
+
+def serialize(obj, field_map, fields=None):
+    """JSON-ready dict of `obj` for `fields` (all of `field_map` when None)"""
+    data = {}
+    for name in (field_map if fields is None else fields):
+        convert = field_map[name]
+        value = getattr(obj, name)
+        data[name] = convert(value) if convert is not None else value
+    return data
+
+def parse_fields(raw, field_map):
+    """Requested field names in output order, or None for every field.
+
+    `id` is always included so clients can still address the rows.
+    """
+    if raw is None or not raw.strip():
+        return None
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = requested - field_map.keys()
+    if unknown:
+        raise InvalidFields(', '.join(sorted(unknown)))
+    requested.add('id')
+    return [name for name in field_map if name in requested]
+
+def load_only_fields(model, fields, *extra):
+    """Query option loading just the columns behind `fields`, plus `extra` attributes"""
+    return load_only(*(getattr(model, name) for name in fields), *extra)
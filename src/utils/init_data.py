@@ -127,6 +127,7 @@ def init_property_type_rates():
             rates = PropertyTypeRates(**data)
             db.session.add(rates)
     
+    PropertyTypeRates.invalidate_rate_profiles()
     db.session.commit()
 
 def init_treasury():
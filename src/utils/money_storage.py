@@ -0,0 +1,105 @@
+"""
+Money storage mode bookkeeping and conversion.
+
+A database stores every Money column either as NUMERIC(15, 2) pounds
+('numeric', the historical layout) or as integer piasters ('minor_units').
+The mode is recorded in app_settings so that every process opening the
+database reads the columns the same way.
+"""
+
+from sqlalchemy import inspect, text
+from src.models.money import (
+    Money, NUMERIC_STORAGE, MINOR_UNITS_STORAGE, MONEY_STORAGE_MODES, set_money_storage,
+)
+
+MONEY_STORAGE_KEY = 'money_storage'
+
+def money_columns(metadata):
+    """{table name: [column names]} for every Money column in the metadata"""
+    columns = {}
+    for table in metadata.sorted_tables:
+        names = [column.name for column in table.columns if isinstance(column.type, Money)]
+        if names:
+            columns[table.name] = names
+    return columns
+
+def read_money_storage(connection):
+    """Mode recorded in the database, or None if it was never recorded"""
+    if 'app_settings' not in inspect(connection).get_table_names():
+        return None
+    return connection.execute(
+        text('SELECT value FROM app_settings WHERE key = :key'), {'key': MONEY_STORAGE_KEY}
+    ).scalar()
+
+def write_money_storage(connection, mode):
+    updated = connection.execute(
+        text('UPDATE app_settings SET value = :value, updated_at = CURRENT_TIMESTAMP WHERE key = :key'),
+        {'key': MONEY_STORAGE_KEY, 'value': mode}
+    )
+    if updated.rowcount == 0:
+        connection.execute(
+            text('INSERT INTO app_settings (key, value, updated_at) VALUES (:key, :value, CURRENT_TIMESTAMP)'),
+            {'key': MONEY_STORAGE_KEY, 'value': mode}
+        )
+
+def configure_money_storage(engine, requested=NUMERIC_STORAGE):
+    """Pick the storage mode for this process before any table is touched.
+
+    The mode recorded in the database always wins. An unrecorded database
+    that already has sales predates the setting and is therefore numeric;
+    only a brand-new database takes the requested mode.
+    """
+    with engine.connect() as connection:
+        mode = read_money_storage(connection)
+        if mode is None:
+            existing = inspect(connection).get_table_names()
+            mode = NUMERIC_STORAGE if 'sales' in existing else requested
+    set_money_storage(mode)
+    return mode
+
+def record_money_storage(engine, mode):
+    """Persist the active mode if the database has no marker yet"""
+    with engine.begin() as connection:
+        if read_money_storage(connection) is None:
+            write_money_storage(connection, mode)
+
+def _conversion_sql(dialect, table, column, target):
+    if dialect == 'postgresql':
+        if target == MINOR_UNITS_STORAGE:
+            return f'ALTER TABLE {table} ALTER COLUMN {column} TYPE BIGINT USING ROUND({column} * 100)::bigint'
+        return f'ALTER TABLE {table} ALTER COLUMN {column} TYPE NUMERIC(15, 2) USING {column} / 100.0'
+    # SQLite keeps the declared NUMERIC type; its affinity stores integers exactly
+    if target == MINOR_UNITS_STORAGE:
+        return f'UPDATE {table} SET {column} = CAST(ROUND({column} * 100) AS INTEGER) WHERE {column} IS NOT NULL'
+    return f'UPDATE {table} SET {column} = ROUND({column} / 100.0, 2) WHERE {column} IS NOT NULL'
+
+def convert_money_storage(engine, metadata, target):
+    """Convert every Money column to the target mode in one transaction.
+
+    Returns the number of converted columns, or 0 if the database is
+    already in the target mode.
+    """
+    if target not in MONEY_STORAGE_MODES:
+        raise ValueError(f'Unknown money storage mode: {target}')
+
+    with engine.begin() as connection:
+        current = read_money_storage(connection) or NUMERIC_STORAGE
+        if current == target:
+            return 0
+
+        existing_tables = set(inspect(connection).get_table_names())
+        converted = 0
+        for table, columns in money_columns(metadata).items():
+            if table not in existing_tables:
+                continue
+            existing_columns = {c['name'] for c in inspect(connection).get_columns(table)}
+            for column in columns:
+                if column in existing_columns:
+                    connection.execute(text(_conversion_sql(engine.dialect.name, table, column, target)))
+                    converted += 1
+
+        if 'app_settings' not in existing_tables:
+            from src.models.app_setting import AppSetting
+            AppSetting.__table__.create(connection)
+        write_money_storage(connection, target)
+    return converted
@@ -0,0 +1,32 @@
+"""
+Parsing of numbers typed into the forms
+"""
+
+from decimal import Decimal
+
+ARABIC_DIGITS = '٠١٢٣٤٥٦٧٨٩'
+
+def to_decimal(value, default=0):
+    """Robustly convert incoming form values to Decimal.
+    - Treat None/"" as default
+    - Strip spaces, commas, percent signs
+    - Accept numeric types directly
+    """
+    if value is None or value == "":
+        return Decimal(str(default))
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    if isinstance(value, str):
+        cleaned = value.strip()
+        # Replace common formatting
+        cleaned = cleaned.replace(',', '').replace('%', '')
+        # Convert Arabic numerals to Western if present
+        for i, d in enumerate(ARABIC_DIGITS):
+            cleaned = cleaned.replace(d, str(i))
+        if cleaned == '':
+            return Decimal(str(default))
+        try:
+            return Decimal(cleaned)
+        except Exception:
+            return Decimal(str(default))
+    return Decimal(str(default))
@@ -0,0 +1,129 @@
+"""
+Keyset (cursor) pagination for newest-first list endpoints.
+
+A page is read with `WHERE (sort, id) < (last sort, last id) ORDER BY sort
+DESC, id DESC LIMIT n`, which an index on (sort, id) answers directly, so
+deep pages cost the same as the first one and no COUNT(*) is needed. The
+position is handed to clients as an opaque `next_cursor` token.
+
+Offset pages keep reporting `total`, but the COUNT(*) behind it is cached per
+filter set and table version, and clients can ask for an approximate total
+(`count=estimate`) or none at all (`count=none`).
+"""
+
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import desc, func, tuple_
+from src.models.table_version import TableVersion
+from src.utils.cache import LRUCache
+
+MAX_CURSOR_PAGE_SIZE = 500
+
+# Accepted values of the list endpoints' `count` parameter
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+# Totals keyed by (table, compiled filter SQL and parameters) -> (table version, total)
+COUNT_CACHE_SIZE = 1024
+count_cache = LRUCache(maxsize=COUNT_CACHE_SIZE)
+
+# An estimate may reuse a total this many writes (table versions) old
+ESTIMATE_MAX_VERSION_LAG = 50
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor this module did not produce"""
+
+def encode_cursor(sort_value, row_id):
+    payload = {'s': sort_value.isoformat() if sort_value is not None else None, 'id': row_id}
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Return (sort value, id) from a cursor token"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        sort_value = datetime.fromisoformat(payload['s']) if payload['s'] is not None else None
+        row_id = int(payload['id'])
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise InvalidCursor(token)
+    return sort_value, row_id
+
+def keyset_order(sort_column, id_column):
+    """Newest-first order shared by offset and cursor pages (rows without a date last)"""
+    return desc(sort_column).nulls_last(), desc(id_column)
+
+def keyset_page(query, sort_column, id_column, cursor, per_page):
+    """Fetch one newest-first page after `cursor` ('' or None for the first page).
+
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    limit = per_page + 1  # one extra row tells whether another page exists
+    sort_value, row_id = decode_cursor(cursor) if cursor else (None, None)
+
+    if row_id is not None and sort_value is None:
+        # Already inside the trailing block of rows without a date
+        rows = query.filter(sort_column.is_(None), id_column < row_id) \
+            .order_by(desc(id_column)).limit(limit).all()
+    else:
+        page_query = query
+        if row_id is not None:
+            # Row-value comparison lets the (sort, id) index seek straight to the cursor
+            page_query = page_query.filter(tuple_(sort_column, id_column) < (sort_value, row_id))
+        rows = page_query.order_by(*keyset_order(sort_column, id_column)).limit(limit).all()
+        if row_id is not None and len(rows) < limit:
+            # The comparison above skips undated rows, which sort last
+            rows += query.filter(sort_column.is_(None)) \
+                .order_by(desc(id_column)).limit(limit - len(rows)).all()
+
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return items, next_cursor
+
+def offset_page(query, page, per_page):
+    """Fetch one offset page without counting. Returns (items, has_next)"""
+    rows = query.limit(per_page + 1).offset((page - 1) * per_page).all()
+    return rows[:per_page], len(rows) > per_page
+
+def _count_key(count_query, table_name):
+    # Filters are compiled, so the same criteria give the same key whatever
+    # order or formatting the request used (dates parsed, search normalized)
+    compiled = count_query.statement.compile()
+    return table_name, str(compiled), tuple(sorted(compiled.params.items()))
+
+def count_rows(query, id_column, mode='exact'):
+    """Number of rows an unordered list query matches.
+
+    Returns (total, is_estimate); total is None with mode 'none'. Exact totals
+    are cached until the table version changes. Estimates reuse a recent
+    cached total, or the id span for an unfiltered list, before counting.
+    """
+    if mode == 'none':
+        return None, False
+
+    table_name = id_column.table.name
+    # Read the version before counting: a concurrent write then shows up as a
+    # newer version on the next call instead of being cached as current
+    version = TableVersion.get_version(table_name)
+    # Counting only the id also drops column options such as load_only()
+    count_query = query.with_entities(func.count(id_column)).order_by(None)
+    key = _count_key(count_query, table_name)
+    cached = count_cache.get(key)
+    if cached is not None:
+        cached_version, total = cached
+        if cached_version == version:
+            return total, False
+        if mode == 'estimate' and version - cached_version <= ESTIMATE_MAX_VERSION_LAG:
+            return total, True
+
+    if mode == 'estimate' and query.whereclause is None:
+        # MIN/MAX of the primary key are single index lookups
+        low, high = query.with_entities(func.min(id_column), func.max(id_column)).order_by(None).one()
+        return (high - low + 1 if high is not None else 0), True
+
+    total = count_query.scalar()
+    count_cache.set(key, (version, total))
+    return total, False
@@ -0,0 +1,199 @@
+"""
+Optional single-writer pipeline for treasury postings.
+
+SQLite has one writer at a time. When many workers post sales and
+transactions at once, each one waits on the lock (busy_timeout) for its own
+short transaction and may still fail with "database is locked". With
+POSTING_QUEUE enabled, postings are handed to one writer thread instead.
+The writer takes everything queued while its previous commit ran, applies
+each posting in its own SAVEPOINT and commits the batch once (group
+commit). Callers block on a future until their batch is committed.
+
+A posting is a function that writes through db.session without
+committing, and returns plain data (not ORM objects). It runs in the
+writer's session, so it must not rely on request state such as
+current_user. Pass what it needs as arguments. Without the queue,
+submit_posting() runs the function in the caller's session and commits, so
+call sites are the same either way.
+
+A caller that stops waiting must not leave the client guessing. When
+POSTING_QUEUE_TIMEOUT expires, submit_posting() cancels the posting if the
+writer has not picked it up yet and raises PostingTimeout: nothing was
+written, and the client may retry. Once the writer has started a posting it
+cannot be stopped and may still commit, so a retry could record it twice.
+submit_posting() then raises PostingPending with a posting id instead;
+posting_status(posting_id) reports 'pending', 'committed' (with the result)
+or 'failed' (with the error). Statuses are kept per process for the last
+MAX_TRACKED_POSTINGS such postings.
+
+Config:
+    POSTING_QUEUE            enable the writer thread (default False)
+    POSTING_QUEUE_MAX_BATCH  postings per commit (default 200)
+    POSTING_QUEUE_TIMEOUT    seconds a caller waits for its result (default 30)
+"""
+
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from flask import current_app
+from src.models.database import db
+
+DEFAULT_MAX_BATCH = 200
+DEFAULT_TIMEOUT = 30
+MAX_TRACKED_POSTINGS = 1000
+
+class PostingTimeout(TimeoutError):
+    """The posting was cancelled before the writer started it; nothing was written"""
+
+class PostingPending(Exception):
+    """The writer is still committing the posting; check posting_status(posting_id)"""
+
+    def __init__(self, posting_id):
+        super().__init__(f'posting {posting_id} is still being committed')
+        self.posting_id = posting_id
+
+class PostingQueue:
+    """One writer thread that commits queued postings in batches"""
+
+    def __init__(self, app, max_batch=DEFAULT_MAX_BATCH):
+        self.app = app
+        self.max_batch = max_batch
+        self.batches = 0
+        self.postings = 0
+        self._queue = queue.SimpleQueue()
+        self._tracked = OrderedDict()
+        self._tracked_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='posting-queue-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, posting, *args, **kwargs):
+        """Queue a posting; the returned Future resolves once its batch is committed"""
+        future = Future()
+        self._queue.put((future, posting, args, kwargs))
+        return future
+
+    def track(self, future):
+        """Remember a future its caller stopped waiting for; returns its posting id"""
+        posting_id = uuid.uuid4().hex
+        with self._tracked_lock:
+            self._tracked[posting_id] = future
+            while len(self._tracked) > MAX_TRACKED_POSTINGS:
+                self._tracked.popitem(last=False)
+        return posting_id
+
+    def status(self, posting_id):
+        """Outcome of a tracked posting, or None when the id is unknown"""
+        with self._tracked_lock:
+            future = self._tracked.get(posting_id)
+        if future is None:
+            return None
+        if not future.done():
+            return {'posting_id': posting_id, 'status': 'pending'}
+        error = future.exception()
+        if error is not None:
+            return {'posting_id': posting_id, 'status': 'failed', 'error': str(error)}
+        return {'posting_id': posting_id, 'status': 'committed', 'result': future.result()}
+
+    def close(self, timeout=None):
+        """Finish the queued postings and stop the writer"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Stop after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    break
+                self._commit_batch(batch)
+                db.session.remove()
+
+    def _commit_batch(self, batch):
+        done = []
+        for future, posting, args, kwargs in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with db.session.begin_nested():
+                    result = posting(*args, **kwargs)
+            except Exception as e:
+                # Only this posting's savepoint was rolled back
+                future.set_exception(e)
+            else:
+                done.append((future, result))
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for future, _ in done:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.postings += len(done)
+        for future, result in done:
+            future.set_result(result)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'postings': self.postings,
+            'average_batch': round(self.postings / self.batches, 2) if self.batches else 0.0,
+            'queued': self._queue.qsize(),
+        }
+
+def init_posting_queue(app):
+    """Start the writer when POSTING_QUEUE is enabled (call once, after init_db)"""
+    if not app.config.get('POSTING_QUEUE'):
+        return None
+    posting_queue = PostingQueue(app, app.config.get('POSTING_QUEUE_MAX_BATCH', DEFAULT_MAX_BATCH))
+    app.extensions['posting_queue'] = posting_queue
+    return posting_queue
+
+def submit_posting(posting, *args, **kwargs):
+    """Run a posting through the app's writer and return its result.
+
+    Without a writer, the posting runs in the caller's session, which is
+    then committed. Exceptions raised by the posting or the commit reach the
+    caller in both cases. With a writer, raises PostingTimeout when the
+    posting was cancelled unwritten after POSTING_QUEUE_TIMEOUT, and
+    PostingPending when it was already being committed.
+    """
+    posting_queue = current_app.extensions.get('posting_queue')
+    if posting_queue is None:
+        result = posting(*args, **kwargs)
+        db.session.commit()
+        return result
+    timeout = current_app.config.get('POSTING_QUEUE_TIMEOUT', DEFAULT_TIMEOUT)
+    future = posting_queue.submit(posting, *args, **kwargs)
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        if future.cancel():
+            raise PostingTimeout('posting cancelled before it was written') from None
+        if future.done():
+            return future.result()
+        raise PostingPending(posting_queue.track(future)) from None
+
+def posting_status(posting_id):
+    """Outcome of a posting that raised PostingPending, or None when unknown"""
+    posting_queue = current_app.extensions.get('posting_queue')
+    return posting_queue.status(posting_id) if posting_queue is not None else None
@@ -0,0 +1,290 @@
+"""
+Chunked re-rating of existing sales after a PropertyTypeRates change.
+
+Each chunk of sales is recalculated with the batch engine and written in its
+own short transaction, so the SQLite writer lock is released between chunks
+and the job can be followed through RecalculationJob progress rows. Each
+sale's linked income transaction is set to its new max(net, 0), as
+Sale.post_income does for a single sale, and the treasury moves once per
+chunk by the summed change, so it stays the sum of the transactions.
+
+A job can instead run set-based: one UPDATE evaluates the SQL form of the
+formulas over every sale of the property type, without loading any rows, a
+second one re-prices the linked transactions and the ledger is rebuilt.
+
+Jobs run on daemon threads, so a restart or crash leaves them pending or
+running with nobody working on them. The worker refreshes heartbeat_at after
+every commit; fail_orphaned_jobs() fails active jobs whose heartbeat is older
+than ORPHANED_JOB_AFTER. A failed or cancelled job can be resumed: a chunked
+job continues after last_sale_id (each chunk committed with its progress), a
+set-based job only re-runs if its UPDATE never committed. Status changes are
+conditional UPDATEs, so a cancel is never overwritten by the worker.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import case, func, select, update
+from src.models.database import db
+from src.models.money import from_piasters, sql_money_value, sql_piasters
+from src.models.reconciliation import mark_checkpoints_stale
+from src.models.sale import Sale, PropertyTypeRates
+from src.models.treasury import Treasury
+from src.models.transaction import Transaction
+from src.models.recalculation_job import RecalculationJob
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_CHUNK_SIZE = 5000
+
+# A live worker commits every chunk within seconds
+ORPHANED_JOB_AFTER = timedelta(minutes=15)
+
+# Rates re-applied from the property type profile; salesperson and sales manager
+# tax rates are not part of the profile and keep each sale's own value
+PROFILE_RATE_FIELDS = (
+    'company_commission_rate', 'salesperson_commission_rate', 'salesperson_incentive_rate',
+    'additional_incentive_tax_rate', 'vat_rate', 'sales_tax_rate', 'annual_tax_rate'
+)
+
+def _piasters_to_decimal(value):
+    return Decimal(value).scaleb(-2)
+
+def recalculate_chunk(job, profile, rows):
+    """Re-rate one chunk of sales with their linked income transactions (no commit).
+
+    `rows` carry id, unit_code, client_name, unit_price, transaction_id and
+    the sale's own salesperson/sales manager tax rates. Returns the treasury
+    change.
+    """
+    amounts = Sale.calculate_sale_amounts_batch(
+        unit_prices=[row.unit_price or 0 for row in rows],
+        company_commission_rates=profile.company_commission_rate,
+        salesperson_commission_rates=profile.salesperson_commission_rate,
+        salesperson_incentive_rates=profile.salesperson_incentive_rate,
+        vat_rates=profile.vat_rate,
+        sales_tax_rates=profile.sales_tax_rate,
+        annual_tax_rates=profile.annual_tax_rate,
+        salesperson_tax_rates=[row.salesperson_tax_rate or 0 for row in rows],
+        sales_manager_tax_rates=[row.sales_manager_tax_rate or 0 for row in rows]
+    )
+
+    # Linked transactions go through the ORM so the ledger events re-chain
+    # the running balances and update the daily snapshots
+    linked = [row.transaction_id for row in rows if row.transaction_id]
+    transactions = {t.id: t for t in Transaction.query.filter(Transaction.id.in_(linked))} if linked else {}
+
+    now = datetime.utcnow()
+    rates = {field: getattr(profile, field) or 0 for field in PROFILE_RATE_FIELDS}
+    updates = []
+    created = []
+    net_adjustment = Decimal('0')
+    for i, row in enumerate(rows):
+        values = {'id': row.id, 'updated_at': now, 'transaction_id': row.transaction_id, **rates}
+        for field, column in amounts.items():
+            values[field] = _piasters_to_decimal(column[i])
+        updates.append(values)
+
+        # The linked transaction carries the positive net income (see Sale.post_income)
+        amount = max(values['net_company_income'], Decimal('0'))
+        transaction = transactions.get(row.transaction_id)
+        if transaction is not None:
+            net_adjustment += amount - Decimal(str(transaction.amount))
+            transaction.amount = amount
+        elif amount:
+            transaction = Transaction(
+                type=Transaction.SALE_INCOME_TYPE,
+                amount=amount,
+                description=Transaction.sale_income_description(row.unit_code, row.client_name),
+                transaction_date=now,
+                user_id=job.created_by,
+                related_entity_id=row.id,
+                related_entity_type='sale'
+            )
+            db.session.add(transaction)
+            created.append((values, transaction))
+            net_adjustment += amount
+
+    db.session.flush()
+    for values, transaction in created:
+        values['transaction_id'] = transaction.id
+    db.session.execute(update(Sale), updates)
+
+    if net_adjustment:
+        Treasury.increment(net_adjustment, now)
+    return net_adjustment
+
+def recalculate_in_sql(job, profile):
+    """Re-rate all of a property type's sales with set-based UPDATEs (no commit).
+
+    The amounts come from Sale.amount_sql_expressions, so no sale is loaded
+    into Python; the linked income transactions are re-priced in the same
+    way and the ledger is rebuilt. Sales without a linked transaction that
+    now have a positive net income go through Sale.post_income. Returns
+    (number of sales, highest sale id, treasury change).
+    """
+    rates = {field: getattr(profile, field) or 0 for field in PROFILE_RATE_FIELDS}
+    amounts = Sale.amount_sql_expressions(**{
+        field: value for field, value in rates.items() if field != 'additional_incentive_tax_rate'
+    })
+    new_income = case((amounts['net_company_income'] > 0, amounts['net_company_income']), else_=0)
+    in_type = Sale.property_type == job.property_type
+    linked = select(Sale.transaction_id).where(in_type, Sale.transaction_id.isnot(None))
+
+    # Treasury change, read before the updates in the same transaction: the
+    # linked transactions' new amounts against what they carry now
+    sale_count, last_sale_id, new_total, old_total = db.session.query(
+        func.count(Sale.id),
+        func.max(Sale.id),
+        func.coalesce(func.sum(case((Sale.transaction_id.isnot(None), new_income), else_=0)), 0),
+        func.coalesce(func.sum(sql_piasters(Transaction.amount)), 0)
+    ).select_from(Sale).outerjoin(Transaction, Transaction.id == Sale.transaction_id).filter(in_type).one()
+    net_adjustment = from_piasters(new_total - old_total)
+    edited_seqs = db.session.execute(
+        select(Transaction.posting_seq).where(Transaction.id.in_(linked), Transaction.posting_seq.isnot(None))
+    ).scalars().all()
+
+    now = datetime.utcnow()
+    db.session.execute(
+        update(Transaction)
+        .where(Transaction.id.in_(linked))
+        .values(amount=select(sql_money_value(new_income))
+                .where(Sale.transaction_id == Transaction.id).scalar_subquery())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        update(Sale)
+        .where(in_type)
+        .values(updated_at=now, **rates,
+                **{field: sql_money_value(expression) for field, expression in amounts.items()})
+        .execution_options(synchronize_session=False)
+    )
+    if net_adjustment:
+        Treasury.increment(net_adjustment, now)
+
+    # Core statements bypass the ledger events
+    Transaction.rebuild_ledger()
+    mark_checkpoints_stale(db.session.connection(), edited_seqs)
+
+    unlinked = Sale.query.filter(in_type, Sale.transaction_id.is_(None), Sale.net_company_income > 0) \
+        .execution_options(populate_existing=True)
+    for sale in unlinked:
+        net_adjustment += sale.post_income(job.created_by, now)
+    return sale_count, last_sale_id or 0, net_adjustment
+
+def _set_status(job_id, status, from_statuses, **values):
+    """Move a job to `status` only if it is still in `from_statuses` (commits).
+
+    Returns True when the job was moved.
+    """
+    result = db.session.execute(
+        update(RecalculationJob)
+        .where(RecalculationJob.id == job_id, RecalculationJob.status.in_(from_statuses))
+        .values(status=status, **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+def run_recalculation_job(job_id, set_based=False):
+    """Process a job chunk by chunk, or in one statement when `set_based`.
+
+    Resumed jobs continue from their saved progress. Stops between chunks
+    once the job is no longer active (cancelled, or failed as orphaned).
+    Must run inside an application context.
+    """
+    job = db.session.get(RecalculationJob, job_id)
+    try:
+        profile = PropertyTypeRates.get_rates_for_property_type(job.property_type)
+        if profile is None:
+            raise ValueError(f'نوع العقار {job.property_type} غير موجود')
+
+        now = datetime.utcnow()
+        if not _set_status(job_id, 'running', ('pending',), heartbeat_at=now,
+                           started_at=func.coalesce(RecalculationJob.started_at, now)):
+            return  # cancelled before it started
+        db.session.refresh(job)
+        job.total_sales = Sale.query.filter(Sale.property_type == job.property_type).count()
+        db.session.commit()
+
+        if set_based:
+            # A resumed job whose UPDATE already committed has nothing left to do
+            if not job.batches_committed:
+                sale_count, last_sale_id, net_adjustment = recalculate_in_sql(job, profile)
+                job.processed_sales = sale_count
+                job.batches_committed = 1
+                job.last_sale_id = last_sale_id
+                job.net_adjustment = net_adjustment
+                job.heartbeat_at = datetime.utcnow()
+                db.session.commit()
+        else:
+            # Each commit expires the job, so the status is re-read before every chunk
+            while job.status in RecalculationJob.ACTIVE_STATUSES:
+                # Keyset over the primary key keeps every chunk an indexed range read
+                rows = db.session.query(
+                    Sale.id, Sale.unit_code, Sale.client_name, Sale.unit_price, Sale.transaction_id,
+                    Sale.salesperson_tax_rate, Sale.sales_manager_tax_rate
+                ).filter(
+                    Sale.property_type == job.property_type,
+                    Sale.id > job.last_sale_id
+                ).order_by(Sale.id).limit(job.chunk_size).all()
+                if not rows:
+                    break
+
+                net_adjustment = recalculate_chunk(job, profile, rows)
+                job.processed_sales += len(rows)
+                job.batches_committed += 1
+                job.last_sale_id = rows[-1].id
+                job.net_adjustment = Decimal(str(job.net_adjustment or 0)) + net_adjustment
+                job.heartbeat_at = datetime.utcnow()
+                db.session.commit()
+
+        _set_status(job_id, 'completed', RecalculationJob.ACTIVE_STATUSES, finished_at=datetime.utcnow())
+    except Exception as e:
+        db.session.rollback()
+        _set_status(job_id, 'failed', RecalculationJob.ACTIVE_STATUSES, error=str(e), finished_at=datetime.utcnow())
+
+def cancel_recalculation_job(job_id):
+    """Cancel an active job; its worker, if any, stops before the next chunk (commits).
+
+    Chunks already committed stay applied. Returns False when the job was not active.
+    """
+    return _set_status(job_id, 'cancelled', RecalculationJob.ACTIVE_STATUSES, finished_at=datetime.utcnow())
+
+def resume_recalculation_job(app, job_id):
+    """Queue a failed or cancelled job again and start its worker (commits).
+
+    Returns the thread, or None when the job cannot be resumed.
+    """
+    if not _set_status(job_id, 'pending', RecalculationJob.RESUMABLE_STATUSES,
+                       error=None, finished_at=None, heartbeat_at=datetime.utcnow()):
+        return None
+    job = db.session.get(RecalculationJob, job_id)
+    return start_recalculation_job(app, job_id, set_based=(job.mode == 'sql'))
+
+def fail_orphaned_jobs(now=None):
+    """Fail active jobs whose worker stopped updating them (commits).
+
+    Returns the number of jobs failed.
+    """
+    now = now or datetime.utcnow()
+    last_seen = func.coalesce(RecalculationJob.heartbeat_at, RecalculationJob.created_at)
+    result = db.session.execute(
+        update(RecalculationJob)
+        .where(RecalculationJob.status.in_(RecalculationJob.ACTIVE_STATUSES),
+               last_seen < now - ORPHANED_JOB_AFTER)
+        .values(status='failed', finished_at=now,
+                error='توقفت المهمة قبل اكتمالها (انقطع التنفيذ)، يمكن استئنافها')
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+def start_recalculation_job(app, job_id, set_based=False):
+    """Run a job on a background thread with its own application context"""
+    def target():
+        with app.app_context():
+            run_recalculation_job(job_id, set_based)
+
+    thread = threading.Thread(target=target, name=f'recalculation-job-{job_id}', daemon=True)
+    thread.start()
+    return thread
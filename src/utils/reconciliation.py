@@ -0,0 +1,179 @@
+"""
+Incremental treasury reconciliation.
+
+The treasury balance must equal the sum of every transaction amount. The
+transactions are summed in blocks of posting sequence numbers
+(LedgerCheckpoint). A run only re-sums the blocks past the verified
+frontier and blocks marked stale by an edit or delete, so its cost follows
+the entries posted since the last run and not the size of the ledger.
+A full run re-sums every block.
+
+Each block is one range read of the posting_seq index. The run holds the
+write lock from its first statement, so no posting lands between the sums
+and the checkpoints written from them.
+
+A run reports:
+- 'treasury': the gap between the treasury and the ledger changed since the
+  previous run; the entries posted in between (and the edited blocks) are
+  where the treasury moved without a matching transaction, or the reverse.
+- 'checkpoint': entries of a verified block changed without going through
+  the application (Core statements, manual SQL); reported per block.
+- 'ledger' / 'snapshots': the running balance of the last ledger entry or
+  the last daily snapshot disagrees with the transactions
+  (Transaction.rebuild_ledger() repairs both).
+- 'unsequenced': entries without a posting_seq, not covered by any block.
+"""
+
+import json
+from datetime import datetime
+from sqlalchemy import bindparam, case, func, select, update
+from src.models.database import db
+from src.models.money import from_piasters, sql_piasters, to_piasters
+from src.models.reconciliation import LedgerCheckpoint, ReconciliationRun
+from src.models.transaction import Transaction
+from src.models.treasury import Treasury
+from src.models.treasury_snapshot import TreasuryDailySnapshot
+
+def _block_statement():
+    """Totals of one block, and of its part up to the previously verified seq"""
+    seq = Transaction.posting_seq
+    piasters = sql_piasters(Transaction.amount)
+    verified = seq <= bindparam('verified_through')
+    return select(
+        func.count(),
+        func.coalesce(func.sum(piasters), 0),
+        func.max(seq),
+        func.count(case((verified, 1))),
+        func.coalesce(func.sum(case((verified, piasters), else_=0)), 0),
+    ).where(seq.between(bindparam('first_seq'), bindparam('last_seq')))
+
+def _range(first_seq, last_seq):
+    return {'from_seq': first_seq, 'to_seq': last_seq}
+
+def _check_blocks(run, full, discrepancies):
+    """Re-sum the blocks that need it and store their checkpoints (no commit).
+
+    Returns the posting_seq ranges of the blocks that were stale.
+    """
+    checkpoints = {checkpoint.block: checkpoint for checkpoint in LedgerCheckpoint.query}
+    max_seq = db.session.execute(select(func.max(Transaction.posting_seq))).scalar() or 0
+    run.through_seq = max_seq
+
+    last_block = LedgerCheckpoint.block_of(max_seq) if max_seq else -1
+    if full:
+        blocks = set(range(last_block + 1)) | set(checkpoints)
+    else:
+        frontier = max((checkpoint.through_seq for checkpoint in checkpoints.values()), default=0)
+        blocks = set(range(LedgerCheckpoint.block_of(frontier + 1), last_block + 1))
+        blocks |= {block for block, checkpoint in checkpoints.items() if checkpoint.stale}
+
+    statement = _block_statement()
+    edited = []
+    now = datetime.utcnow()
+    for block in sorted(blocks):
+        first_seq, last_seq = LedgerCheckpoint.block_range(block)
+        checkpoint = checkpoints.get(block)
+        verified = checkpoint is not None and not checkpoint.stale
+        count, piasters, block_max, verified_count, verified_piasters = db.session.execute(statement, {
+            'first_seq': first_seq, 'last_seq': last_seq,
+            'verified_through': checkpoint.through_seq if verified else 0,
+        }).one()
+        run.blocks_checked += 1
+        run.entries_checked += count
+
+        if verified and (verified_count, verified_piasters) != \
+                (checkpoint.entry_count, to_piasters(checkpoint.amount_total)):
+            discrepancies.append({
+                'kind': 'checkpoint', **_range(first_seq, checkpoint.through_seq),
+                'expected_count': checkpoint.entry_count, 'found_count': verified_count,
+                'expected_total': float(checkpoint.amount_total), 'found_total': float(from_piasters(verified_piasters)),
+            })
+        if checkpoint is not None and checkpoint.stale:
+            edited.append(_range(first_seq, last_seq))
+
+        if checkpoint is None:
+            if not count:
+                continue
+            checkpoint = LedgerCheckpoint(block=block)
+            db.session.add(checkpoint)
+        checkpoint.through_seq = max(block_max or 0, checkpoint.through_seq or 0)
+        checkpoint.entry_count = count
+        checkpoint.amount_total = from_piasters(piasters)
+        checkpoint.stale = False
+        checkpoint.verified_at = now
+    db.session.flush()
+    return edited
+
+def _check_balances(run, edited, discrepancies):
+    """Compare the treasury and the derived running balances with the checkpoints (no commit)"""
+    ledger_piasters = db.session.execute(
+        select(func.coalesce(func.sum(sql_piasters(LedgerCheckpoint.amount_total)), 0))
+    ).scalar()
+    treasury_balance = db.session.execute(select(Treasury.current_balance).order_by(Treasury.id).limit(1)).scalar()
+    treasury_piasters = to_piasters(treasury_balance or 0)
+    run.ledger_total = from_piasters(ledger_piasters)
+    run.treasury_balance = from_piasters(treasury_piasters)
+    run.difference = from_piasters(treasury_piasters - ledger_piasters)
+
+    previous = ReconciliationRun.query.filter(
+        ReconciliationRun.status.in_(ReconciliationRun.FINISHED_STATUSES)
+    ).order_by(ReconciliationRun.id.desc()).first()
+    previous_difference = to_piasters(previous.difference) if previous else 0
+    drift = treasury_piasters - ledger_piasters - previous_difference
+    if drift:
+        # No range when nothing was posted since: the treasury moved on its own
+        first_seq = (previous.through_seq if previous else 0) + 1
+        posted = _range(first_seq, run.through_seq) if first_seq <= run.through_seq else _range(None, None)
+        discrepancies.append({
+            'kind': 'treasury', **posted, 'amount': float(from_piasters(drift)), 'edited_ranges': edited,
+        })
+
+    head = to_piasters(Transaction.ledger_head_balance())
+    if head != ledger_piasters:
+        discrepancies.append({'kind': 'ledger', 'expected_total': float(run.ledger_total),
+                              'found_total': float(from_piasters(head))})
+    closing = db.session.execute(
+        select(TreasuryDailySnapshot.closing_balance).order_by(TreasuryDailySnapshot.day.desc()).limit(1)
+    ).scalar()
+    if to_piasters(closing or 0) != ledger_piasters:
+        discrepancies.append({'kind': 'snapshots', 'expected_total': float(run.ledger_total),
+                              'found_total': float(closing or 0)})
+
+    unsequenced = db.session.query(func.count(Transaction.id)).filter(Transaction.posting_seq.is_(None)).scalar()
+    if unsequenced:
+        discrepancies.append({'kind': 'unsequenced', 'count': unsequenced})
+
+def run_reconciliation(run_id, full=False):
+    """Check the ledger from the last verified checkpoints (every block when
+    `full`) and record the result on the run. Must run inside an
+    application context; commits.
+    """
+    run = db.session.get(ReconciliationRun, run_id)
+    try:
+        # Writing first takes SQLite's write lock for the whole check
+        db.session.execute(
+            update(ReconciliationRun).where(ReconciliationRun.id == run_id).values(started_at=datetime.utcnow())
+        )
+        run.full = full
+        discrepancies = []
+        edited = _check_blocks(run, full, discrepancies)
+        _check_balances(run, edited, discrepancies)
+        run.discrepancies = json.dumps(discrepancies, ensure_ascii=False)
+        run.status = 'discrepancy' if discrepancies or run.difference else 'balanced'
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        run = db.session.get(ReconciliationRun, run_id)
+        run.status = 'failed'
+        run.error = str(e)
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+    return run
+
+def reconcile_treasury(full=False, user_id=None):
+    """Create a run, execute it and return it"""
+    run = ReconciliationRun(full=full, created_by=user_id)
+    db.session.add(run)
+    db.session.commit()
+    return run_reconciliation(run.id, full)
@@ -0,0 +1,394 @@
+"""
+Bulk import of historical sales from CSV or XLSX sheets.
+
+Rows are validated and calculated a batch at a time with the columnar engine
+(Sale.calculate_sale_amounts_batch), unit codes are checked against the
+database with one IN query per batch, and each valid batch is written in a
+single transaction: one bulk INSERT of the sales, each sale's linked income
+Transaction dated by its sale date (as Sale.post_income would record it)
+and one treasury adjustment for the batch. A dry run does everything except
+the writes. Rows with problems are skipped and reported
+with their sheet row number; they never abort the rest of the import.
+
+Column headers are Sale field names (as produced by the export endpoint) or
+the Arabic headings of the old workbook. Missing rates fall back to the
+property type's rate profile.
+"""
+
+import csv
+import io
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import insert, select, update
+from src.models.database import db
+from src.models.money import from_piasters
+from src.models.sale import Sale, PropertyTypeRates
+from src.models.treasury import Treasury
+from src.models.transaction import Transaction
+from src.utils.search import SEARCH_SOURCES, build_search_text
+
+DEFAULT_IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_BATCH_SIZE = 5000
+
+# Per-row errors returned in the report; the counts always cover every row
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_FORMATS = ('csv', 'xlsx')
+
+TEXT_FIELDS = ('client_name', 'unit_code', 'property_type', 'project_name', 'salesperson_name',
+               'sales_manager_name', 'notes')
+REQUIRED_FIELDS = ('client_name', 'unit_code', 'property_type', 'unit_price', 'sale_date')
+
+# Rates a row may carry, with the value used when neither the row nor the
+# property type's profile has one (None: the rate is required)
+RATE_FIELDS = {
+    'company_commission_rate': None,
+    'salesperson_commission_rate': Decimal('0'),
+    'salesperson_incentive_rate': Decimal('0'),
+    'additional_incentive_tax_rate': Decimal('0'),
+    'vat_rate': Decimal('0.14'),
+    'sales_tax_rate': Decimal('0.05'),
+    'annual_tax_rate': Decimal('0.225'),
+    'salesperson_tax_rate': Decimal('0'),
+    'sales_manager_tax_rate': Decimal('0'),
+}
+
+# Headings used by the old workbook and the list page's export
+HEADER_ALIASES = {
+    'كود الوحدة': 'unit_code',
+    'العميل': 'client_name',
+    'اسم العميل': 'client_name',
+    'المشروع': 'project_name',
+    'نوع العقار': 'property_type',
+    'سعر الوحدة': 'unit_price',
+    'تاريخ البيع': 'sale_date',
+    'مندوب المبيعات': 'salesperson_name',
+    'مدير المبيعات': 'sales_manager_name',
+    'ملاحظات': 'notes',
+    'نسبة عمولة الشركة': 'company_commission_rate',
+}
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%Y/%m/%d', '%d-%m-%Y')
+
+class ImportFileError(ValueError):
+    """Raised when an uploaded file cannot be read as a sales sheet"""
+
+# ----------------------------------------------------------------------------
+# Reading sheets
+# ----------------------------------------------------------------------------
+
+def _header_key(heading):
+    heading = str(heading or '').strip().lstrip('﻿')
+    return HEADER_ALIASES.get(heading, heading.lower())
+
+def _csv_rows(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    try:
+        yield next(reader)
+    except StopIteration:
+        return
+    except UnicodeDecodeError:
+        raise ImportFileError('يجب أن يكون ملف CSV بترميز UTF-8')
+    yield from reader
+
+_SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_CELL_REF = re.compile(r'([A-Z]+)')
+
+def _column_index(ref):
+    index = 0
+    for letter in _CELL_REF.match(ref).group(1):
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+def _xlsx_rows(stream):
+    """Rows of the first worksheet, parsed incrementally"""
+    try:
+        archive = zipfile.ZipFile(stream)
+        names = set(archive.namelist())
+    except zipfile.BadZipFile:
+        raise ImportFileError('ملف XLSX غير صالح')
+    sheets = sorted(name for name in names if re.fullmatch(r'xl/worksheets/sheet\d+\.xml', name))
+    if not sheets:
+        raise ImportFileError('لا يحتوي الملف على ورقة عمل')
+    sheet_name = 'xl/worksheets/sheet1.xml' if 'xl/worksheets/sheet1.xml' in names else sheets[0]
+
+    shared = []
+    if 'xl/sharedStrings.xml' in names:
+        with archive.open('xl/sharedStrings.xml') as source:
+            for _, element in ET.iterparse(source):
+                if element.tag == f'{_SHEET_NS}si':
+                    shared.append(''.join(t.text or '' for t in element.iter(f'{_SHEET_NS}t')))
+                    element.clear()
+
+    with archive.open(sheet_name) as source:
+        for _, element in ET.iterparse(source):
+            if element.tag != f'{_SHEET_NS}row':
+                continue
+            values = []
+            for position, cell in enumerate(element.iter(f'{_SHEET_NS}c')):
+                ref = cell.get('r')
+                index = _column_index(ref) if ref else position
+                values.extend([None] * (index - len(values)))
+                kind = cell.get('t')
+                raw = cell.find(f'{_SHEET_NS}v')
+                if kind == 'inlineStr':
+                    value = ''.join(t.text or '' for t in cell.iter(f'{_SHEET_NS}t'))
+                elif raw is None or raw.text is None:
+                    value = None
+                elif kind == 's':
+                    value = shared[int(raw.text)]
+                elif kind in ('str', 'e'):
+                    value = raw.text
+                elif kind == 'b':
+                    value = raw.text == '1'
+                else:
+                    value = Decimal(raw.text)
+                values.append(value)
+            element.clear()
+            yield values
+
+def read_sheet(stream, filename):
+    """Yield (sheet row number, {field: raw value}) for each non-empty data row"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in IMPORT_FORMATS:
+        raise ImportFileError('يمكن استيراد ملفات CSV و XLSX فقط')
+    rows = _csv_rows(stream) if extension == 'csv' else _xlsx_rows(stream)
+
+    header = next(rows, None)
+    if not header:
+        raise ImportFileError('الملف فارغ')
+    fields = [_header_key(heading) for heading in header]
+    missing = [field for field in REQUIRED_FIELDS if field not in fields]
+    if missing:
+        raise ImportFileError(f'أعمدة مفقودة: {", ".join(missing)}')
+
+    for number, values in enumerate(rows, start=2):
+        if not any(value not in (None, '') for value in values):
+            continue
+        yield number, dict(zip(fields, values))
+
+# ----------------------------------------------------------------------------
+# Validation
+# ----------------------------------------------------------------------------
+
+_ARABIC_DIGITS = str.maketrans('٠١٢٣٤٥٦٧٨٩٫٬', '0123456789.,')
+
+def parse_amount(value):
+    """Decimal from a cell value; commas and Arabic digits allowed"""
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return Decimal(str(value))
+    cleaned = str(value).translate(_ARABIC_DIGITS).replace(',', '').strip()
+    try:
+        return Decimal(cleaned)
+    except InvalidOperation:
+        raise ValueError(value)
+
+def parse_rate(value):
+    """Rate as a fraction: '2.5%' and 0.025 are the same rate"""
+    if isinstance(value, str) and value.strip().endswith('%'):
+        return parse_amount(value.strip()[:-1]) / 100
+    return parse_amount(value)
+
+def parse_date(value):
+    """Date from an ISO/day-first string, a date cell or an Excel serial number"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, (Decimal, int, float)) and not isinstance(value, bool):
+        # Excel's 1900 date system (serial 1 = 1900-01-01, with its leap-year bug)
+        return date(1899, 12, 30) + timedelta(days=int(value))
+    text = str(value).translate(_ARABIC_DIGITS).strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(text).date()
+    except ValueError:
+        raise ValueError(value)
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+def validate_row(raw, profiles):
+    """Parse one sheet row. Returns (values, errors); errors are Arabic messages"""
+    errors = []
+    values = {}
+    for field in TEXT_FIELDS:
+        value = raw.get(field)
+        if isinstance(value, Decimal) and value == value.to_integral_value():
+            value = int(value)  # numeric unit codes read from XLSX
+        values[field] = '' if _blank(value) else str(value).strip()
+    for field in REQUIRED_FIELDS:
+        if _blank(raw.get(field)):
+            errors.append(f'الحقل {field} مطلوب')
+    if errors:
+        return values, errors
+
+    profile = profiles.get(values['property_type'])
+    if profile is None:
+        errors.append(f'نوع العقار غير معروف: {values["property_type"]}')
+
+    try:
+        values['unit_price'] = parse_amount(raw['unit_price'])
+        if values['unit_price'] <= 0:
+            errors.append('سعر الوحدة يجب أن يكون أكبر من صفر')
+    except ValueError:
+        errors.append('سعر الوحدة غير صحيح')
+
+    try:
+        values['sale_date'] = parse_date(raw['sale_date'])
+    except (ValueError, OverflowError):
+        errors.append('تاريخ البيع غير صحيح')
+
+    for field, default in RATE_FIELDS.items():
+        value = raw.get(field)
+        if _blank(value):
+            value = getattr(profile, field, None) if profile is not None else None
+            value = default if value is None else Decimal(str(value))
+            if value is None:
+                errors.append(f'الحقل {field} مطلوب')
+                continue
+        else:
+            try:
+                value = parse_rate(value)
+            except ValueError:
+                errors.append(f'قيمة {field} غير صحيحة')
+                continue
+        if not 0 <= value <= 1:
+            errors.append(f'قيمة {field} يجب أن تكون بين 0 و 1')
+        values[field] = value
+    return values, errors
+
+# ----------------------------------------------------------------------------
+# Import
+# ----------------------------------------------------------------------------
+
+def _calculate(batch):
+    """Stored amounts for a batch of validated rows, as Decimal columns"""
+    amounts = Sale.calculate_sale_amounts_batch(
+        unit_prices=[row['unit_price'] for row in batch],
+        company_commission_rates=[row['company_commission_rate'] for row in batch],
+        salesperson_commission_rates=[row['salesperson_commission_rate'] for row in batch],
+        salesperson_incentive_rates=[row['salesperson_incentive_rate'] for row in batch],
+        vat_rates=[row['vat_rate'] for row in batch],
+        sales_tax_rates=[row['sales_tax_rate'] for row in batch],
+        annual_tax_rates=[row['annual_tax_rate'] for row in batch],
+        salesperson_tax_rates=[row['salesperson_tax_rate'] for row in batch],
+        sales_manager_tax_rates=[row['sales_manager_tax_rate'] for row in batch]
+    )
+    return {key: [from_piasters(value) for value in column] for key, column in amounts.items()}
+
+def _post_sale_income(rows, sale_ids, user_id, now):
+    """Record each imported sale's linked income transaction on its sale date,
+    link it to the sale and add the batch's total to the treasury (no commit)
+    """
+    transactions = [
+        Transaction(
+            type=Transaction.SALE_INCOME_TYPE,
+            amount=row['net_company_income'],
+            description=Transaction.sale_income_description(row['unit_code'], row['client_name']),
+            transaction_date=datetime.combine(row['sale_date'], time()),
+            user_id=user_id,
+            related_entity_id=sale_id,
+            related_entity_type='sale'
+        )
+        for row, sale_id in zip(rows, sale_ids) if row['net_company_income'] > 0
+    ]
+    if not transactions:
+        return
+    # The ORM flush numbers the entries and re-chains the ledger from the
+    # earliest sale date once for the whole batch
+    db.session.add_all(transactions)
+    db.session.flush()
+    db.session.execute(update(Sale), [
+        {'id': transaction.related_entity_id, 'transaction_id': transaction.id} for transaction in transactions
+    ])
+    Treasury.increment(sum(transaction.amount for transaction in transactions), now)
+
+def _import_batch(entries, report, user_id, dry_run):
+    """Check, calculate and (unless dry_run) write one batch of (row number, values)"""
+    codes = [values['unit_code'] for _, values in entries]
+    taken = set(db.session.execute(select(Sale.unit_code).where(Sale.unit_code.in_(codes))).scalars())
+    batch = []
+    for number, values in entries:
+        if values['unit_code'] in taken:
+            _add_error(report, number, values['unit_code'], ['كود الوحدة موجود بالفعل'])
+        else:
+            batch.append((number, values))
+    if not batch:
+        return
+
+    amounts = _calculate([values for _, values in batch])
+    now = datetime.utcnow()
+    rows = []
+    net_income = Decimal('0')
+    for i, (_, values) in enumerate(batch):
+        row = dict(values, created_by=user_id, created_at=now, updated_at=now)
+        for key, column in amounts.items():
+            row[key] = column[i]
+        row['search_text'] = build_search_text(*(row.get(field) for field in SEARCH_SOURCES['sales']))
+        if row['net_company_income'] > 0:
+            net_income += row['net_company_income']
+        rows.append(row)
+
+    report['batches'] += 1
+    if not dry_run:
+        try:
+            sale_ids = db.session.execute(
+                insert(Sale).returning(Sale.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+            _post_sale_income(rows, sale_ids, user_id, now)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for number, values in batch:
+                _add_error(report, number, values['unit_code'], [f'تعذر حفظ الدفعة: {e}'])
+            return
+    report['imported'] += len(rows)
+    report['net_company_income'] += net_income
+
+def _add_error(report, number, unit_code, messages):
+    report['failed'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append({'row': number, 'unit_code': unit_code or None, 'errors': messages})
+    else:
+        report['errors_truncated'] = True
+
+def import_sales(rows, user_id=None, dry_run=False, batch_size=DEFAULT_IMPORT_BATCH_SIZE):
+    """Import (row number, raw values) pairs, e.g. from read_sheet().
+
+    Each batch commits on its own, so an interrupted import keeps the batches
+    already written; re-running the same file then reports those rows as
+    existing unit codes. Returns the report dict.
+    """
+    report = {'dry_run': dry_run, 'total_rows': 0, 'imported': 0, 'failed': 0, 'batches': 0,
+              'net_company_income': Decimal('0'), 'errors': [], 'errors_truncated': False}
+    profiles = PropertyTypeRates.get_rate_profiles()
+    seen = set()
+    pending = []
+    for number, raw in rows:
+        report['total_rows'] += 1
+        values, errors = validate_row(raw, profiles)
+        if not errors and values['unit_code'] in seen:
+            errors = ['كود الوحدة مكرر في الملف']
+        if errors:
+            _add_error(report, number, values.get('unit_code'), errors)
+            continue
+        seen.add(values['unit_code'])
+        pending.append((number, values))
+        if len(pending) >= batch_size:
+            _import_batch(pending, report, user_id, dry_run)
+            pending = []
+    if pending:
+        _import_batch(pending, report, user_id, dry_run)
+    report['errors'].sort(key=lambda error: error['row'])
+    return report
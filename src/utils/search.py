@@ -0,0 +1,184 @@
+"""
+Full-text search over sales and transactions (SQLite FTS5).
+
+Searchable fields are folded into a normalized `search_text` shadow column
+(Arabic letter variants unified, diacritics and tatweel dropped, digits made
+Western, case folded); search terms are normalized the same way, so spelling
+variants of a name find each other.
+
+Each searchable table gets an external-content FTS5 index on that column
+using the trigram tokenizer, kept in sync by triggers, so inserts and updates
+made through the ORM, bulk statements or raw SQL are all indexed. A trigram
+phrase query matches exactly the rows `LIKE '%term%'` matches, but reads
+only the index. Terms shorter than three characters, databases other than
+SQLite, and SQLite builds without FTS5 keep using LIKE on the shadow column.
+"""
+
+import re
+from sqlalchemy import column, inspect, literal_column, select, table, text
+
+MIN_FTS_TERM_LENGTH = 3
+BACKFILL_BATCH_SIZE = 5000
+
+# Table -> columns folded into its search_text shadow column
+SEARCH_SOURCES = {
+    'sales': ('client_name', 'unit_code', 'project_name', 'salesperson_name'),
+    'transactions': ('description', 'type'),
+}
+
+# FTS index name -> (content table, indexed columns)
+SEARCH_INDEXES = {
+    'sales_fts': ('sales', ('search_text',)),
+    'transactions_fts': ('transactions', ('search_text',)),
+}
+
+_ARABIC_FOLDING = {
+    **{ord(c): 'ا' for c in 'أإآٱ'},
+    ord('ة'): 'ه',
+    ord('ى'): 'ي',
+    ord('ـ'): None,  # tatweel
+    # Harakat, superscript alef and Quranic marks
+    **{code: None for code in range(0x064B, 0x0660)},
+    0x0670: None,
+    **{code: None for code in range(0x06D6, 0x06EE)},
+    # Arabic-Indic and Eastern Arabic-Indic digits
+    **{0x0660 + i: str(i) for i in range(10)},
+    **{0x06F0 + i: str(i) for i in range(10)},
+}
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_search_text(value):
+    """Fold a name or search term to the form stored in search_text"""
+    if not value:
+        return ''
+    folded = str(value).translate(_ARABIC_FOLDING).casefold()
+    return _WHITESPACE.sub(' ', folded).strip()
+
+def build_search_text(*values):
+    """search_text for a row from its source column values (one line per field)"""
+    return '\n'.join(normalize_search_text(v) for v in values if v)
+
+# Engines whose FTS indexes were verified at startup (url -> bool)
+_fts_ready = {}
+
+def _trigger_sql(index_name, content_table, columns):
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{c}' for c in columns)
+    old_values = ', '.join(f'old.{c}' for c in columns)
+    delete_old = (f"INSERT INTO {index_name}({index_name}, rowid, {cols}) "
+                  f"VALUES ('delete', old.id, {old_values});")
+    insert_new = f'INSERT INTO {index_name}(rowid, {cols}) VALUES (new.id, {new_values});'
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {index_name}_ai AFTER INSERT ON {content_table} '
+        f'BEGIN {insert_new} END',
+        f'CREATE TRIGGER IF NOT EXISTS {index_name}_ad AFTER DELETE ON {content_table} '
+        f'BEGIN {delete_old} END',
+        f'CREATE TRIGGER IF NOT EXISTS {index_name}_au AFTER UPDATE OF {cols} ON {content_table} '
+        f'BEGIN {delete_old} {insert_new} END',
+    ]
+
+def ensure_search_indexes(engine):
+    """Fill missing search_text values, then create missing FTS indexes and triggers.
+
+    Returns True when full-text search is available on this engine.
+    """
+    try:
+        backfill_search_text(engine)
+    except Exception:
+        pass  # tables not created yet; the next call fills them
+
+    if engine.dialect.name != 'sqlite':
+        _fts_ready[str(engine.url)] = False
+        return False
+
+    try:
+        with engine.begin() as connection:
+            existing = set(inspect(connection).get_table_names())
+            for index_name, (content_table, columns) in SEARCH_INDEXES.items():
+                if content_table not in existing:
+                    raise LookupError(content_table)
+                if index_name in existing and _indexed_columns(connection, index_name) != columns:
+                    _drop_index(connection, index_name)
+                    existing.discard(index_name)
+                created = index_name not in existing
+                connection.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {index_name} USING fts5("
+                    f"{', '.join(columns)}, content='{content_table}', content_rowid='id', "
+                    f"tokenize='trigram')"
+                ))
+                for statement in _trigger_sql(index_name, content_table, columns):
+                    connection.execute(text(statement))
+                if created:
+                    connection.execute(text(f"INSERT INTO {index_name}({index_name}) VALUES ('rebuild')"))
+        ready = True
+    except Exception:
+        # No FTS5/trigram support in this SQLite build, or tables not created yet
+        ready = False
+    _fts_ready[str(engine.url)] = ready
+    return ready
+
+def _indexed_columns(connection, index_name):
+    return tuple(row[1] for row in connection.execute(text(f'PRAGMA table_info({index_name})')))
+
+def _drop_index(connection, index_name):
+    for suffix in ('ai', 'ad', 'au'):
+        connection.execute(text(f'DROP TRIGGER IF EXISTS {index_name}_{suffix}'))
+    connection.execute(text(f'DROP TABLE IF EXISTS {index_name}'))
+
+def backfill_search_text(engine, recompute=False):
+    """Fill search_text for rows written without it (raw SQL, bulk inserts, old rows).
+
+    With `recompute`, every row is rebuilt, e.g. after the normalization
+    rules change. Returns the number of rows updated.
+    """
+    updated = 0
+    with engine.begin() as connection:
+        existing = set(inspect(connection).get_table_names())
+        for table_name, sources in SEARCH_SOURCES.items():
+            if table_name not in existing:
+                continue
+            if 'search_text' not in {c['name'] for c in inspect(connection).get_columns(table_name)}:
+                continue
+            last_id = 0
+            while True:
+                rows = connection.execute(text(
+                    f"SELECT id, {', '.join(sources)} FROM {table_name} WHERE id > :last_id"
+                    f"{'' if recompute else ' AND search_text IS NULL'} ORDER BY id LIMIT :limit"
+                ), {'last_id': last_id, 'limit': BACKFILL_BATCH_SIZE}).all()
+                if not rows:
+                    break
+                connection.execute(
+                    text(f'UPDATE {table_name} SET search_text = :search_text WHERE id = :id'),
+                    [{'id': row[0], 'search_text': build_search_text(*row[1:])} for row in rows]
+                )
+                updated += len(rows)
+                last_id = rows[-1][0]
+    return updated
+
+def rebuild_search_indexes(engine):
+    """Recompute every search_text and recreate the FTS indexes and triggers"""
+    with engine.begin() as connection:
+        for index_name in SEARCH_INDEXES:
+            _drop_index(connection, index_name)
+    backfill_search_text(engine, recompute=True)
+    return ensure_search_indexes(engine)
+
+def fts_phrase(term):
+    """FTS5 query string matching `term` as a contiguous substring"""
+    return '"' + term.replace('"', '""') + '"'
+
+def fts_matches(engine, index_name, term):
+    """Subquery of (id, rank) for rows whose search_text contains the normalized `term`.
+
+    Returns None when the index cannot serve the term; callers then fall back
+    to LIKE. Lower rank (bm25) means a better match.
+    """
+    term = normalize_search_text(term)
+    if len(term) < MIN_FTS_TERM_LENGTH or not _fts_ready.get(str(engine.url)):
+        return None
+    index = table(index_name, column('rowid'), column('rank'))
+    return (
+        select(index.c.rowid.label('id'), index.c.rank.label('rank'))
+        .where(literal_column(index_name).op('MATCH')(fts_phrase(term)))
+        .subquery()
+    )
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the application starts on an empty database: importing
+src.main (in a fresh interpreter, so no model was imported beforehand)
+creates every table and bootstraps the ledger without errors
+"""
+
+import sys
+import os
+import sqlite3
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def test_main_starts_on_empty_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'fresh.db')
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', POSTING_QUEUE='0')
+        result = subprocess.run([sys.executable, '-c', 'import src.main'], cwd=ROOT, env=env,
+                                capture_output=True, text=True, timeout=300)
+        assert result.returncode == 0, result.stderr
+
+        connection = sqlite3.connect(db_path)
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        connection.close()
+        assert {'users', 'sales', 'transactions', 'treasury', 'treasury_daily_snapshots',
+                'treasury_daily_rollups', 'ledger_checkpoints', 'reconciliation_runs'} <= tables, tables
+    print("✓ Application startup test passed")
+
+if __name__ == "__main__":
+    print("Running application startup tests...")
+    test_main_starts_on_empty_database()
+    print("\n🎉 All application startup tests passed!")
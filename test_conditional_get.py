@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script to verify conditional GET: a matching If-None-Match gets 304
+without running the endpoint, and writes to a watched table change the ETag
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from datetime import date
+from flask import Flask, jsonify
+from src.models.database import db
+from src.models import user  # noqa: F401 (configure relationships)
+from src.models.sale import Sale
+from src.models.transaction import Transaction
+from src.utils.conditional import conditional_get
+
+def make_app(calls):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+
+    @app.route('/sales')
+    @conditional_get('sales')
+    def sales():
+        calls.append('sales')
+        return jsonify({'count': Sale.query.count()})
+
+    @app.route('/missing')
+    @conditional_get('sales')
+    def missing():
+        return jsonify({'error': 'not found'}), 404
+
+    with app.app_context():
+        db.create_all()
+    return app
+
+def add_sale(code):
+    db.session.add(Sale(client_name='Client', sale_date=date(2024, 1, 1), unit_code=code, unit_price=100,
+                        property_type='شقة', company_commission_rate=0.025,
+                        company_commission_amount=0, net_company_income=0))
+    db.session.commit()
+
+def test_not_modified_until_write():
+    calls = []
+    app = make_app(calls)
+    client = app.test_client()
+
+    first = client.get('/sales')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'private, no-cache'
+
+    cached = client.get('/sales', headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.headers['ETag'] == etag
+    assert calls == ['sales']  # the endpoint did not run
+
+    # Other arguments are a different resource
+    assert client.get('/sales?page=2', headers={'If-None-Match': etag}).status_code == 200
+
+    # Writes to other tables keep the validator
+    with app.app_context():
+        db.session.add(Transaction(type='Expense', amount=-5))
+        db.session.commit()
+    assert client.get('/sales', headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        add_sale('CG-1')
+    changed = client.get('/sales', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.get_json() == {'count': 1}
+    assert changed.headers['ETag'] != etag
+
+    # Errors are not validated or cached
+    assert 'ETag' not in client.get('/missing').headers
+    print("✓ Conditional GET test passed")
+
+if __name__ == "__main__":
+    print("Running conditional GET tests...")
+    test_not_modified_until_write()
+    print("\n🎉 All conditional GET tests passed!")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script to verify list totals: ORM and bulk writes bump the table
+version, exact totals are cached until then, and the estimate/none modes
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from datetime import date
+from flask import Flask
+from sqlalchemy import insert, update
+from src.models.database import db
+from src.models import user, transaction  # noqa: F401 (configure Sale relationships)
+from src.models.sale import Sale
+from src.models.table_version import TableVersion
+from src.utils.pagination import ESTIMATE_MAX_VERSION_LAG, count_cache, count_rows
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+def new_sale(i, property_type='شقة'):
+    return Sale(client_name=f'Client {i}', sale_date=date(2024, 1, 1), unit_code=f'CC-{i}', unit_price=100,
+                property_type=property_type, company_commission_rate=0.025,
+                company_commission_amount=0, net_company_income=0)
+
+def sale_rows(start, count):
+    return [{'client_name': 'Bulk', 'sale_date': date(2024, 1, 1), 'unit_code': f'BK-{start + i}',
+             'unit_price': 100, 'property_type': 'تجاري', 'company_commission_rate': 0.025,
+             'company_commission_amount': 0, 'net_company_income': 0} for i in range(count)]
+
+def test_writes_bump_version():
+    with make_app().app_context():
+        assert TableVersion.get_version('sales') == 0
+        db.session.add(new_sale(1))
+        db.session.commit()
+        assert TableVersion.get_version('sales') == 1
+
+        sale = db.session.get(Sale, 1)
+        sale.client_name = 'Renamed'
+        db.session.commit()
+        assert TableVersion.get_version('sales') == 2
+
+        # Loading without changing anything is not a write
+        db.session.get(Sale, 1).client_name = 'Renamed'
+        db.session.commit()
+        assert TableVersion.get_version('sales') == 2
+
+        db.session.execute(insert(Sale), sale_rows(0, 3))
+        db.session.execute(update(Sale).where(Sale.id == 1).values(unit_price=200))
+        db.session.commit()
+        assert TableVersion.get_version('sales') == 4
+
+        db.session.delete(db.session.get(Sale, 1))
+        db.session.commit()
+        assert TableVersion.get_version('sales') == 5
+        assert TableVersion.get_version('transactions') == 0
+        db.session.remove()
+    print("✓ Table version bump test passed")
+
+def test_count_modes():
+    count_cache.clear()
+    with make_app().app_context():
+        for i in range(10):
+            db.session.add(new_sale(i, 'شقة' if i % 2 else 'اداري'))
+        db.session.commit()
+        flats = Sale.query.filter(Sale.property_type == 'شقة')
+
+        assert count_rows(flats, Sale.id) == (5, False)
+        hits = count_cache.hits
+        assert count_rows(Sale.query.filter(Sale.property_type == 'شقة'), Sale.id) == (5, False)
+        assert count_cache.hits == hits + 1
+        assert count_rows(Sale.query.filter(Sale.property_type == 'اداري'), Sale.id) == (5, False)
+        assert count_rows(flats, Sale.id, 'none') == (None, False)
+
+        # A write makes the cached total stale: exact recounts, estimate reuses it
+        db.session.add(new_sale(10))
+        db.session.commit()
+        assert count_rows(flats, Sale.id, 'estimate') == (5, True)
+        assert count_rows(flats, Sale.id, 'exact') == (6, False)
+        assert count_rows(flats, Sale.id, 'estimate') == (6, False)
+
+        # ...but not once it is too many writes old
+        for i in range(ESTIMATE_MAX_VERSION_LAG + 1):
+            db.session.execute(insert(Sale), sale_rows(i, 1))
+        db.session.commit()
+        assert count_rows(flats, Sale.id, 'estimate') == (6, False)
+
+        # Unfiltered estimates come from the id span without counting
+        count_cache.clear()
+        total = Sale.query.count()
+        assert count_rows(Sale.query, Sale.id, 'estimate') == (total, True)
+        assert count_rows(Sale.query, Sale.id, 'exact') == (total, False)
+        db.session.remove()
+    print("✓ Count mode test passed")
+
+if __name__ == "__main__":
+    print("Running count cache tests...")
+    test_writes_bump_version()
+    test_count_modes()
+    print("\n🎉 All count cache tests passed!")
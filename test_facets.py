@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script to verify facet counts: each dimension ignores its own filter,
+results are cached per filter set and refreshed after writes
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from datetime import date
+from flask import Flask
+from sqlalchemy import event
+from src.models.database import db
+from src.models import user  # noqa: F401 (configure relationships)
+from src.models.sale import Sale
+from src.utils.facets import facet_counts
+
+DIMENSIONS = {'property_type': Sale.property_type, 'project_name': Sale.project_name}
+
+def add_sale(code, property_type, project_name):
+    db.session.add(Sale(client_name='Client', sale_date=date(2024, 1, 1), unit_code=code, unit_price=100,
+                        property_type=property_type, project_name=project_name, company_commission_rate=0.025,
+                        company_commission_amount=0, net_company_income=0))
+    db.session.commit()
+
+def facets_for(filters):
+    queries = {name: Sale.query.filter(*(column == filters[other] for other, column in DIMENSIONS.items()
+                                         if other in filters and other != name))
+               for name in DIMENSIONS}
+    return facet_counts(queries, DIMENSIONS, Sale.id)
+
+def test_facet_counts():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        for i, (property_type, project) in enumerate([('شقة', 'A'), ('شقة', 'A'), ('شقة', 'B'),
+                                                       ('تجاري', 'A'), ('تجاري', None)]):
+            add_sale(f'FC-{i}', property_type, project)
+
+        facets = facets_for({'property_type': 'شقة'})
+        # Property types are counted as if no type were picked
+        assert facets['property_type'] == [{'value': 'شقة', 'count': 3}, {'value': 'تجاري', 'count': 2}]
+        assert facets['project_name'] == [{'value': 'A', 'count': 2}, {'value': 'B', 'count': 1}]
+
+        queries = []
+        event.listen(db.engine, 'before_cursor_execute', lambda conn, cursor, statement, *args: queries.append(statement))
+        assert facets_for({'property_type': 'شقة'}) == facets
+        assert not any('GROUP BY' in statement for statement in queries), queries
+
+        add_sale('FC-9', 'شقة', 'B')
+        assert facets_for({'property_type': 'شقة'})['project_name'] == \
+            [{'value': 'A', 'count': 2}, {'value': 'B', 'count': 2}]
+    print("✓ Facet counts test passed")
+
+if __name__ == "__main__":
+    print("Running facet tests...")
+    test_facet_counts()
+    print("\n🎉 All facet tests passed!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test script to verify sparse fieldsets: to_dict(fields) matches the full
+dict, field names are validated, and load_only() selects only those columns
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from datetime import date
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from src.models.database import db
+from src.models import user  # noqa: F401 (configure relationships)
+from src.models.sale import Sale
+from src.models.transaction import Transaction
+from src.utils.fieldsets import InvalidFields, load_only_fields, parse_fields
+
+def test_parse_fields():
+    assert parse_fields(None, Sale.DICT_FIELDS) is None
+    assert parse_fields(' ', Sale.DICT_FIELDS) is None
+    # Output order follows the model, id is always included
+    assert parse_fields('unit_price, client_name,,', Sale.DICT_FIELDS) == ['id', 'client_name', 'unit_price']
+    try:
+        parse_fields('client_name,password', Sale.DICT_FIELDS)
+        assert False, 'unknown field accepted'
+    except InvalidFields as e:
+        assert str(e) == 'password'
+    print("✓ Field parsing test passed")
+
+def test_sparse_dicts_match_full():
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Sale(client_name='Client', sale_date=date(2024, 3, 1), unit_code='FS-1', unit_price=1500000,
+                         property_type='شقة', company_commission_rate=0.025, company_commission_amount=37500,
+                         net_company_income=26000))
+        session.add(Transaction(type='Sale', amount=26000, description='بيع'))
+        session.commit()
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda conn, cursor, statement, *args: statements.append(statement))
+    for model, requested in ((Sale, 'client_name,unit_price,sale_date'), (Transaction, 'amount,transaction_date')):
+        with Session(engine) as session:
+            full = session.query(model).one().to_dict()
+            assert list(full) == list(model.DICT_FIELDS)
+
+        fields = parse_fields(requested, model.DICT_FIELDS)
+        with Session(engine) as session:
+            statements.clear()
+            row = session.query(model).options(load_only_fields(model, fields)).one()
+            sparse = row.to_dict(fields)
+            assert len(statements) == 1, statements
+        assert sparse == {name: full[name] for name in fields}
+        selected = statements[0].split(' FROM ')[0]
+        for name in model.DICT_FIELDS:
+            assert (f'.{name} AS' in selected) == (name in fields), (name, selected)
+    engine.dispose()
+    print("✓ Sparse to_dict/load_only test passed")
+
+if __name__ == "__main__":
+    print("Running fieldset tests...")
+    test_parse_fields()
+    test_sparse_dicts_match_full()
+    print("\n🎉 All fieldset tests passed!")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test script to verify cursor pagination walks the same rows, in the same
+order, as the classic newest-first offset listing
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from src.models.database import db
+from src.models import user, transaction  # noqa: F401 (configure Sale relationships)
+from src.models.sale import Sale
+from src.utils.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_order, keyset_page
+
+def make_session():
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+    session = Session(engine)
+    base = datetime(2024, 1, 1)
+    for i in range(53):
+        # Pairs share a timestamp and every fifth row has no date at all
+        when = None if i % 5 == 0 else base + timedelta(hours=i // 2)
+        session.execute(text(
+            "INSERT INTO sales (client_name, sale_date, unit_code, unit_price, property_type, "
+            "company_commission_rate, company_commission_amount, net_company_income, created_at) "
+            "VALUES ('Client', '2024-01-01', :code, :price, 'شقة', 0.025, 0, 0, :when)"
+        ), {'code': f'U{i}', 'price': i, 'when': when.strftime('%Y-%m-%d %H:%M:%S.%f') if when else None})
+    session.commit()
+    return session
+
+def test_cursor_walk_matches_offset_order():
+    session = make_session()
+    query = session.query(Sale)
+    expected = [s.id for s in query.order_by(*keyset_order(Sale.created_at, Sale.id))]
+
+    for per_page in (1, 4, 10, 53, 100):
+        seen, cursor = [], ''
+        while cursor is not None:
+            items, cursor = keyset_page(query, Sale.created_at, Sale.id, cursor, per_page)
+            seen.extend(s.id for s in items)
+        assert seen == expected, (per_page, seen)
+    session.close()
+    print("✓ Cursor walk test passed")
+
+def test_filtered_walk():
+    session = make_session()
+    query = session.query(Sale).filter(Sale.unit_price > 20)
+    expected = [s.id for s in query.order_by(*keyset_order(Sale.created_at, Sale.id))]
+    seen, cursor = [], ''
+    while cursor is not None:
+        items, cursor = keyset_page(query, Sale.created_at, Sale.id, cursor, 7)
+        seen.extend(s.id for s in items)
+    assert seen == expected
+    session.close()
+    print("✓ Filtered cursor walk test passed")
+
+def test_cursor_round_trip():
+    when = datetime(2024, 5, 1, 10, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(when, 42)) == (when, 42)
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+    for bad in ('zzz', 'e30', encode_cursor(when, 1)[:-3]):
+        try:
+            decode_cursor(bad)
+        except InvalidCursor:
+            continue
+        raise AssertionError(f'{bad!r} should be rejected')
+    print("✓ Cursor encoding test passed")
+
+if __name__ == "__main__":
+    print("Running keyset pagination tests...")
+    test_cursor_walk_matches_offset_order()
+    test_filtered_walk()
+    test_cursor_round_trip()
+    print("\n🎉 All keyset pagination tests passed!")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script for the integer piaster money storage: pound/piaster conversion
+and the in-place migration of existing NUMERIC data
+"""
+
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from decimal import Decimal
+from sqlalchemy import create_engine, text
+from src.models.database import db
+from src.models.money import to_piasters, from_piasters
+from src.models import user, treasury, transaction, sale, recalculation_job, app_setting  # noqa: F401
+from src.utils.money_storage import convert_money_storage, read_money_storage, money_columns
+
+def test_piaster_conversion():
+    """Pound amounts round half-up to whole piasters and back"""
+    cases = [
+        (Decimal('1234567.89'), 123456789),
+        (Decimal('12125.0012125'), 1212500),
+        (Decimal('0.005'), 1),
+        (Decimal('-0.005'), -1),
+        (1000000.15, 100000015),
+        ('99.99', 9999),
+        (0, 0),
+    ]
+    for value, expected in cases:
+        assert to_piasters(value) == expected, (value, to_piasters(value), expected)
+    assert from_piasters(123456789) == Decimal('1234567.89')
+    assert from_piasters(-1) == Decimal('-0.01')
+    print("✓ Piaster conversion test passed")
+
+def test_convert_existing_database():
+    """NUMERIC data converts to piasters and back without losing a piaster"""
+    assert 'amount' in money_columns(db.metadata)['transactions']
+    assert 'company_commission_rate' not in money_columns(db.metadata)['sales']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'money.db')}")
+        db.metadata.create_all(engine)
+        amounts = [1000000.15, -250.5, 0.07, 12125.0012125]
+        with engine.begin() as connection:
+            for value in amounts:
+                connection.execute(
+                    text("INSERT INTO transactions (type, amount, transaction_date) VALUES ('Sale', :amount, '2024-01-01')"),
+                    {'amount': value}
+                )
+
+        assert convert_money_storage(engine, db.metadata, 'minor_units') > 0
+        with engine.connect() as connection:
+            assert read_money_storage(connection) == 'minor_units'
+            stored = connection.execute(text('SELECT amount, typeof(amount) FROM transactions ORDER BY id')).all()
+            total = connection.execute(text('SELECT SUM(amount) FROM transactions')).scalar()
+        assert [row[0] for row in stored] == [100000015, -25050, 7, 1212500]
+        assert all(row[1] == 'integer' for row in stored)
+        assert total == sum(row[0] for row in stored)
+
+        # Converting again is a no-op
+        assert convert_money_storage(engine, db.metadata, 'minor_units') == 0
+
+        convert_money_storage(engine, db.metadata, 'numeric')
+        with engine.connect() as connection:
+            assert read_money_storage(connection) == 'numeric'
+            restored = connection.execute(text('SELECT amount FROM transactions ORDER BY id')).scalars().all()
+        assert restored == [1000000.15, -250.5, 0.07, 12125.0]
+        engine.dispose()
+    print("✓ Money storage migration test passed")
+
+if __name__ == "__main__":
+    print("Running money storage tests...")
+    test_piaster_conversion()
+    test_convert_existing_database()
+    print("\n🎉 All money storage tests passed!")
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the posting queue: postings from many threads are
+committed in batches by one writer, a failing posting only loses its own
+savepoint, a timed-out posting is either cancelled unwritten or reported
+as pending, without the queue submit_posting() commits in place, and the
+sale and treasury write endpoints all post through the writer
+"""
+
+import sys
+import os
+import contextlib
+import io
+import tempfile
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from decimal import Decimal
+from flask import Flask
+from src.models.database import db, init_db, login_manager
+from src.models import user, sale  # noqa: F401 (configure relationships)
+from src.models.transaction import Transaction
+from src.models.treasury import Treasury
+from src.utils.posting_queue import (
+    PostingPending, PostingTimeout, init_posting_queue, posting_status, submit_posting
+)
+from src.utils.reconciliation import reconcile_treasury
+
+def post_income(amount):
+    db.session.add(Transaction(type='Sale', amount=amount, description='test'))
+    Treasury.increment(amount)
+    if amount == Decimal('13'):
+        raise ValueError('rejected posting')
+    return str(amount)
+
+def make_app(db_path, posting_queue, **config):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    app.config['POSTING_QUEUE'] = posting_queue
+    app.config.update(config)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        Treasury.get_current()
+    init_posting_queue(app)
+    return app
+
+def test_queue_group_commits():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'queue.db'), True)
+        results, errors = [], []
+
+        def writer(amounts):
+            with app.app_context():
+                for amount in amounts:
+                    try:
+                        results.append(submit_posting(post_income, Decimal(amount)))
+                    except ValueError as e:
+                        errors.append(str(e))
+
+        threads = [threading.Thread(target=writer, args=(range(start, 41, 4),)) for start in range(1, 5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        posting_queue = app.extensions['posting_queue']
+        posting_queue.close()
+        assert errors == ['rejected posting']
+        assert sorted(results, key=Decimal) == [str(amount) for amount in range(1, 41) if amount != 13]
+        assert posting_queue.stats()['postings'] == 39
+        with app.app_context():
+            assert Treasury.get_current().current_balance == Decimal(sum(range(1, 41)) - 13)
+            assert Transaction.query.count() == 39
+            db.engine.dispose()
+    print("✓ Posting queue group commit test passed")
+
+def test_timeouts_never_duplicate():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'timeout.db'), True, POSTING_QUEUE_TIMEOUT=0.2)
+        release = threading.Event()
+
+        def slow_income(amount):
+            release.wait(10)
+            return post_income(amount)
+
+        with app.app_context():
+            # The writer already runs it: reported as pending, not as an error
+            try:
+                submit_posting(slow_income, Decimal('5'))
+            except PostingPending as e:
+                posting_id = e.posting_id
+            else:
+                raise AssertionError('Expected PostingPending')
+            assert posting_status(posting_id)['status'] == 'pending'
+
+            # Still queued behind it: cancelled, so a retry cannot duplicate it
+            try:
+                submit_posting(post_income, Decimal('7'))
+            except PostingTimeout:
+                pass
+            else:
+                raise AssertionError('Expected PostingTimeout')
+
+            release.set()
+            app.extensions['posting_queue'].close()
+            assert posting_status(posting_id) == {'posting_id': posting_id, 'status': 'committed', 'result': '5'}
+            assert posting_status('unknown') is None
+            assert Transaction.query.count() == 1
+            assert Treasury.get_current().current_balance == Decimal('5')
+            db.engine.dispose()
+    print("✓ Posting timeout test passed")
+
+def test_inline_without_queue():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'inline.db'), False)
+        assert 'posting_queue' not in app.extensions
+        with app.app_context():
+            assert submit_posting(post_income, Decimal('7.50')) == '7.50'
+            db.session.rollback()  # already committed
+            assert Treasury.get_current().current_balance == Decimal('7.50')
+            db.engine.dispose()
+    print("✓ Inline posting test passed")
+
+def test_routes_post_through_queue():
+    from src.routes.sales import sales_bp
+    from src.routes.treasury import treasury_bp
+    from src.utils.init_data import initialize_all_data
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SECRET_KEY'] = 'posting-routes'
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'routes.db')}"
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        app.config['POSTING_QUEUE'] = True
+        init_db(app)
+        app.register_blueprint(sales_bp, url_prefix='/sales')
+        app.register_blueprint(treasury_bp, url_prefix='/treasury')
+
+        @login_manager.user_loader
+        def load_user(user_id):
+            return db.session.get(user.User, int(user_id))
+
+        with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+            initialize_all_data()
+            admin_id = user.User.query.filter_by(username='admin').first().id
+        posting_queue = init_posting_queue(app)
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(admin_id)
+            session['_fresh'] = True
+
+        def call(method, url, status, **body):
+            response = client.open(url, method=method, json=body)
+            assert response.status_code == status, (url, response.get_json())
+            return response.get_json()
+
+        sale_id = call('POST', '/sales/api/sales', 201, client_name='Client', unit_code='PQ-1',
+                       property_type='شقة', unit_price=1000000, sale_date='2024-03-01',
+                       company_commission_rate=0.025)['sale']['id']
+        assert call('PUT', f'/sales/api/sales/{sale_id}', 200, company_commission_rate=0.02)['sale'] \
+            ['company_commission_rate'] == 0.02
+        balances = call('POST', '/treasury/api/balance', 200, balance=5000)
+        assert balances['balance'] == 5000.0
+        with app.app_context():
+            adjustment_id = Transaction.query.filter_by(type='تعديل رصيد').one().id
+        assert call('PUT', f'/treasury/api/transactions/{adjustment_id}', 200, amount=100)['transaction'] \
+            ['amount'] == 100.0
+        call('DELETE', f'/sales/api/sales/{sale_id}', 200)
+
+        posting_queue.close()
+        assert posting_queue.stats()['postings'] == 5
+        with app.app_context():
+            assert Treasury.get_current().current_balance == Decimal('100')
+            run = reconcile_treasury(full=True)
+            assert run.status == 'balanced', run.to_dict()
+            db.engine.dispose()
+    print("✓ Routes post through the queue test passed")
+
+if __name__ == "__main__":
+    print("Running posting queue tests...")
+    test_queue_group_commits()
+    test_timeouts_never_duplicate()
+    test_inline_without_queue()
+    test_routes_post_through_queue()
+    print("\n🎉 All posting queue tests passed!")
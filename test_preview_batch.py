@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the batch preview endpoint: every unit's breakdown
+equals /api/calculate-preview exactly (both round to piasters), the deal
+totals are the sums of those amounts, large batches are streamed, and bad
+payloads are rejected before anything is calculated
+"""
+
+import sys
+import os
+import contextlib
+import io
+import json
+import random
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from flask import Flask
+from src.models.database import db, init_db, login_manager
+from src.models.user import User
+from src.routes import sales_new
+
+DEFAULTS = {'company_commission_rate': '0.025', 'vat_rate': '0.14', 'salesperson_commission_rate': 0.005}
+
+def build_app(db_path):
+    from src.routes.sales import sales_bp
+    from src.utils.init_data import initialize_all_data
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'preview-batch'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_db(app)
+    app.register_blueprint(sales_bp, url_prefix='/sales')
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return db.session.get(User, int(user_id))
+
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        initialize_all_data()
+    return app
+
+def login(app):
+    client = app.test_client()
+    with app.app_context():
+        admin_id = User.query.filter_by(username='admin').first().id
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+        session['_fresh'] = True
+    return client
+
+def floor_units(count, seed=7):
+    """Units of one floor: most take the shared rates, some override them"""
+    rng = random.Random(seed)
+    units = []
+    for i in range(count):
+        unit = {'unit_code': f'B-{i}', 'unit_price': rng.choice([
+            rng.randint(500000, 9000000), f'{rng.uniform(500000, 9000000):,.2f}', '١٢٣٤٥٦٧.٨٩'])}
+        if i % 5 == 0:
+            unit['company_commission_rate'] = rng.choice(['0.02', '0.0275', 0.03])
+        if i % 7 == 0:
+            unit['salesperson_tax_rate'] = '0.225'
+            unit['salesperson_incentive_rate'] = 0.001
+        units.append(unit)
+    return units
+
+def check_against_single_previews(client, units, payload):
+    assert payload['count'] == len(units) == len(payload['results'])
+    totals = {}
+    for index, (unit, row) in enumerate(zip(units, payload['results'])):
+        assert (row['index'], row['unit_code']) == (index, unit['unit_code'])
+        single = client.post('/sales/api/calculate-preview', json={**DEFAULTS, **unit})
+        assert single.status_code == 200, single.get_json()
+        for key, value in single.get_json().items():
+            # Both endpoints return amounts rounded to piasters
+            assert row[key] == value, (index, key, row[key], value)
+            assert round(value * 100) / 100 == value, (key, value)
+            totals[key] = totals.get(key, 0) + round(value * 100)
+    for key, value in totals.items():
+        assert payload['totals'][key] == value / 100, key
+    assert round(payload['totals']['unit_price'] * 100) == \
+        sum(round(row['unit_price'] * 100) for row in payload['results'])
+
+def test_batch_matches_single_previews():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'preview.db'))
+        client = login(app)
+
+        units = floor_units(12)
+        response = client.post('/sales/api/calculate-preview/batch', json={'units': units, 'defaults': DEFAULTS})
+        assert response.status_code == 200 and response.is_json
+        check_against_single_previews(client, units, response.get_json())
+
+        # Without defaults, a bare list of complete units is accepted too
+        complete = [{**DEFAULTS, **unit} for unit in units[:3]]
+        response = client.post('/sales/api/calculate-preview/batch', json=complete)
+        assert response.get_json()['count'] == 3
+
+        with app.app_context():
+            db.engine.dispose()
+    print("✓ Batch preview matches single previews")
+
+def test_large_batch_is_streamed():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'stream.db'))
+        client = login(app)
+
+        units = floor_units(sales_new.PREVIEW_BATCH_STREAM_THRESHOLD + 2 * sales_new.PREVIEW_BATCH_CHUNK_SIZE // 3)
+        response = client.post('/sales/api/calculate-preview/batch', json={'units': units, 'defaults': DEFAULTS})
+        assert response.status_code == 200 and response.is_streamed
+        check_against_single_previews(client, units, json.loads(response.get_data(as_text=True)))
+
+        with app.app_context():
+            db.engine.dispose()
+    print("✓ Large batch preview is streamed")
+
+def test_invalid_batches_are_rejected():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'invalid.db'))
+        client = login(app)
+
+        def rejected(body):
+            response = client.post('/sales/api/calculate-preview/batch', json=body)
+            assert response.status_code == 400, (body, response.status_code)
+            return response.get_json()
+
+        rejected({'units': []})
+        rejected({'defaults': DEFAULTS})
+        rejected('units')
+        assert rejected({'units': [{'unit_price': 1000}, 'B-2'], 'defaults': DEFAULTS})['index'] == 1
+        # Missing company rate (no defaults), then a missing price
+        assert rejected([{'unit_price': 1000}])['index'] == 0
+        assert rejected({'units': [{'unit_price': 1000}, {'unit_code': 'B-2'}], 'defaults': DEFAULTS})['index'] == 1
+
+        max_units = sales_new.PREVIEW_BATCH_MAX_UNITS
+        sales_new.PREVIEW_BATCH_MAX_UNITS = 3
+        try:
+            rejected({'units': floor_units(4), 'defaults': DEFAULTS})
+        finally:
+            sales_new.PREVIEW_BATCH_MAX_UNITS = max_units
+
+        with app.app_context():
+            db.engine.dispose()
+    print("✓ Invalid batch previews are rejected")
+
+if __name__ == "__main__":
+    print("Running batch preview tests...")
+    test_batch_matches_single_previews()
+    test_large_batch_is_streamed()
+    test_invalid_batches_are_rejected()
+    print("\n🎉 All batch preview tests passed!")
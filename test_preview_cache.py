@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the calculate-preview cache: repeated inputs are
+served from the cache, differently formatted numbers share one entry, the
+least recently used entry is evicted at the size bound, and the stats
+endpoint reports the counters
+"""
+
+import sys
+import os
+import contextlib
+import io
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from flask import Flask
+from src.models.database import db, init_db, login_manager
+from src.models.user import User
+from src.routes import sales_new
+from src.utils.cache import LRUCache
+
+def build_app(db_path):
+    from src.routes.sales import sales_bp
+    from src.utils.init_data import initialize_all_data
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'preview-cache'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_db(app)
+    app.register_blueprint(sales_bp, url_prefix='/sales')
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return db.session.get(User, int(user_id))
+
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        initialize_all_data()
+    return app
+
+def test_preview_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'cache.db'))
+        client = app.test_client()
+        with app.app_context():
+            admin_id = User.query.filter_by(username='admin').first().id
+        with client.session_transaction() as session:
+            session['_user_id'] = str(admin_id)
+            session['_fresh'] = True
+
+        def preview(**fields):
+            response = client.post('/sales/api/calculate-preview', json=fields)
+            assert response.status_code == 200, response.get_json()
+            return response.get_json()
+
+        def stats():
+            response = client.get('/sales/api/calculate-preview/cache-stats')
+            assert response.status_code == 200
+            return response.get_json()
+
+        # A small cache of our own, so the size bound is reached quickly
+        shared_cache = sales_new.preview_cache
+        sales_new.preview_cache = LRUCache(maxsize=3)
+        try:
+            assert stats() == {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 3, 'hit_rate': 0.0}
+
+            first = preview(unit_price=1000000, company_commission_rate=0.025)
+            assert preview(unit_price=1000000, company_commission_rate=0.025) == first
+            assert (stats()['hits'], stats()['misses'], stats()['size']) == (1, 1, 1)
+
+            # Same Decimal values written differently: one entry, served as a hit
+            assert preview(unit_price='1,000,000.00', company_commission_rate='0.0250',
+                           vat_rate='0.140', sales_tax_rate='', annual_tax_rate=0.225) == first
+            assert preview(unit_price='١٠٠٠٠٠٠', company_commission_rate='0.025') == first
+            assert (stats()['hits'], stats()['misses'], stats()['size']) == (3, 1, 1)
+
+            # A rate that differs from the default is a separate entry
+            assert preview(unit_price=1000000, company_commission_rate=0.025, vat_rate=0.15) != first
+
+            # Fill the cache, touching the first entry so the vat_rate one is the oldest
+            preview(unit_price=2000000, company_commission_rate=0.025)
+            preview(unit_price=1000000, company_commission_rate=0.025)
+            preview(unit_price=3000000, company_commission_rate=0.025)
+            assert stats()['size'] == 3
+            before = stats()
+            preview(unit_price=1000000, company_commission_rate=0.025)
+            preview(unit_price=1000000, company_commission_rate=0.025, vat_rate=0.15)
+            after = stats()
+            assert (after['hits'] - before['hits'], after['misses'] - before['misses']) == (1, 1)
+            assert after['size'] == 3
+
+            # Rejected requests never reach the cache
+            response = client.post('/sales/api/calculate-preview', json={'unit_price': 1000})
+            assert response.status_code == 400
+            final = stats()
+            assert (final['hits'], final['misses']) == (after['hits'], after['misses'])
+            assert final['hit_rate'] == round(final['hits'] / (final['hits'] + final['misses']), 4)
+        finally:
+            sales_new.preview_cache = shared_cache
+
+        with app.app_context():
+            db.engine.dispose()
+    print("✓ Preview cache test passed")
+
+if __name__ == "__main__":
+    print("Running preview cache tests...")
+    test_preview_cache()
+    print("\n🎉 All preview cache tests passed!")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Query-plan guard for the hot API paths.
+
+Seeds a temporary SQLite database, calls every list, stats, dashboard and
+report endpoint with typical filters, captures each SELECT they issue and
+runs EXPLAIN QUERY PLAN on it. Fails if a query touching the sales or
+transactions table reads it with a plain full table scan instead of an index.
+"""
+
+import sys
+import os
+import contextlib
+import io
+import re
+import tempfile
+from datetime import date, datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from flask import Flask
+from sqlalchemy import event, insert
+from src.models.database import db, init_db, login_manager
+from src.models.user import User
+from src.models.sale import Sale
+from src.models.transaction import Transaction
+from src.models.recalculation_job import RecalculationJob
+
+HOT_TABLES = ('sales', 'transactions')
+
+def _month(offset):
+    return (date.today().replace(day=1) - timedelta(days=30 * offset)).strftime('%Y-%m-%d')
+
+# (description, method, url, json body)
+HOT_REQUESTS = [
+    ('sales list', 'GET', '/sales/api/sales', None),
+    ('sales list, deep page', 'GET', '/sales/api/sales?page=4&per_page=10', None),
+    ('sales list, type filter', 'GET', '/sales/api/sales?property_type=شقة', None),
+    ('sales list, date range', 'GET', f'/sales/api/sales?date_from={_month(6)}&date_to={_month(1)}', None),
+    ('sales list, search', 'GET', '/sales/api/sales?search=محمد', None),
+    ('sales list, first cursor page', 'GET', '/sales/api/sales?cursor=&per_page=10', None),
+    ('sales list, type + cursor', 'GET', '/sales/api/sales?cursor=&property_type=شقة&per_page=10', None),
+    ('sales stats', 'GET', '/sales/api/sales-stats', None),
+    ('sales export, type filter', 'GET', '/sales/api/sales/export?property_type=شقة', None),
+    ('sales facets', 'GET', '/sales/api/sales/facets', None),
+    ('sales facets, filtered', 'GET', f'/sales/api/sales/facets?property_type=شقة&month={_month(2)[:7]}', None),
+    ('transactions list', 'GET', '/treasury/api/transactions', None),
+    ('transactions list, type filter', 'GET', '/treasury/api/transactions?type=Sale', None),
+    ('transactions list, date range', 'GET',
+     f'/treasury/api/transactions?date_from={_month(3)}&date_to={_month(1)}', None),
+    ('transactions list, search', 'GET', '/treasury/api/transactions?search=بيع عقار', None),
+    ('transactions list, type + cursor', 'GET', '/treasury/api/transactions?cursor=&type=Expense&per_page=10', None),
+    ('transactions export, date range', 'GET',
+     f'/treasury/api/transactions/export?format=xlsx&date_from={_month(3)}', None),
+    ('treasury stats', 'GET', '/treasury/api/treasury-stats', None),
+    ('balance history', 'GET', '/treasury/api/balance-history?days=30', None),
+    ('daily balances', 'GET', '/treasury/api/daily-balances?days=365', None),
+    ('dashboard stats', 'GET', '/dashboard/api/dashboard-stats', None),
+    ('sales summary report', 'GET', f'/reports/api/sales-summary?date_from={_month(6)}', None),
+    ('transactions summary report', 'GET', '/reports/api/transactions-summary', None),
+    ('transactions summary report, dates', 'GET',
+     f'/reports/api/transactions-summary?date_from={_month(6)}&date_to={_month(1)}', None),
+]
+
+_FULL_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+def build_app(db_path):
+    from src.routes.sales import sales_bp
+    from src.routes.treasury import treasury_bp
+    from src.routes.reports import reports_bp
+    from src.routes.dashboard import dashboard_bp
+    from src.utils.init_data import initialize_all_data
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'query-plans'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_db(app)
+    app.register_blueprint(sales_bp, url_prefix='/sales')
+    app.register_blueprint(treasury_bp, url_prefix='/treasury')
+    app.register_blueprint(reports_bp, url_prefix='/reports')
+    app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return db.session.get(User, int(user_id))
+
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        initialize_all_data()
+        seed(300)
+    return app
+
+def seed(count):
+    """A few months of sales and transactions (no ANALYZE, like a live database)"""
+    now = datetime.now()
+    sales, transactions = [], []
+    types = ['شقة', 'تجاري', 'اداري', 'طبي']
+    for i in range(count):
+        created = now - timedelta(hours=7 * i)
+        sales.append({
+            'client_name': f'محمد {i}', 'sale_date': created.date(), 'unit_code': f'QP-{i}',
+            'unit_price': 1000000 + i, 'property_type': types[i % 4], 'company_commission_rate': 0.025,
+            'company_commission_amount': 25000, 'net_company_income': 15000, 'created_at': created,
+            'search_text': f'محمد {i}\nqp-{i}',
+        })
+        transactions.append({
+            'type': 'Sale' if i % 3 else 'Expense', 'amount': 15000 if i % 3 else -500,
+            'description': f'بيع عقار {i}', 'transaction_date': created, 'search_text': f'بيع عقار {i}\nsale',
+        })
+    db.session.execute(insert(Sale), sales)
+    db.session.execute(insert(Transaction), transactions)
+    Transaction.rebuild_ledger()  # bulk rows skip the ledger events
+    db.session.commit()
+
+def full_scans(connection, statement, parameters):
+    """Hot tables a statement reads with a plain table scan"""
+    plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    scanned = []
+    for row in plan:
+        match = _FULL_SCAN.match(row[3])
+        if match and match.group(1) in HOT_TABLES:
+            scanned.append(row[3])
+    return scanned
+
+def capture_hot_queries(app):
+    """Run every hot request (and a recalculation job) and collect their SELECTs"""
+    captured = []
+
+    def remember(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and any(
+                re.search(rf'\b{table}\b', statement) for table in HOT_TABLES):
+            captured.append((current[0], statement, parameters))
+
+    current = [None]
+    client = app.test_client()
+    with app.app_context():
+        admin_id = User.query.filter_by(username='admin').first().id
+        engine = db.engine
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+        session['_fresh'] = True
+
+    event.listen(engine, 'before_cursor_execute', remember)
+    try:
+        for name, method, url, body in HOT_REQUESTS:
+            current[0] = name
+            response = client.open(url, method=method, json=body)
+            assert response.status_code == 200, (name, response.status_code, response.get_data(as_text=True)[:300])
+            payload = response.get_json()
+            next_cursor = payload.get('next_cursor') if isinstance(payload, dict) else None
+            if next_cursor and 'cursor=' in url:
+                current[0] = f'{name} (next page)'
+                response = client.open(f'{url.replace("cursor=", "cursor=" + next_cursor)}', method=method)
+                assert response.status_code == 200, name
+
+        from src.utils.recalculation import run_recalculation_job
+        with app.app_context():
+            current[0] = 'recalculation job'
+            job = RecalculationJob(property_type='شقة', chunk_size=50)
+            db.session.add(job)
+            db.session.commit()
+            run_recalculation_job(job.id)
+            assert db.session.get(RecalculationJob, job.id).status == 'completed'
+    finally:
+        event.remove(engine, 'before_cursor_execute', remember)
+    return captured
+
+def test_hot_queries_use_indexes():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'plans.db'))
+        captured = capture_hot_queries(app)
+        assert captured, 'no queries captured'
+
+        failures = []
+        with app.app_context():
+            with db.engine.connect() as connection:
+                for name, statement, parameters in captured:
+                    scans = full_scans(connection, statement, parameters)
+                    if scans:
+                        failures.append(f'{name}: {", ".join(scans)}\n    {" ".join(statement.split())[:300]}')
+            db.session.remove()
+            db.engine.dispose()
+
+        assert not failures, 'Full table scans on hot paths:\n' + '\n'.join(failures)
+        print(f"✓ {len(captured)} hot queries checked, none scans sales/transactions")
+
+if __name__ == "__main__":
+    print("Running query plan guard...")
+    test_hot_queries_use_indexes()
+    print("\n🎉 Query plan guard passed!")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the rate scenario report: per month and property type
+baseline/scenario amounts match Sale.calculate_sale_amounts, the sales are
+streamed in chunks, and the endpoint never writes to the database
+"""
+
+import sys
+import os
+import contextlib
+import io
+import tempfile
+from datetime import date
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from decimal import Decimal, ROUND_HALF_UP
+from flask import Flask
+from sqlalchemy import event, func, select
+from src.models.database import db, init_db, login_manager
+from src.models.user import User
+from src.models.sale import Sale
+from src.models.table_version import TableVersion
+from src.models.transaction import Transaction
+from src.routes import reports
+
+OVERRIDES = {'company_commission_rate': 0.03, 'vat_rate': 0.15}
+
+# (sale_date, property_type, unit_price, company rate, salesperson rate, salesperson tax rate)
+SALES = [
+    (date(2024, 1, 5), 'شقة', Decimal('1000000'), Decimal('0.025'), Decimal('0.005'), Decimal('0')),
+    (date(2024, 1, 20), 'شقة', Decimal('2345678.91'), Decimal('0.02'), Decimal('0.01'), Decimal('0.05')),
+    (date(2024, 1, 21), 'تجاري', Decimal('750000.50'), Decimal('0.015'), Decimal('0'), Decimal('0')),
+    (date(2024, 2, 2), 'شقة', Decimal('1800000'), Decimal('0.0275'), Decimal('0.0075'), Decimal('0.225')),
+    (date(2024, 2, 14), 'تجاري', Decimal('999999.99'), Decimal('0.01'), Decimal('0.002'), Decimal('0')),
+]
+METRICS = reports.SCENARIO_METRICS
+
+def build_app(db_path):
+    from src.routes.reports import reports_bp
+    from src.utils.init_data import initialize_all_data
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'rate-scenario'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_db(app)
+    app.register_blueprint(reports_bp, url_prefix='/reports')
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return db.session.get(User, int(user_id))
+
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        initialize_all_data()
+        for i, (sale_date, property_type, price, company, salesperson, salesperson_tax) in enumerate(SALES):
+            db.session.add(Sale(client_name=f'Client {i}', sale_date=sale_date, unit_code=f'RS-{i}',
+                                unit_price=price, property_type=property_type,
+                                company_commission_rate=company, salesperson_commission_rate=salesperson,
+                                salesperson_tax_rate=salesperson_tax, vat_rate=Decimal('0.14'),
+                                sales_tax_rate=Decimal('0.05'), annual_tax_rate=Decimal('0.225'),
+                                company_commission_amount=0, net_company_income=0))
+        db.session.commit()
+    return app
+
+def piasters(value):
+    return int((value * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def expected_groups():
+    """{(month, type): {metric: (baseline, scenario) piasters}} from the scalar engine"""
+    groups = {}
+    for sale_date, property_type, price, company, salesperson, salesperson_tax in SALES:
+        rates = dict(company_commission_rate=company, salesperson_commission_rate=salesperson,
+                     vat_rate=Decimal('0.14'), sales_tax_rate=Decimal('0.05'),
+                     annual_tax_rate=Decimal('0.225'), salesperson_tax_rate=salesperson_tax)
+        baseline = Sale.calculate_sale_amounts(price, **rates)
+        scenario = Sale.calculate_sale_amounts(price, **{**rates, **OVERRIDES})
+        group = groups.setdefault((sale_date.strftime('%Y-%m'), property_type), {m: [0, 0] for m in METRICS})
+        for metric in METRICS:
+            group[metric][0] += piasters(baseline[metric])
+            group[metric][1] += piasters(scenario[metric])
+    return groups
+
+def database_state():
+    """Row counts, table versions and stored amounts: must not move"""
+    return (
+        db.session.execute(select(func.count()).select_from(Sale)).scalar(),
+        db.session.execute(select(func.count()).select_from(Transaction)).scalar(),
+        sorted(db.session.execute(select(TableVersion.table_name, TableVersion.version)).all()),
+        db.session.execute(select(Sale.id, Sale.net_company_income, Sale.company_commission_rate)
+                           .order_by(Sale.id)).all(),
+    )
+
+def test_rate_scenario():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'scenario.db'))
+        client = app.test_client()
+        with app.app_context():
+            admin_id = User.query.filter_by(username='admin').first().id
+            before = database_state()
+            engine = db.engine
+        with client.session_transaction() as session:
+            session['_user_id'] = str(admin_id)
+            session['_fresh'] = True
+
+        writes, seen = [], []
+
+        def remember(conn, cursor, statement, *args):
+            seen.append(statement)
+            if not statement.lstrip().upper().startswith(('SELECT', 'PRAGMA')):
+                writes.append(statement)
+
+        chunk_size = reports.SCENARIO_CHUNK_SIZE
+        reports.SCENARIO_CHUNK_SIZE = 2  # several partitions for five sales
+        event.listen(engine, 'before_cursor_execute', remember)
+        try:
+            response = client.post('/reports/api/rate-scenario', json={'overrides': OVERRIDES})
+        finally:
+            event.remove(engine, 'before_cursor_execute', remember)
+            reports.SCENARIO_CHUNK_SIZE = chunk_size
+        assert response.status_code == 200, response.get_json()
+        assert seen and writes == [], writes
+        payload = response.get_json()
+
+        expected = expected_groups()
+        assert [(g['month'], g['property_type']) for g in payload['groups']] == sorted(expected)
+        for group in payload['groups']:
+            amounts = expected[(group['month'], group['property_type'])]
+            for metric in METRICS:
+                baseline, scenario = amounts[metric]
+                assert round(group[metric]['baseline'] * 100) == baseline, (group['month'], metric)
+                assert round(group[metric]['scenario'] * 100) == scenario, (group['month'], metric)
+                assert round(group[metric]['delta'] * 100) == scenario - baseline, (group['month'], metric)
+        assert payload['totals']['count'] == len(SALES)
+        for metric in METRICS:
+            assert round(payload['totals'][metric]['delta'] * 100) == \
+                sum(scenario - baseline for baseline, scenario in (g[metric] for g in expected.values()))
+
+        # Filters narrow the priced sales
+        response = client.post('/reports/api/rate-scenario', json={
+            'overrides': OVERRIDES, 'property_type': 'تجاري', 'date_from': '2024-02-01'
+        })
+        [group] = response.get_json()['groups']
+        assert (group['month'], group['property_type'], group['count']) == ('2024-02', 'تجاري', 1)
+
+        for body in ({}, {'overrides': {'unit_price': 1}}, {'overrides': OVERRIDES, 'date_from': '2024/01/01'}):
+            assert client.post('/reports/api/rate-scenario', json=body).status_code == 400, body
+
+        with app.app_context():
+            assert database_state() == before
+            db.engine.dispose()
+    print("✓ Rate scenario test passed")
+
+if __name__ == "__main__":
+    print("Running rate scenario tests...")
+    test_rate_scenario()
+    print("\n🎉 All rate scenario tests passed!")
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Test script to verify property type recalculation jobs: sales are re-rated
+chunk by chunk together with their linked income transactions, so a later
+edit or delete still reconciles, a second job for the same type is refused while one
+is active, orphaned jobs are failed, and a failed or cancelled job resumes
+from its last committed chunk
+"""
+
+import sys
+import os
+import contextlib
+import io
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from decimal import Decimal, ROUND_HALF_UP
+from flask import Flask
+from src.models.database import db, init_db, login_manager
+from src.models.user import User
+from src.models.sale import Sale, PropertyTypeRates
+from src.models.transaction import Transaction
+from src.models.treasury import Treasury
+from src.models.recalculation_job import RecalculationJob
+from src.utils import recalculation
+from src.utils.reconciliation import reconcile_treasury
+from src.utils.recalculation import (
+    cancel_recalculation_job, fail_orphaned_jobs, resume_recalculation_job, run_recalculation_job
+)
+
+PROPERTY_TYPE = 'شقة'
+
+def build_app(db_path):
+    from src.routes.sales import sales_bp
+    from src.utils.init_data import initialize_all_data
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'recalculation'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_db(app)
+    app.register_blueprint(sales_bp, url_prefix='/sales')
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return db.session.get(User, int(user_id))
+
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        initialize_all_data()
+        # The seeded profiles have no commission yet
+        rates = PropertyTypeRates.query.filter_by(property_type=PROPERTY_TYPE).first()
+        rates.company_commission_rate = Decimal('0.025')
+        rates.salesperson_commission_rate = Decimal('0.005')
+        PropertyTypeRates.invalidate_rate_profiles()
+        db.session.commit()
+    return app
+
+def add_sales(count):
+    """Sales with stale amounts and their linked income transactions; some
+    start with a non-positive net income, the last one has no transaction
+    """
+    for i in range(count):
+        sale = Sale(
+            client_name=f'Client {i}', sale_date=date(2024, 1, 1), unit_code=f'RJ-{i}',
+            unit_price=Decimal(100000000 + 1234567 * i) / 100, property_type=PROPERTY_TYPE,
+            company_commission_rate=Decimal('0.01'), salesperson_tax_rate=Decimal('0.05') if i % 2 else 0,
+            company_commission_amount=0, net_company_income=Decimal(-500 if i % 3 == 0 else 1000 * i)
+        )
+        db.session.add(sale)
+        db.session.flush()
+        if i < count - 1:
+            sale.post_income()
+    db.session.commit()
+
+def expected_treasury_delta(profile):
+    """Sum of each sale's change in posted income under the profile, from the scalar engine"""
+    delta = Decimal('0')
+    for sale in Sale.query.filter_by(property_type=PROPERTY_TYPE):
+        new_net = Sale.calculate_sale_amounts(
+            sale.unit_price, profile.company_commission_rate, profile.salesperson_commission_rate,
+            profile.salesperson_incentive_rate, profile.vat_rate, profile.sales_tax_rate,
+            profile.annual_tax_rate, sale.salesperson_tax_rate, sale.sales_manager_tax_rate
+        )['net_company_income'].quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        posted = Decimal(str(sale.transaction.amount)) if sale.transaction_id else Decimal('0')
+        delta += max(new_net, Decimal('0')) - posted
+    return delta
+
+def assert_income_posted():
+    """Every sale's linked transaction carries its positive net income, and the treasury reconciles"""
+    for sale in Sale.query.filter_by(property_type=PROPERTY_TYPE):
+        posted = Decimal(str(sale.transaction.amount)) if sale.transaction_id else Decimal('0')
+        assert posted == max(Decimal(str(sale.net_company_income)), Decimal('0')), sale.unit_code
+    run = reconcile_treasury(full=True)
+    assert run.status == 'balanced', run.to_dict()
+
+def new_job(chunk_size=3, property_type=PROPERTY_TYPE, **values):
+    job = RecalculationJob(property_type=property_type, chunk_size=chunk_size, **values)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+def login(app):
+    client = app.test_client()
+    with app.app_context():
+        admin_id = User.query.filter_by(username='admin').first().id
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+        session['_fresh'] = True
+    return client
+
+def wait_for(app, job_id):
+    with app.app_context():
+        for _ in range(200):
+            job = db.session.get(RecalculationJob, job_id)
+            if job.status not in RecalculationJob.ACTIVE_STATUSES:
+                return job.to_dict()
+            db.session.expire_all()
+            time.sleep(0.05)
+    raise AssertionError(f'Job {job_id} did not finish')
+
+def test_chunked_recalculation():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'chunks.db'))
+        with app.app_context():
+            add_sales(7)
+            profile = PropertyTypeRates.get_rates_for_property_type(PROPERTY_TYPE)
+            expected = expected_treasury_delta(profile)
+            balance = Treasury.get_current().current_balance
+
+            job_id = new_job(chunk_size=3)
+            run_recalculation_job(job_id)
+            job = db.session.get(RecalculationJob, job_id)
+            assert (job.status, job.total_sales, job.processed_sales, job.batches_committed) == \
+                ('completed', 7, 7, 3), job.to_dict()
+            assert job.last_sale_id == db.session.query(db.func.max(Sale.id)).scalar()
+
+            # The linked transactions moved with the sales; no separate adjustment rows
+            assert Decimal(str(job.net_adjustment)) == expected
+            assert Treasury.get_current().current_balance == balance + expected
+            assert Transaction.query.filter(Transaction.related_entity_type != 'sale').count() == 0
+            assert all(sale.company_commission_rate == profile.company_commission_rate
+                       for sale in Sale.query.filter_by(property_type=PROPERTY_TYPE))
+            assert_income_posted()
+
+            # A missing property type fails the job without touching anything
+            job_id = new_job(property_type='غير موجود')
+            run_recalculation_job(job_id)
+            job = db.session.get(RecalculationJob, job_id)
+            assert job.status == 'failed' and 'غير موجود' in job.error and job.finished_at
+            assert job.processed_sales == 0
+            db.engine.dispose()
+    print("✓ Chunked recalculation test passed")
+
+def test_active_and_orphaned_jobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'active.db'))
+        client = login(app)
+        with app.app_context():
+            add_sales(4)
+            type_id = PropertyTypeRates.query.filter_by(property_type=PROPERTY_TYPE).first().id
+            running_id = new_job(status='running')
+
+        response = client.post(f'/sales/api/property-types/{type_id}/recalculate', json={})
+        assert response.status_code == 409 and response.get_json()['job']['id'] == running_id
+
+        # The worker stopped reporting: the job is failed and no longer blocks
+        with app.app_context():
+            job = db.session.get(RecalculationJob, running_id)
+            job.heartbeat_at = datetime.utcnow() - recalculation.ORPHANED_JOB_AFTER - timedelta(minutes=1)
+            db.session.commit()
+        response = client.post(f'/sales/api/property-types/{type_id}/recalculate', json={'mode': 'sql'})
+        assert response.status_code == 202, response.get_json()
+        job = wait_for(app, response.get_json()['job']['id'])
+        assert (job['status'], job['mode'], job['processed_sales']) == ('completed', 'sql', 4)
+        with app.app_context():
+            assert_income_posted()
+            orphan = db.session.get(RecalculationJob, running_id)
+            assert orphan.status == 'failed' and orphan.error
+
+            # Cancelled before its worker starts: nothing runs
+            job_id = new_job()
+            assert cancel_recalculation_job(job_id)
+            assert not cancel_recalculation_job(job_id)
+            run_recalculation_job(job_id)
+            job = db.session.get(RecalculationJob, job_id)
+            assert (job.status, job.processed_sales) == ('cancelled', 0)
+            assert fail_orphaned_jobs() == 0
+
+        response = client.post(f'/sales/api/recalculation-jobs/{running_id}/cancel')
+        assert response.status_code == 409
+        with app.app_context():
+            db.engine.dispose()
+    print("✓ Active and orphaned job test passed")
+
+def test_resume_after_failure():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'resume.db'))
+        client = login(app)
+        with app.app_context():
+            add_sales(7)
+            expected = expected_treasury_delta(PropertyTypeRates.get_rates_for_property_type(PROPERTY_TYPE))
+            balance = Treasury.get_current().current_balance
+            job_id = new_job(chunk_size=3)
+
+            # The worker dies while writing the second chunk
+            recalculate_chunk = recalculation.recalculate_chunk
+            calls = []
+
+            def crash_on_second_chunk(*args):
+                calls.append(args)
+                if len(calls) == 2:
+                    raise RuntimeError('worker lost')
+                return recalculate_chunk(*args)
+
+            recalculation.recalculate_chunk = crash_on_second_chunk
+            try:
+                run_recalculation_job(job_id)
+            finally:
+                recalculation.recalculate_chunk = recalculate_chunk
+            job = db.session.get(RecalculationJob, job_id)
+            assert (job.status, job.processed_sales, job.batches_committed) == ('failed', 3, 1)
+
+        response = client.post(f'/sales/api/recalculation-jobs/{job_id}/resume')
+        assert response.status_code == 202, response.get_json()
+        job = wait_for(app, job_id)
+        assert (job['status'], job['processed_sales'], job['batches_committed']) == ('completed', 7, 3)
+        assert job['error'] is None
+        with app.app_context():
+            # Every sale was re-rated exactly once
+            assert Decimal(str(db.session.get(RecalculationJob, job_id).net_adjustment)) == expected
+            assert Treasury.get_current().current_balance == balance + expected
+            assert_income_posted()
+            assert resume_recalculation_job(app, job_id) is None
+            db.engine.dispose()
+    print("✓ Resume after failure test passed")
+
+def test_edit_after_recalculation():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'edit.db'))
+        client = login(app)
+        for set_based, unit_code in ((False, 'RE-1'), (True, 'RE-2')):
+            response = client.post('/sales/api/sales', json={
+                'client_name': 'Client', 'unit_code': unit_code, 'property_type': PROPERTY_TYPE,
+                'unit_price': 1000000, 'sale_date': '2024-03-01', 'company_commission_rate': 0.01
+            })
+            assert response.status_code == 201, response.get_json()
+            sale_id = response.get_json()['sale']['id']
+
+            # Re-rated by the profile (2.5%), then edited back down
+            with app.app_context():
+                job_id = new_job(mode='sql' if set_based else 'chunked')
+                run_recalculation_job(job_id, set_based)
+                assert db.session.get(RecalculationJob, job_id).status == 'completed'
+                assert_income_posted()
+            response = client.put(f'/sales/api/sales/{sale_id}', json={'company_commission_rate': 0.015})
+            assert response.status_code == 200, response.get_json()
+            with app.app_context():
+                sale = db.session.get(Sale, sale_id)
+                assert sale.company_commission_rate == Decimal('0.015')
+                assert_income_posted()
+                total = db.session.query(db.func.sum(Transaction.amount)).scalar()
+                assert Treasury.get_current().current_balance == total
+
+        # Deleting takes back exactly what the linked transaction carried
+        response = client.delete(f'/sales/api/sales/{sale_id}')
+        assert response.status_code == 200, response.get_json()
+        with app.app_context():
+            assert db.session.get(Sale, sale_id) is None
+            assert_income_posted()
+            db.engine.dispose()
+    print("✓ Edit after recalculation test passed")
+
+if __name__ == "__main__":
+    print("Running recalculation job tests...")
+    test_chunked_recalculation()
+    test_active_and_orphaned_jobs()
+    test_resume_after_failure()
+    test_edit_after_recalculation()
+    print("\n🎉 All recalculation job tests passed!")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the treasury reconciliation: incremental runs only
+re-sum new and edited blocks, treasury drift is reported with the posting
+range it happened in, and a full run catches rows changed around the ORM
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from decimal import Decimal
+from flask import Flask
+from sqlalchemy import update
+from src.models.database import db
+from src.models import user, sale  # noqa: F401 (configure relationships)
+from src.models.reconciliation import CHECKPOINT_BLOCK_SIZE
+from src.models.transaction import Transaction
+from src.models.treasury import Treasury
+from src.utils.reconciliation import reconcile_treasury
+
+def post(count, amount=Decimal('10.25')):
+    for _ in range(count):
+        db.session.add(Transaction(type='Sale', amount=amount))
+        Treasury.increment(amount)
+    db.session.commit()
+
+def kinds(run):
+    return [discrepancy['kind'] for discrepancy in run.to_dict()['discrepancies']]
+
+def test_incremental_reconciliation():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        post(2 * CHECKPOINT_BLOCK_SIZE + 500)
+
+        run = reconcile_treasury()
+        assert run.status == 'balanced', run.to_dict()
+        assert (run.blocks_checked, run.entries_checked) == (3, 2 * CHECKPOINT_BLOCK_SIZE + 500)
+        assert run.ledger_total == run.treasury_balance == Decimal('10.25') * (2 * CHECKPOINT_BLOCK_SIZE + 500)
+
+        # Only the open block is summed again
+        post(10)
+        run = reconcile_treasury()
+        assert run.status == 'balanced' and (run.blocks_checked, run.entries_checked) == (1, 510)
+
+        # An edit (with its treasury adjustment) and a delete re-check their blocks
+        entry = db.session.get(Transaction, 5)
+        Treasury.increment(Decimal('100') - entry.amount)
+        entry.amount = Decimal('100')
+        db.session.commit()
+        entry = db.session.get(Transaction, CHECKPOINT_BLOCK_SIZE + 7)
+        Treasury.increment(-entry.amount)
+        db.session.delete(entry)
+        db.session.commit()
+        run = reconcile_treasury()
+        assert run.status == 'balanced', run.to_dict()
+        assert (run.blocks_checked, run.entries_checked) == (3, 2 * CHECKPOINT_BLOCK_SIZE + 509)
+
+        # Treasury moved without a transaction: reported for the entries posted since
+        previous_through = run.through_seq
+        post(3)
+        Treasury.increment(Decimal('5'))
+        db.session.commit()
+        run = reconcile_treasury()
+        [drift] = run.to_dict()['discrepancies']
+        assert run.status == 'discrepancy' and run.difference == Decimal('5')
+        assert (drift['kind'], drift['amount']) == ('treasury', 5.0)
+        assert (drift['from_seq'], drift['to_seq']) == (previous_through + 1, previous_through + 3)
+        # The known gap is not reported again, but the run is not balanced either
+        run = reconcile_treasury()
+        assert run.status == 'discrepancy' and kinds(run) == []
+
+        # Rows changed with SQL are only seen by a full run
+        Treasury.increment(Decimal('-5'))
+        db.session.commit()
+        db.session.execute(update(Transaction.__table__).where(Transaction.id == 12).values(amount=0))
+        db.session.commit()
+        assert 'checkpoint' not in kinds(reconcile_treasury())
+        run = reconcile_treasury(full=True)
+        assert run.status == 'discrepancy'
+        checkpoint = next(d for d in run.to_dict()['discrepancies'] if d['kind'] == 'checkpoint')
+        assert (checkpoint['from_seq'], checkpoint['to_seq']) == (1, CHECKPOINT_BLOCK_SIZE)
+        assert checkpoint['expected_total'] - checkpoint['found_total'] == 10.25
+        assert {'treasury', 'ledger', 'snapshots'} <= set(kinds(run))
+    print("✓ Incremental reconciliation test passed")
+
+if __name__ == "__main__":
+    print("Running reconciliation tests...")
+    test_incremental_reconciliation()
+    print("\n🎉 All reconciliation tests passed!")
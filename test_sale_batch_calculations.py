@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the batch calculation engine gives exactly the same
+piasters as Sale.calculate_sale_amounts for every row
+"""
+
+import sys
+import os
+import random
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from src.models.sale import Sale
+
+RATE_CHOICES = [0, 0.005, 0.01, 0.015, 0.02, 0.025, 0.03, 0.05, 0.1, 0.14, 0.15, 0.22, 0.225, 0.5]
+
+def to_piasters(value):
+    """Round a scalar-engine Decimal to piasters the way Numeric(15, 2) stores it"""
+    return int((value * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def random_rows(count, seed=42):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        price = rng.choice([
+            rng.randint(1000, 100000000),
+            round(rng.uniform(1000, 50000000), 2),
+            Decimal(rng.randint(100000, 5000000000)) / 100,
+            '%.2f' % rng.uniform(1000, 9000000),
+        ])
+        rows.append({
+            'unit_price': price,
+            'company_commission_rate': rng.choice(RATE_CHOICES[1:]),
+            'salesperson_commission_rate': rng.choice(RATE_CHOICES),
+            'salesperson_incentive_rate': rng.choice(RATE_CHOICES),
+            'vat_rate': rng.choice(RATE_CHOICES),
+            'sales_tax_rate': rng.choice(RATE_CHOICES),
+            'annual_tax_rate': rng.choice(RATE_CHOICES),
+            'salesperson_tax_rate': rng.choice(RATE_CHOICES + [Decimal('0.2250')]),
+            'sales_manager_tax_rate': rng.choice(RATE_CHOICES),
+        })
+    return rows
+
+def run_batch(rows):
+    return Sale.calculate_sale_amounts_batch(
+        unit_prices=[r['unit_price'] for r in rows],
+        company_commission_rates=[r['company_commission_rate'] for r in rows],
+        salesperson_commission_rates=[r['salesperson_commission_rate'] for r in rows],
+        salesperson_incentive_rates=[r['salesperson_incentive_rate'] for r in rows],
+        vat_rates=[r['vat_rate'] for r in rows],
+        sales_tax_rates=[r['sales_tax_rate'] for r in rows],
+        annual_tax_rates=[r['annual_tax_rate'] for r in rows],
+        salesperson_tax_rates=[r['salesperson_tax_rate'] for r in rows],
+        sales_manager_tax_rates=[r['sales_manager_tax_rate'] for r in rows]
+    )
+
+def assert_parity(rows, batch):
+    for i, row in enumerate(rows):
+        scalar = Sale.calculate_sale_amounts(
+            unit_price=row['unit_price'],
+            company_commission_rate=row['company_commission_rate'],
+            salesperson_commission_rate=row['salesperson_commission_rate'],
+            salesperson_incentive_rate=row['salesperson_incentive_rate'],
+            vat_rate=row['vat_rate'],
+            sales_tax_rate=row['sales_tax_rate'],
+            annual_tax_rate=row['annual_tax_rate'],
+            salesperson_tax_rate=row['salesperson_tax_rate'],
+            sales_manager_tax_rate=row['sales_manager_tax_rate']
+        )
+        assert set(scalar) == set(batch)
+        for key, value in scalar.items():
+            assert batch[key][i] == to_piasters(value), (i, key, row, value, batch[key][i])
+
+def test_batch_matches_scalar_on_random_rows():
+    """Every output column matches the scalar path to the piaster"""
+    rows = random_rows(5000)
+    assert_parity(rows, run_batch(rows))
+    print("✓ 5000 random rows match the scalar engine")
+
+def test_batch_matches_scalar_on_excel_scenarios():
+    """The worked examples from test_calculations_standalone.py"""
+    rows = [
+        {'unit_price': 1000000, 'company_commission_rate': 0.05, 'salesperson_commission_rate': 0.02,
+         'salesperson_incentive_rate': 0.01, 'vat_rate': 0.14, 'sales_tax_rate': 0.05,
+         'annual_tax_rate': 0.225, 'salesperson_tax_rate': 0.10, 'sales_manager_tax_rate': 0.15},
+        {'unit_price': 3000000, 'company_commission_rate': 0.03, 'salesperson_commission_rate': 0.005,
+         'salesperson_incentive_rate': 0.005, 'vat_rate': 0.14, 'sales_tax_rate': 0.05,
+         'annual_tax_rate': 0.225, 'salesperson_tax_rate': 0.22, 'sales_manager_tax_rate': 0.22},
+        # High taxes drive net company income negative, which exercises rounding below zero
+        {'unit_price': 1000001.37, 'company_commission_rate': 0.05, 'salesperson_commission_rate': None,
+         'salesperson_incentive_rate': '', 'vat_rate': 0.5, 'sales_tax_rate': 0.5,
+         'annual_tax_rate': 0.5, 'salesperson_tax_rate': 0, 'sales_manager_tax_rate': 0.333},
+    ]
+    batch = run_batch(rows)
+    assert_parity(rows, batch)
+    assert batch['net_company_income'][2] < 0
+    print("✓ Excel scenarios match the scalar engine")
+
+def test_scalar_rates_are_broadcast():
+    """A single rate value applies to every row"""
+    prices = [500000, 800000, Decimal('1234567.89')]
+    batch = Sale.calculate_sale_amounts_batch(prices, 0.025, vat_rates=Decimal('0.14'))
+    rows = [{'unit_price': p, 'company_commission_rate': 0.025, 'salesperson_commission_rate': 0,
+             'salesperson_incentive_rate': 0, 'vat_rate': Decimal('0.14'), 'sales_tax_rate': 0.05,
+             'annual_tax_rate': 0.225, 'salesperson_tax_rate': 0, 'sales_manager_tax_rate': 0}
+            for p in prices]
+    assert_parity(rows, batch)
+    print("✓ Scalar rates are broadcast to all rows")
+
+def test_mismatched_column_lengths_are_rejected():
+    try:
+        Sale.calculate_sale_amounts_batch([1000, 2000], [0.05])
+    except ValueError:
+        print("✓ Mismatched column lengths raise ValueError")
+        return
+    raise AssertionError('Expected ValueError for mismatched columns')
+
+def test_missing_company_rate_is_rejected():
+    """Like the scalar engine, a None company rate is an error, not 0"""
+    for rates in (None, [0.05, None]):
+        try:
+            Sale.calculate_sale_amounts_batch([1000, 2000], rates)
+        except InvalidOperation:
+            continue
+        raise AssertionError(f'Expected InvalidOperation for company rates {rates!r}')
+    try:
+        Sale.calculate_sale_amounts(1000, None)
+    except InvalidOperation:
+        print("✓ Missing company rate raises InvalidOperation in both engines")
+        return
+    raise AssertionError('Expected InvalidOperation from the scalar engine')
+
+if __name__ == "__main__":
+    print("Testing Batch Sale Calculation Engine")
+    print("=" * 50)
+    test_batch_matches_scalar_on_random_rows()
+    test_batch_matches_scalar_on_excel_scenarios()
+    test_scalar_rates_are_broadcast()
+    test_mismatched_column_lengths_are_rejected()
+    test_missing_company_rate_is_rejected()
+    print("All tests completed!")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the SQL amount formulas (Sale.amount_sql_expressions)
+give exactly the same piasters as the Python batch engine, in both money
+storage modes
+"""
+
+import sys
+import os
+import random
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from decimal import Decimal
+from sqlalchemy import create_engine, select, text
+from src.models.database import db
+from src.models import user, transaction  # noqa: F401 (configure Sale relationships)
+from src.models.money import get_money_storage, set_money_storage, to_piasters
+from src.models.sale import Sale
+
+RATES = ['0', '0.005', '0.01', '0.015', '0.025', '0.03', '0.05', '0.1', '0.14', '0.225', '0.5', '0.9999', '1.25']
+RATE_COLUMNS = (
+    'company_commission_rate', 'salesperson_commission_rate', 'salesperson_incentive_rate',
+    'vat_rate', 'sales_tax_rate', 'annual_tax_rate', 'salesperson_tax_rate', 'sales_manager_tax_rate'
+)
+
+def random_sales(count, seed=9):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        price = rng.choice([
+            Decimal(rng.randint(0, 100000)).scaleb(-2),
+            Decimal(rng.randint(50000000, 1500000000)).scaleb(-2),
+            Decimal(rng.randint(10 ** 11, 10 ** 12)).scaleb(-2),
+            Decimal('1000000.05'),
+        ])
+        row = {'id': i + 1, 'unit_price': price}
+        for column in RATE_COLUMNS:
+            row[column] = Decimal(rng.choice(RATES))
+        rows.append(row)
+    return rows
+
+def sql_amounts(engine, rows, mode, **rates):
+    """Insert rows in the given storage mode and evaluate the SQL formulas"""
+    with engine.begin() as connection:
+        connection.execute(text('DELETE FROM sales'))
+        for row in rows:
+            price = to_piasters(row['unit_price']) if mode == 'minor_units' else float(row['unit_price'])
+            connection.execute(text(
+                'INSERT INTO sales (id, client_name, sale_date, unit_code, unit_price, property_type, '
+                'company_commission_rate, salesperson_commission_rate, salesperson_incentive_rate, vat_rate, '
+                'sales_tax_rate, annual_tax_rate, salesperson_tax_rate, sales_manager_tax_rate, '
+                'company_commission_amount, net_company_income) VALUES (:id, :client, :sale_date, :code, :price, '
+                "'residential', :company_commission_rate, :salesperson_commission_rate, "
+                ':salesperson_incentive_rate, :vat_rate, :sales_tax_rate, :annual_tax_rate, '
+                ':salesperson_tax_rate, :sales_manager_tax_rate, 0, 0)'
+            ), {'client': 'Client', 'sale_date': '2024-01-01', 'code': f"U{row['id']}", 'price': price,
+                **{column: float(row[column]) for column in RATE_COLUMNS}, 'id': row['id']})
+
+    expressions = Sale.amount_sql_expressions(**rates)
+    fields = list(expressions)
+    with engine.connect() as connection:
+        result = connection.execute(
+            select(*[expressions[field].label(field) for field in fields]).order_by(Sale.id)
+        ).all()
+    return {field: [row[i] for row in result] for i, field in enumerate(fields)}
+
+def batch_amounts(rows, **rates):
+    columns = {f'{column}s': [row[column] for row in rows] for column in RATE_COLUMNS}
+    for column, value in rates.items():
+        columns[f'{column}s'] = value
+    return Sale.calculate_sale_amounts_batch(unit_prices=[row['unit_price'] for row in rows], **columns)
+
+def check_mode(mode):
+    previous = get_money_storage()
+    set_money_storage(mode)
+    try:
+        engine = create_engine('sqlite://')
+        db.metadata.create_all(engine)
+        rows = random_sales(400)
+
+        # Every rate read from the row, then a re-rate that overrides the profile rates
+        scenarios = [{}, {
+            'company_commission_rate': Decimal('0.0275'), 'salesperson_commission_rate': Decimal('0.01'),
+            'salesperson_incentive_rate': 0, 'vat_rate': 0.14, 'sales_tax_rate': '0.05',
+            'annual_tax_rate': Decimal('0.2250'),
+        }]
+        for rates in scenarios:
+            expected = batch_amounts(rows, **rates)
+            actual = sql_amounts(engine, rows, mode, **rates)
+            assert set(actual) == set(expected)
+            for field in expected:
+                for i, (want, got) in enumerate(zip(expected[field], actual[field])):
+                    assert want == got, (mode, field, rows[i], want, got)
+        engine.dispose()
+    finally:
+        set_money_storage(previous)
+    print(f"✓ SQL/Python parity test passed ({mode} storage)")
+
+def test_sql_parity_numeric_storage():
+    check_mode('numeric')
+
+def test_sql_parity_minor_unit_storage():
+    check_mode('minor_units')
+
+def test_rejects_unscaled_rate():
+    try:
+        Sale.amount_sql_expressions(company_commission_rate='0.00001')
+    except ValueError:
+        print("✓ Over-precise rate rejected")
+        return
+    raise AssertionError('Expected ValueError for a rate with 5 decimal places')
+
+if __name__ == "__main__":
+    print("Running SQL calculation parity tests...")
+    test_sql_parity_numeric_storage()
+    test_sql_parity_minor_unit_storage()
+    test_rejects_unscaled_rate()
+    print("\n🎉 All SQL calculation tests passed!")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the bulk sales import: per-row validation errors,
+duplicate unit codes, batch amounts matching the scalar engine, a linked
+income entry per sale dated by its sale date, dry runs that write nothing,
+and XLSX exports read back in
+"""
+
+import sys
+import os
+import io
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from datetime import date, datetime
+from decimal import Decimal
+from flask import Flask
+from src.models.database import db
+from src.models import user  # noqa: F401 (configure relationships)
+from src.models.sale import Sale, PropertyTypeRates
+from src.models.treasury import Treasury
+from src.models.transaction import Transaction
+from src.utils.export import xlsx_stream
+from src.utils.sales_import import ImportFileError, import_sales, read_sheet
+
+CSV = '\n'.join([
+    'unit_code,client_name,property_type,unit_price,sale_date,company_commission_rate',
+    'IMP-1,عميل 1,شقة,"1,500,000",2024-01-15,',
+    'IMP-2,عميل 2,شقة,٢٠٠٠٠٠٠,15/02/2024,3%',
+    'IMP-3,عميل 3,مخزن,1000000,2024-03-01,',
+    'IMP-4,عميل 4,شقة,abc,2024-03-01,',
+    'IMP-1,عميل مكرر,شقة,900000,2024-03-01,',
+    ',,,,,',
+    'OLD-1,عميل قديم,شقة,900000,2024-03-01,',
+    'IMP-5,عميل 5,شقة,1200000,2024-04-01,0.02',
+]).encode('utf-8-sig')
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(PropertyTypeRates(
+            property_type='شقة', company_commission_rate=0.025, salesperson_commission_rate=0.01,
+            salesperson_incentive_rate=0, vat_rate=0.14, sales_tax_rate=0.05, annual_tax_rate=0.225,
+            sales_manager_commission_rate=0.1))
+        db.session.add(Sale(client_name='Old', sale_date=date(2023, 1, 1), unit_code='OLD-1', unit_price=100,
+                            property_type='شقة', company_commission_rate=0.025,
+                            company_commission_amount=0, net_company_income=0))
+        db.session.add(Treasury(current_balance=1000))
+        db.session.commit()
+    return app
+
+def test_import_report_and_amounts():
+    app = make_app()
+    with app.app_context():
+        dry = import_sales(read_sheet(io.BytesIO(CSV), 'sales.csv'), dry_run=True, batch_size=2)
+        assert Sale.query.count() == 1 and Transaction.query.count() == 0
+
+        report = import_sales(read_sheet(io.BytesIO(CSV), 'sales.csv'), user_id=7, batch_size=2)
+        assert {k: report[k] for k in ('total_rows', 'imported', 'failed')} == \
+            {'total_rows': 7, 'imported': 3, 'failed': 4}, report
+        assert {k: dry[k] for k in ('imported', 'failed', 'net_company_income')} == \
+            {k: report[k] for k in ('imported', 'failed', 'net_company_income')}
+        # Sheet row numbers count the header; the blank row is skipped, not reported
+        assert [(e['row'], e['unit_code']) for e in report['errors']] == \
+            [(4, 'IMP-3'), (5, 'IMP-4'), (6, 'IMP-1'), (8, 'OLD-1')]
+
+        for sale in Sale.query.filter(Sale.unit_code.like('IMP-%')):
+            expected = Sale.calculate_sale_amounts(
+                sale.unit_price, sale.company_commission_rate, sale.salesperson_commission_rate,
+                sale.salesperson_incentive_rate, sale.vat_rate, sale.sales_tax_rate, sale.annual_tax_rate)
+            assert sale.net_company_income == expected['net_company_income'], sale.unit_code
+            assert sale.created_by == 7 and sale.search_text
+        rates = {s.unit_code: s.company_commission_rate for s in Sale.query.filter(Sale.unit_code.like('IMP-%'))}
+        assert rates == {'IMP-1': Decimal('0.025'), 'IMP-2': Decimal('0.03'), 'IMP-5': Decimal('0.02')}
+
+        # One linked income entry per imported sale, posted on its sale date
+        entries = Transaction.query.order_by(Transaction.posting_seq).all()
+        assert len(entries) == 3
+        for entry in entries:
+            sale = db.session.get(Sale, entry.related_entity_id)
+            assert (entry.related_entity_type, sale.transaction_id) == ('sale', entry.id)
+            assert entry.amount == sale.net_company_income and entry.user_id == 7
+            assert entry.transaction_date == datetime.combine(sale.sale_date, datetime.min.time())
+        total = sum(Decimal(str(t.amount)) for t in entries)
+        assert total == report['net_company_income']
+        assert Decimal(str(Treasury.get_current().current_balance)) == 1000 + total
+        # Running balances follow the sale dates, not the import order
+        assert Transaction.ledger_head_balance() == total
+        earliest = min(entries, key=lambda t: t.transaction_date)
+        assert earliest.balance_after == earliest.amount
+
+        # Editing an imported sale moves its own entry and the treasury together
+        sale = Sale.query.filter_by(unit_code='IMP-1').one()
+        sale.net_company_income = Decimal(str(sale.net_company_income)) - 100
+        assert sale.post_income() == -100
+        db.session.commit()
+        assert Decimal(str(Treasury.get_current().current_balance)) == 1000 + total - 100
+        assert Transaction.ledger_head_balance() == total - 100
+
+        # Re-running the file imports nothing
+        again = import_sales(read_sheet(io.BytesIO(CSV), 'sales.csv'))
+        assert again['imported'] == 0 and again['failed'] == 7
+    print("✓ Import report and amounts test passed")
+
+def test_xlsx_export_round_trip():
+    app = make_app()
+    fields = ['id', 'client_name', 'unit_code', 'property_type', 'unit_price', 'sale_date']
+    rows = [{'id': i, 'client_name': f'عميل {i}', 'unit_code': 1000 + i, 'property_type': 'شقة',
+             'unit_price': 1500000.5, 'sale_date': '2024-05-01'} for i in range(3)]
+    data = b''.join(xlsx_stream(fields, rows))
+    with app.app_context():
+        report = import_sales(read_sheet(io.BytesIO(data), 'sales.xlsx'))
+        assert report['imported'] == 3, report
+        sale = Sale.query.filter_by(unit_code='1000').one()
+        assert sale.unit_price == Decimal('1500000.50') and sale.sale_date == date(2024, 5, 1)
+
+    try:
+        list(read_sheet(io.BytesIO(b'client_name,unit_code\n'), 'sales.csv'))
+        assert False, 'missing columns accepted'
+    except ImportFileError:
+        pass
+    print("✓ XLSX round trip test passed")
+
+if __name__ == "__main__":
+    print("Running sales import tests...")
+    test_import_report_and_amounts()
+    test_xlsx_export_round_trip()
+    print("\n🎉 All sales import tests passed!")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script to verify Treasury.increment() and Treasury.set_balance(): the
+balance changes in SQL inside the caller's transaction (rollback undoes it)
+and concurrent writers lose no updates
+"""
+
+import sys
+import os
+import tempfile
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from decimal import Decimal
+from flask import Flask
+from src.models.database import db
+from src.models import user, sale  # noqa: F401 (configure relationships)
+from src.models.transaction import Transaction
+from src.models.treasury import Treasury
+
+def make_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+def test_increment_joins_caller_transaction():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'treasury.db'))
+        with app.app_context():
+            assert Treasury.increment(Decimal('100.10')) == Decimal('100.10')  # creates the row
+            db.session.commit()
+            treasury = Treasury.get_current()
+
+            assert Treasury.increment(Decimal('-0.30')) == Decimal('99.80')
+            assert treasury.current_balance == Decimal('99.80')  # loaded object kept in step
+            db.session.rollback()
+            assert Treasury.get_current().current_balance == Decimal('100.10')
+            db.engine.dispose()
+    print("✓ Increment transaction test passed")
+
+def test_concurrent_increments():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'treasury.db'))
+        with app.app_context():
+            Treasury.get_current()
+
+        def writer():
+            with app.app_context():
+                for _ in range(25):
+                    db.session.add(Transaction(type='Sale', amount=Decimal('10.05'), description='test'))
+                    Treasury.increment(Decimal('10.05'))
+                    db.session.commit()
+
+        threads = [threading.Thread(target=writer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with app.app_context():
+            assert Treasury.get_current().current_balance == Decimal('1005.00')
+            assert Transaction.query.count() == 100
+            db.engine.dispose()
+    print("✓ Concurrent increments test passed")
+
+def test_set_balance_between_increments():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'treasury.db'))
+        with app.app_context():
+            Treasury.increment(Decimal('50'))
+            db.session.commit()
+            assert Treasury.set_balance(Decimal('80.25')) == (Decimal('50.00'), Decimal('80.25'))
+            db.session.rollback()
+            assert Treasury.get_current().current_balance == Decimal('50.00')
+            db.session.add(Transaction(type='Sale', amount=Decimal('50'), description='opening'))
+            db.session.commit()
+
+        def incrementer():
+            with app.app_context():
+                for _ in range(25):
+                    db.session.add(Transaction(type='Sale', amount=Decimal('10.05'), description='test'))
+                    Treasury.increment(Decimal('10.05'))
+                    db.session.commit()
+
+        def setter():
+            with app.app_context():
+                for i in range(25):
+                    old_balance, new_balance = Treasury.set_balance(Decimal(1000 + i))
+                    db.session.add(Transaction(type='Adjustment', amount=new_balance - old_balance))
+                    db.session.commit()
+
+        threads = [threading.Thread(target=incrementer) for _ in range(3)] + [threading.Thread(target=setter)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Every balance set was posted against the balance it replaced
+        with app.app_context():
+            total = db.session.query(db.func.sum(Transaction.amount)).scalar()
+            assert Treasury.get_current().current_balance == Decimal(str(total))
+            db.engine.dispose()
+    print("✓ Set balance test passed")
+
+if __name__ == "__main__":
+    print("Running treasury increment tests...")
+    test_increment_joins_caller_transaction()
+    test_concurrent_increments()
+    test_set_balance_between_increments()
+    print("\n🎉 All treasury increment tests passed!")